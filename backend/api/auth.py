@@ -2,9 +2,8 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from datetime import timedelta
 from models.schemas import UserCreate, UserLogin, UserResponse, Token, MessageResponse
-from core.auth import get_password_hash, verify_password, create_access_token, verify_token
-from core.database import get_supabase_client
-from supabase import Client
+from core.auth import get_password_hash, verify_password, create_access_token, verify_token, auth_cache
+from core.database import get_supabase_client, run_db, db_execute
 
 router = APIRouter(prefix="/auth", tags=["认证"])
 security = HTTPBearer()
@@ -16,12 +15,14 @@ async def register(user: UserCreate):
     
     try:
         # 使用Supabase Auth注册用户
-        auth_response = supabase.auth.sign_up({
+        auth_response = await run_db(supabase.auth.sign_up, {
             "email": user.email,
             "password": user.password
         })
         
         if auth_response.user:
+            # 同一邮箱重新注册后用户行可能变化，丢弃该用户已缓存的令牌
+            auth_cache.invalidate(sub=user.email)
             return MessageResponse(message="用户注册成功")
         else:
             raise HTTPException(
@@ -41,7 +42,7 @@ async def login(user: UserLogin):
     
     try:
         # 使用Supabase Auth登录
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_db(supabase.auth.sign_in_with_password, {
             "email": user.email,
             "password": user.password
         })
@@ -76,21 +77,8 @@ async def login(user: UserLogin):
 @router.get("/me", response_model=UserResponse)
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """获取当前用户信息"""
-    token = credentials.credentials
-    payload = verify_token(token)
-    
-    supabase = get_supabase_client()
-    
     try:
-        result = supabase.table('users').select('*').eq('email', payload['sub']).execute()
-        
-        if not result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="用户不存在"
-            )
-        
-        user = result.data[0]
+        user = await resolve_current_user(credentials.credentials)
         return UserResponse(
             id=user['id'],
             username=user['username'],
@@ -107,14 +95,17 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail=f"获取用户信息失败: {str(e)}"
         )
 
-# 依赖项：获取当前用户
-async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """获取当前用户的依赖项"""
-    token = credentials.credentials
+async def resolve_current_user(token: str) -> dict:
+    """校验令牌并查询用户行，重复调用命中令牌缓存，不再解码与查库"""
+    cached = auth_cache.get(token)
+    if cached is not None:
+        return cached[1]
+    
     payload = verify_token(token)
+    generation = auth_cache.generation(payload.get('sub'))
     
     supabase = get_supabase_client()
-    result = supabase.table('users').select('*').eq('email', payload['sub']).execute()
+    result = await db_execute(supabase.table('users').select('*').eq('email', payload['sub']))
     
     if not result.data:
         raise HTTPException(
@@ -122,4 +113,10 @@ async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials
             detail="用户不存在"
         )
     
-    return result.data[0]
\ No newline at end of file
+    auth_cache.set(token, payload, result.data[0], generation=generation)
+    return result.data[0]
+
+# 依赖项：获取当前用户
+async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """获取当前用户的依赖项"""
+    return await resolve_current_user(credentials.credentials)
@@ -3,8 +3,9 @@ from typing import List, Optional
 from models.schemas import (
     ChartConfigCreate, ChartConfigResponse, MessageResponse
 )
-from core.database import get_supabase_client
+from core.database import get_supabase_client, db_execute
 from api.auth import get_current_user_dependency
+from services.ownership import get_ownership_index, CHART_CONFIGS_RESOURCE
 
 router = APIRouter(prefix="/charts", tags=["图表配置"])
 
@@ -24,10 +25,11 @@ async def create_chart_config(
             "user_id": current_user['id']
         }
         
-        result = supabase.table('chart_configs').insert(new_config).execute()
+        result = await db_execute(supabase.table('chart_configs').insert(new_config))
         
         if result.data:
             config_data = result.data[0]
+            get_ownership_index(CHART_CONFIGS_RESOURCE).add(current_user['id'], config_data['id'])
             return ChartConfigResponse(
                 id=config_data['id'],
                 name=config_data['name'],
@@ -57,7 +59,8 @@ async def get_chart_configs(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table('chart_configs').select('*').eq('user_id', current_user['id']).execute()
+        result = await db_execute(supabase.table('chart_configs').select('*').eq('user_id', current_user['id']))
+        get_ownership_index(CHART_CONFIGS_RESOURCE).prime(current_user['id'], [config['id'] for config in result.data])
         
         configs = []
         for config in result.data:
@@ -88,7 +91,7 @@ async def get_default_chart_config(
     
     try:
         # 先查找用户的默认配置
-        result = supabase.table('chart_configs').select('*').eq('user_id', current_user['id']).eq('is_default', True).execute()
+        result = await db_execute(supabase.table('chart_configs').select('*').eq('user_id', current_user['id']).eq('is_default', True))
         
         if result.data:
             config = result.data[0]
@@ -238,8 +241,7 @@ async def update_chart_config(
     
     try:
         # 验证配置权限
-        config_result = supabase.table('chart_configs').select('*').eq('id', config_id).eq('user_id', current_user['id']).execute()
-        if not config_result.data:
+        if not await get_ownership_index(CHART_CONFIGS_RESOURCE).owns(current_user['id'], config_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="图表配置不存在或无权限访问"
@@ -252,7 +254,7 @@ async def update_chart_config(
             "is_default": config.is_default
         }
         
-        result = supabase.table('chart_configs').update(update_data).eq('id', config_id).execute()
+        result = await db_execute(supabase.table('chart_configs').update(update_data).eq('id', config_id))
         
         if result.data:
             config_data = result.data[0]
@@ -271,6 +273,8 @@ async def update_chart_config(
                 detail="更新图表配置失败"
             )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -287,18 +291,20 @@ async def delete_chart_config(
     
     try:
         # 验证配置权限
-        config_result = supabase.table('chart_configs').select('*').eq('id', config_id).eq('user_id', current_user['id']).execute()
-        if not config_result.data:
+        if not await get_ownership_index(CHART_CONFIGS_RESOURCE).owns(current_user['id'], config_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="图表配置不存在或无权限访问"
             )
         
         # 删除配置
-        result = supabase.table('chart_configs').delete().eq('id', config_id).execute()
+        result = await db_execute(supabase.table('chart_configs').delete().eq('id', config_id))
+        get_ownership_index(CHART_CONFIGS_RESOURCE).discard(current_user['id'], config_id)
         
         return MessageResponse(message="图表配置删除成功")
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,14 +1,26 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from typing import List, Optional
-import pandas as pd
-import io
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import List, Optional, Literal
 from datetime import datetime
 from models.schemas import (
     DatasetCreate, DatasetResponse, KlineDataCreate, KlineDataResponse,
     FileUploadResponse, MessageResponse
 )
-from core.database import get_supabase_client
+from core.config import settings
+from core.database import get_supabase_client, db_execute, run_db
+from core.metrics import record_rows_returned
+from core.responses import FastJSONResponse
 from api.auth import get_current_user_dependency
+from services.kline_series import KlineSeries, to_epoch_ms, MIN_TIMESTAMP, MAX_TIMESTAMP
+from services.downsample import downsample_ohlcv
+from services.encoding import encode_series_response
+from services.series_cache import get_series_cache, DATASETS_NAMESPACE
+from services.storage import get_kline_storage
+from services.ingest import ingest_csv, MissingColumnsError, UploadTooLargeError
+from services.ownership import get_ownership_index, DATASETS_RESOURCE
+from services.catalog import get_series_catalog
+from services.export import ExportEncoder, stream_export, export_filename
+from services.report import render_report, default_title
 
 router = APIRouter(prefix="/data", tags=["数据管理"])
 
@@ -29,10 +41,11 @@ async def create_dataset(
             "user_id": current_user['id']
         }
         
-        result = supabase.table('datasets').insert(new_dataset).execute()
+        result = await db_execute(supabase.table('datasets').insert(new_dataset))
         
         if result.data:
             dataset_data = result.data[0]
+            get_ownership_index(DATASETS_RESOURCE).add(current_user['id'], dataset_data['id'])
             return DatasetResponse(
                 id=dataset_data['id'],
                 name=dataset_data['name'],
@@ -63,7 +76,8 @@ async def get_datasets(
     supabase = get_supabase_client()
     
     try:
-        result = supabase.table('datasets').select('*').eq('user_id', current_user['id']).execute()
+        result = await db_execute(supabase.table('datasets').select('*').eq('user_id', current_user['id']))
+        get_ownership_index(DATASETS_RESOURCE).prime(current_user['id'], [dataset['id'] for dataset in result.data])
         
         datasets = []
         for dataset in result.data:
@@ -93,6 +107,8 @@ async def upload_csv_file(
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """上传CSV文件并解析K线数据"""
+    import pandas as pd
+    
     if not file.filename.endswith('.csv'):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -100,59 +116,50 @@ async def upload_csv_file(
         )
     
     try:
-        # 读取CSV文件
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        # 验证CSV格式（期望包含：timestamp, open, high, low, close, volume列）
-        required_columns = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
-        if not all(col in df.columns for col in required_columns):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"CSV文件必须包含以下列: {', '.join(required_columns)}"
-            )
-        
-        supabase = get_supabase_client()
-        
         # 如果提供了dataset_id，验证数据集是否存在且属于当前用户
         if dataset_id:
-            dataset_result = supabase.table('datasets').select('*').eq('id', dataset_id).eq('user_id', current_user['id']).execute()
-            if not dataset_result.data:
+            if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="数据集不存在或无权限访问"
                 )
         
-        # 准备K线数据
-        kline_data = []
-        for _, row in df.iterrows():
-            kline_record = {
-                "dataset_id": dataset_id,
-                "timestamp": pd.to_datetime(row['timestamp']).isoformat(),
-                "open_price": float(row['open']),
-                "high_price": float(row['high']),
-                "low_price": float(row['low']),
-                "close_price": float(row['close']),
-                "volume": float(row['volume'])
-            }
-            kline_data.append(kline_record)
-        
-        # 批量插入K线数据
-        if kline_data:
-            result = supabase.table('kline_data').insert(kline_data).execute()
-            if not result.data:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="K线数据插入失败"
-                )
+        # 按块流式解析CSV并分批写入K线数据（期望包含：timestamp, open, high, low, close, volume列）
+        try:
+            result = await ingest_csv(
+                file,
+                get_kline_storage(DATASETS_NAMESPACE),
+                dataset_id,
+                time_column='timestamp',
+                required_columns=['timestamp', 'open', 'high', 'low', 'close', 'volume']
+            )
+        except Exception:
+            get_series_catalog().invalidate(DATASETS_NAMESPACE)
+            raise
+        finally:
+            get_series_cache().invalidate(DATASETS_NAMESPACE, dataset_id)
+        if dataset_id:
+            await run_db(get_series_catalog().refresh, DATASETS_NAMESPACE, dataset_id)
         
         return FileUploadResponse(
             filename=file.filename,
-            file_size=len(contents),
+            file_size=result.bytes_read,
             upload_time=datetime.now(),
             dataset_id=dataset_id
         )
         
+    except HTTPException:
+        raise
+    except MissingColumnsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
     except pd.errors.EmptyDataError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -169,48 +176,201 @@ async def upload_csv_file(
             detail=f"文件上传处理失败: {str(e)}"
         )
 
+def _load_kline_series(dataset_id: str, limit: int) -> KlineSeries:
+    """读取数据集前 limit 根K线，优先命中序列缓存"""
+    cache = get_series_cache()
+    variant = f"limit={limit}"
+    series = cache.get(DATASETS_NAMESPACE, dataset_id, MIN_TIMESTAMP, MAX_TIMESTAMP, variant)
+    if series is not None:
+        return series
+    
+    generation = cache.generation(DATASETS_NAMESPACE, dataset_id)
+    series = get_kline_storage(DATASETS_NAMESPACE).read_range(dataset_id, limit=limit)
+    cache.set(DATASETS_NAMESPACE, dataset_id, MIN_TIMESTAMP, MAX_TIMESTAMP, series, variant=variant, generation=generation)
+    return series
+
+def _series_to_kline_rows(series: KlineSeries, dataset_id: str) -> List[dict]:
+    """按列向量化生成与 KlineDataResponse 结构一致的行字典，降采样后的点沿用其代表行的id"""
+    columns = {
+        'id': [str(row_id) for row_id in series.ids.tolist()],
+        'dataset_id': [dataset_id] * len(series),
+        'timestamp': series.iso_times(),
+        'open_price': series.open.tolist(),
+        'high_price': series.high.tolist(),
+        'low_price': series.low.tolist(),
+        'close_price': series.close.tolist(),
+        'volume': series.volume.tolist()
+    }
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
 @router.get("/kline/{dataset_id}", response_model=List[KlineDataResponse])
 async def get_kline_data(
     dataset_id: str,
     limit: int = 1000,
+    max_points: Optional[int] = Query(None, ge=3, description="最大返回点数，超出时服务端保形降采样"),
+    downsample: Literal["ohlc", "lttb"] = Query("ohlc", description="降采样方法"),
+    encoding: Literal["rows", "columnar", "binary"] = Query("rows", description="响应编码：rows对象数组，columnar列式JSON，binary小端float64列"),
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """获取K线数据"""
-    supabase = get_supabase_client()
-    
     try:
         # 验证数据集权限
-        dataset_result = supabase.table('datasets').select('*').eq('id', dataset_id).eq('user_id', current_user['id']).execute()
-        if not dataset_result.data:
+        if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="数据集不存在或无权限访问"
             )
         
         # 获取K线数据
-        result = supabase.table('kline_data').select('*').eq('dataset_id', dataset_id).order('timestamp').limit(limit).execute()
-        
-        kline_data = []
-        for data in result.data:
-            kline_data.append(KlineDataResponse(
-                id=data['id'],
-                dataset_id=data['dataset_id'],
-                timestamp=data['timestamp'],
-                open_price=data['open_price'],
-                high_price=data['high_price'],
-                low_price=data['low_price'],
-                close_price=data['close_price'],
-                volume=data['volume']
-            ))
+        series = await run_db(_load_kline_series, dataset_id, limit)
+        if max_points:
+            series, _ = downsample_ohlcv(series, max_points, downsample)
+        record_rows_returned(len(series))
+        
+        if encoding != 'rows':
+            return encode_series_response(series, encoding)
         
-        return kline_data
+        # 直接序列化行字典，跳过逐行模型构造与响应校验（response_model 仍用于接口文档）
+        return FastJSONResponse(content=_series_to_kline_rows(series, dataset_id))
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"获取K线数据失败: {str(e)}"
         )
 
+@router.get("/datasets/{dataset_id}/summary")
+async def get_dataset_summary(
+    dataset_id: str,
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """获取数据集K线摘要（K线数、首末时间），由序列目录提供"""
+    try:
+        if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="数据集不存在或无权限访问"
+            )
+        
+        entry = await run_db(get_series_catalog().entry, DATASETS_NAMESPACE, dataset_id)
+        if entry is None:
+            return {'dataset_id': dataset_id, 'bar_count': 0, 'first_timestamp': None, 'last_timestamp': None}
+        return {
+            'dataset_id': dataset_id,
+            'bar_count': entry.bar_count,
+            'first_timestamp': entry.first_timestamp,
+            'last_timestamp': entry.last_timestamp
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"获取数据集摘要失败: {str(e)}"
+        )
+
+@router.get("/datasets/{dataset_id}/export")
+async def export_dataset(
+    dataset_id: str,
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv", description="导出格式，parquet 需要安装 pyarrow"),
+    gzip: bool = Query(False, description="gzip 压缩（parquet 使用其内置的 gzip 编码）"),
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """流式导出数据集K线"""
+    try:
+        if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="数据集不存在或无权限访问"
+            )
+        
+        encoder = await run_db(ExportEncoder, format, gzip)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"导出数据集失败: {str(e)}"
+        )
+    
+    stream = stream_export(
+        get_kline_storage(DATASETS_NAMESPACE),
+        dataset_id,
+        encoder,
+        to_epoch_ms(start_time, MIN_TIMESTAMP),
+        to_epoch_ms(end_time, MAX_TIMESTAMP)
+    )
+    return StreamingResponse(
+        stream,
+        media_type=encoder.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(dataset_id, encoder)}"'}
+    )
+
+@router.get("/datasets/{dataset_id}/report")
+async def get_dataset_report(
+    dataset_id: str,
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    max_points: Optional[int] = Query(None, ge=3, le=200000, description="最大K线数，默认 REPORT_MAX_POINTS"),
+    title: Optional[str] = Query(None, max_length=200, description="报告标题"),
+    download: bool = Query(False, description="以附件形式下载"),
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """生成数据集的独立 ECharts HTML K线报告"""
+    try:
+        if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="数据集不存在或无权限访问"
+            )
+        
+        series = await run_db(
+            get_kline_storage(DATASETS_NAMESPACE).read_range,
+            dataset_id,
+            to_epoch_ms(start_time, MIN_TIMESTAMP),
+            to_epoch_ms(end_time, MAX_TIMESTAMP)
+        )
+        series, _ = downsample_ohlcv(series, max_points or settings.REPORT_MAX_POINTS, 'ohlc')
+        record_rows_returned(len(series))
+        if not title:
+            result = await db_execute(
+                get_supabase_client().table('datasets').select('name, timeframe').eq('id', dataset_id)
+            )
+            dataset = result.data[0] if result.data else {}
+            title = default_title(dataset.get('name') or dataset_id, dataset.get('timeframe'))
+        path = await run_db(render_report, series, title)
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"生成数据集报告失败: {str(e)}"
+        )
+    
+    return FileResponse(
+        path,
+        media_type="text/html; charset=utf-8",
+        filename=f"{dataset_id}.html" if download else None
+    )
+
 @router.delete("/datasets/{dataset_id}", response_model=MessageResponse)
 async def delete_dataset(
     dataset_id: str,
@@ -221,21 +381,25 @@ async def delete_dataset(
     
     try:
         # 验证数据集权限
-        dataset_result = supabase.table('datasets').select('*').eq('id', dataset_id).eq('user_id', current_user['id']).execute()
-        if not dataset_result.data:
+        if not await get_ownership_index(DATASETS_RESOURCE).owns(current_user['id'], dataset_id):
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="数据集不存在或无权限访问"
             )
         
         # 删除相关的K线数据
-        supabase.table('kline_data').delete().eq('dataset_id', dataset_id).execute()
+        await run_db(get_kline_storage(DATASETS_NAMESPACE).delete, dataset_id)
+        get_series_cache().invalidate(DATASETS_NAMESPACE, dataset_id)
+        get_series_catalog().remove(DATASETS_NAMESPACE, dataset_id)
         
         # 删除数据集
-        result = supabase.table('datasets').delete().eq('id', dataset_id).execute()
+        result = await db_execute(supabase.table('datasets').delete().eq('id', dataset_id))
+        get_ownership_index(DATASETS_RESOURCE).discard(current_user['id'], dataset_id)
         
         return MessageResponse(message="数据集删除成功")
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,46 @@
+import hmac
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from core.config import settings
+from core.database import run_db
+from core.profiling import artifact_path, list_profiles, pstats_text
+
+router = APIRouter(prefix="/profiles", tags=["性能剖析"])
+
+async def require_profiling_token(
+    x_profile: Optional[str] = Header(None, description="剖析令牌"),
+    token: Optional[str] = Query(None, description="剖析令牌，未使用请求头时传入")
+):
+    """校验剖析令牌；未配置令牌时剖析功能关闭"""
+    if not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="性能剖析未启用")
+    provided = x_profile or token
+    if not provided or not hmac.compare_digest(provided, settings.PROFILING_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="剖析令牌无效")
+
+@router.get("", dependencies=[Depends(require_profiling_token)])
+async def get_profiles():
+    """已保存的剖析结果列表（最新的在前）"""
+    return await run_db(list_profiles)
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profiling_token)])
+async def get_profile(
+    profile_id: str,
+    format: Literal["raw", "text"] = Query("raw", description="raw 下载原始文件；text 返回 pstats 文本摘要"),
+    sort: str = Query("cumulative", description="pstats 摘要排序字段"),
+    limit: int = Query(50, ge=1, le=1000, description="pstats 摘要行数")
+):
+    """下载剖析结果：sampling 为 collapsed stacks（可用 flamegraph.pl / speedscope 打开），cprofile 为 pstats"""
+    path = artifact_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="剖析结果不存在")
+
+    if path.endswith('.collapsed'):
+        return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{profile_id}.collapsed")
+    if format == "text":
+        try:
+            return PlainTextResponse(await run_db(pstats_text, path, sort, limit))
+        except KeyError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"不支持的排序字段: {sort}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Query
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Request
+from fastapi.responses import StreamingResponse, FileResponse
+from typing import Optional, List, Literal
 from datetime import datetime
 from models.futures import (
     FuturesDataResponse, 
     ChartDataRequest, 
     ChartDataResponse,
-    UploadResponse
+    UploadResponse,
+    TickBatchRequest,
+    TickBatchResponse
 )
 from services.futures_service import FuturesService
+from services.series_cache import get_series_cache
+from services.ingest import UploadTooLargeError
+from services.bar_bus import sse_events
+from services.tick_aggregator import get_tick_aggregator
+from services.kline_series import to_epoch_ms
+from services.export import export_filename
 
 router = APIRouter()
 futures_service = FuturesService()
@@ -18,7 +27,9 @@ async def get_futures_data(
     start_time: Optional[datetime] = Query(None, description="开始时间"),
     end_time: Optional[datetime] = Query(None, description="结束时间"),
     page: int = Query(1, ge=1, description="页码"),
-    page_size: int = Query(100, ge=1, le=1000, description="每页数量")
+    page_size: int = Query(100, ge=1, le=1000, description="每页数量"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的next_cursor，优先于page"),
+    count: Optional[Literal["exact", "estimated"]] = Query(None, description="总数统计方式，为空时不统计")
 ):
     """获取期货数据"""
     try:
@@ -27,8 +38,12 @@ async def get_futures_data(
             start_time=start_time,
             end_time=end_time,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            count=count
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -37,9 +52,89 @@ async def get_chart_data(request: ChartDataRequest):
     """获取图表数据"""
     try:
         return await futures_service.get_chart_data(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/stream")
+async def stream_bars(
+    request: Request,
+    instrument: str = Query(..., description="合约代码"),
+    interval: Literal["1m", "5m", "15m", "30m", "1h", "4h", "1d", "session"] = Query("5m", description="时间间隔"),
+    since: Optional[int] = Query(None, description="客户端已有数据的水位，订阅后先补发该水位之后的K线")
+):
+    """订阅K线推送（Server-Sent Events）：bars 事件为更新的K线，resync 事件要求客户端按 since 增量补拉"""
+    subscription = futures_service.bus.subscribe(instrument, interval)
+    if since is not None:
+        # 先订阅再补发，避免拉取与订阅之间写入的K线丢失（重复的K线由客户端按时间戳合并）
+        try:
+            series = await futures_service.bars_since(instrument, interval, since)
+            subscription.offer(series.to_chart_rows())
+        except Exception:
+            subscription.resync(since)
+    
+    return StreamingResponse(
+        sse_events(futures_service.bus, subscription, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/export")
+async def export_futures_data(
+    instrument: str = Query(..., description="合约代码"),
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    format: Literal["csv", "ndjson", "parquet"] = Query("csv", description="导出格式，parquet 需要安装 pyarrow"),
+    gzip: bool = Query(False, description="gzip 压缩（parquet 使用其内置的 gzip 编码）")
+):
+    """流式导出合约K线，逐块读取与编码，内存占用与导出行数无关"""
+    try:
+        encoder, stream = await futures_service.export_data(instrument, start_time, end_time, format, gzip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return StreamingResponse(
+        stream,
+        media_type=encoder.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(instrument, encoder)}"'}
+    )
+
+@router.get("/report")
+async def get_report(
+    instrument: str = Query(..., description="合约代码"),
+    interval: Literal["1m", "5m", "15m", "30m", "1h", "4h", "1d", "session"] = Query("5m", description="时间间隔"),
+    exchange: Optional[str] = Query(None, description="交易所代码"),
+    start_time: Optional[datetime] = Query(None, description="开始时间"),
+    end_time: Optional[datetime] = Query(None, description="结束时间"),
+    max_points: Optional[int] = Query(None, ge=3, le=200000, description="最大K线数，默认 REPORT_MAX_POINTS"),
+    title: Optional[str] = Query(None, max_length=200, description="报告标题，默认为 合约 周期K线图"),
+    download: bool = Query(False, description="以附件形式下载")
+):
+    """生成独立的 ECharts HTML K线报告，内容相同的报告直接复用磁盘缓存"""
+    try:
+        request = ChartDataRequest(
+            instrument=instrument,
+            interval=interval,
+            exchange=exchange,
+            start_time=start_time,
+            end_time=end_time,
+            max_points=max_points
+        )
+        path = await futures_service.get_report(request, title)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return FileResponse(
+        path,
+        media_type="text/html; charset=utf-8",
+        filename=f"{instrument}_{interval}.html" if download else None
+    )
+
 @router.get("/instruments")
 async def get_instruments():
     """获取所有合约代码"""
@@ -48,6 +143,14 @@ async def get_instruments():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/catalog")
+async def get_catalog():
+    """获取序列目录（合约、周期、首末时间、K线数）"""
+    try:
+        return await futures_service.get_catalog()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/upload", response_model=UploadResponse)
 async def upload_csv_file(file: UploadFile = File(...)):
     """上传CSV文件"""
@@ -56,6 +159,40 @@ async def upload_csv_file(file: UploadFile = File(...)):
             raise HTTPException(status_code=400, detail="只支持CSV文件")
         
         return await futures_service.upload_csv_file(file)
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/ticks", response_model=TickBatchResponse)
+async def ingest_ticks(request: TickBatchRequest):
+    """写入逐笔成交，实时聚合为 1m/5m/15m/1h/1d K线"""
+    aggregator = get_tick_aggregator()
+    try:
+        accepted = await aggregator.ingest(
+            (tick.instrument, to_epoch_ms(tick.time, 0), tick.price, tick.size) for tick in request.ticks
+        )
+        stats = aggregator.stats()
+        return TickBatchResponse(
+            accepted=accepted,
+            late_ticks=stats['late_ticks'],
+            pending_bars=stats['pending_bars']
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/ticks/stats")
+async def get_tick_stats():
+    """获取逐笔聚合统计"""
+    return get_tick_aggregator().stats()
+
+@router.post("/rollups/rebuild")
+async def rebuild_rollups(instrument: str = Query(..., description="合约代码")):
+    """重建序列的 5m/15m/1h/1d 预汇总，返回各级写入的K线数"""
+    try:
+        return await futures_service.rebuild_rollups(instrument)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -65,4 +202,19 @@ async def clear_data(instrument: Optional[str] = Query(None)):
     try:
         return await futures_service.clear_data(instrument)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """获取K线序列缓存命中/未命中/淘汰统计"""
+    return get_series_cache().stats()
+
+@router.get("/indicators/stats")
+async def get_indicator_stats():
+    """获取技术指标缓存命中与增量计算统计"""
+    return futures_service.indicators.stats()
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """获取K线推送订阅数"""
+    return {"subscribers": futures_service.bus.subscriber_count()}
@@ -0,0 +1,396 @@
+import bisect
+import re
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# or_ 表达式按顶层逗号切分（忽略 and(...) 内的逗号）
+_OR_SPLIT = re.compile(r',(?![^()]*\))')
+
+Row = Dict[str, Any]
+Condition = Tuple[str, str, Any]
+
+RANGE_OPERATORS = ('gt', 'gte', 'lt', 'lte')
+
+
+def _normalize(value: Any) -> Any:
+    """ISO时间统一为 'YYYY-MM-DDTHH:MM:SS'，使字符串比较与 timestamptz 比较一致"""
+    if isinstance(value, str) and len(value) >= 19 and value[4] == '-' and value[10] in 'T ':
+        return value[:10] + 'T' + value[11:19]
+    return value
+
+
+def _matches(row: Row, condition: Condition) -> bool:
+    op, column, value = condition
+    if op == 'or':
+        return any(all(_matches(row, term) for term in terms) for terms in value)
+    actual = row.get(column)
+    if op == 'eq':
+        return actual == value if isinstance(value, bool) else str(actual) == str(value)
+    if op == 'neq':
+        return str(actual) != str(value)
+    if op == 'in':
+        return actual in value
+    if actual is None:
+        return False
+    actual, value = _normalize(actual), _normalize(value)
+    if op == 'gt':
+        return actual > value
+    if op == 'gte':
+        return actual >= value
+    if op == 'lt':
+        return actual < value
+    return actual <= value
+
+
+def _parse_or(expression: str) -> List[List[Condition]]:
+    """解析 'a.gt."x",and(a.eq."x",b.gt."y")' 为析取范式"""
+    terms = []
+    for part in _OR_SPLIT.split(expression):
+        part = part.strip()
+        conjunction = part[4:-1].split(',') if part.startswith('and(') else [part]
+        terms.append([_parse_condition(item) for item in conjunction])
+    return terms
+
+
+def _parse_condition(text: str) -> Condition:
+    column, op, value = text.strip().split('.', 2)
+    return op, column, value.strip('"')
+
+
+class MemoryResponse:
+    """与 postgrest APIResponse 相同的 data/count 属性"""
+
+    def __init__(self, data: List[Row], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class MemoryTable:
+    """单表行存储
+
+    行按插入顺序保存在字典中，按 (等值列, 值, 排序列) 缓存排好序的视图；写入只失效受影响
+    分区的视图。查询在排序视图上按第一排序列的下界二分定位，再顺序过滤到 limit 为止，
+    分页读取的开销与页大小相关而与表大小无关。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Dict[str, Row] = {}
+        self._views: Dict[Tuple, Tuple[List[Any], List[Row]]] = {}
+        # on_conflict 列组合 -> {列值: 行id}，首次 upsert 时建立，删除或更新后重建
+        self._unique: Dict[Tuple[str, ...], Dict[Tuple, str]] = {}
+        self._lock = threading.RLock()
+
+    def insert(self, rows: List[Row]) -> List[Row]:
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            inserted = [self._add(row, now) for row in rows]
+            self._invalidate(inserted)
+        return [dict(row) for row in inserted]
+
+    def upsert(self, rows: List[Row], on_conflict: Tuple[str, ...]) -> List[Row]:
+        """on_conflict 列全部相等的已有行被更新，否则插入；含 NULL 的行不冲突，与唯一索引一致"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            index = self._unique_index(on_conflict)
+            written, changed = [], []
+            for row in rows:
+                key = self._unique_key(row, on_conflict)
+                existing = self.rows.get(index.get(key)) if key is not None else None
+                if existing is None:
+                    existing = self._add(row, now)
+                else:
+                    changed.append(dict(existing))
+                    existing.update({column: value for column, value in row.items() if column != 'id'})
+                    existing['updated_at'] = now
+                written.append(existing)
+            self._invalidate(changed + written)
+        return [dict(row) for row in written]
+
+    def select(
+        self,
+        conditions: List[Condition],
+        orders: List[Tuple[str, bool]],
+        start: int = 0,
+        stop: Optional[int] = None,
+        count: bool = False
+    ) -> Tuple[List[Row], int]:
+        """返回 (排序后第 [start, stop) 个匹配行, 匹配总数)；不统计总数时只扫描到 stop 为止"""
+        with self._lock:
+            rows, first, last, exact = self._locate(conditions, orders)
+            descending = bool(orders) and orders[0][1]
+            if exact:
+                # 条件全部由分区视图与二分满足，直接按下标切片
+                total = last - first
+                stop = total if stop is None else min(stop, total)
+                if stop <= start:
+                    return [], total
+                if descending:
+                    return rows[last - stop:last - start][::-1], total
+                return rows[first + start:first + stop], total
+
+            indexes = range(last - 1, first - 1, -1) if descending else range(first, last)
+            matched = []
+            total = 0
+            for index in indexes:
+                row = rows[index]
+                if not all(_matches(row, condition) for condition in conditions):
+                    continue
+                if total >= start and (stop is None or total < stop):
+                    matched.append(row)
+                total += 1
+                if not count and stop is not None and total >= stop:
+                    break
+            return matched, total
+
+    def delete(self, conditions: List[Condition]) -> List[Row]:
+        with self._lock:
+            removed, _ = self.select(conditions, [])
+            for row in removed:
+                del self.rows[row['id']]
+            self._invalidate(removed)
+            if removed:
+                self._unique.clear()
+        return removed
+
+    def update(self, conditions: List[Condition], values: Row) -> List[Row]:
+        with self._lock:
+            matched, _ = self.select(conditions, [])
+            self._invalidate(matched)
+            for row in matched:
+                row.update(values)
+            if matched:
+                self._unique.clear()
+        return [dict(row) for row in matched]
+
+    def _add(self, row: Row, now: str) -> Row:
+        row = dict(row)
+        row.setdefault('id', str(uuid.uuid4()))
+        row.setdefault('created_at', now)
+        row.setdefault('updated_at', now)
+        self.rows[row['id']] = row
+        for columns, index in self._unique.items():
+            key = self._unique_key(row, columns)
+            if key is not None:
+                index[key] = row['id']
+        return row
+
+    def _unique_index(self, columns: Tuple[str, ...]) -> Dict[Tuple, str]:
+        index = self._unique.get(columns)
+        if index is None:
+            index = self._unique[columns] = {}
+            for row in self.rows.values():
+                key = self._unique_key(row, columns)
+                if key is not None:
+                    index[key] = row['id']
+        return index
+
+    @staticmethod
+    def _unique_key(row: Row, columns: Tuple[str, ...]) -> Optional[Tuple]:
+        values = tuple(_normalize(row.get(column)) for column in columns)
+        return None if any(value is None for value in values) else tuple(str(value) for value in values)
+
+    def _locate(
+        self,
+        conditions: List[Condition],
+        orders: List[Tuple[str, bool]]
+    ) -> Tuple[List[Row], int, int, bool]:
+        """选取排序视图并二分定位，返回 (视图, 起, 止, 区间内是否全部匹配)"""
+        partition = next(((column, str(value)) for op, column, value in conditions if op == 'eq'), None)
+        if orders:
+            if any(desc != orders[0][1] for _, desc in orders):
+                raise ValueError("内存替身不支持混合升降序")
+            columns = tuple(column for column, _ in orders)
+        else:
+            # 无排序时按范围条件所在列建立视图，便于按区间删除与统计
+            ranged = next((column for op, column, _ in conditions if op in RANGE_OPERATORS), 'id')
+            columns = (ranged,)
+        keys, rows = self._view(partition, columns)
+
+        first, last = 0, len(rows)
+        exact = True
+        for condition in conditions:
+            op, column, value = condition
+            if op == 'eq' and partition is not None and (column, str(value)) == partition:
+                continue
+            if op == 'or':
+                # 键集条件 a > x OR (a = x AND ...) 的下界为 a >= x
+                heads = [terms[0] for terms in value]
+                if all(head[1] == columns[0] and head[0] in ('gt', 'gte', 'eq') for head in heads):
+                    bound = min(self._sort_key(head[2]) for head in heads)
+                    first = max(first, bisect.bisect_left(keys, bound))
+                exact = False
+                continue
+            if column != columns[0] or op not in RANGE_OPERATORS:
+                exact = False
+                continue
+            bound = self._sort_key(value)
+            if op == 'gt':
+                first = max(first, bisect.bisect_right(keys, bound))
+            elif op == 'gte':
+                first = max(first, bisect.bisect_left(keys, bound))
+            elif op == 'lt':
+                last = min(last, bisect.bisect_left(keys, bound))
+            else:
+                last = min(last, bisect.bisect_right(keys, bound))
+        return rows, first, max(first, last), exact
+
+    def _view(self, partition: Optional[Tuple[str, str]], columns: Tuple[str, ...]) -> Tuple[List[Any], List[Row]]:
+        view_key = (partition, columns)
+        view = self._views.get(view_key)
+        if view is None:
+            rows = self.rows.values()
+            if partition is not None:
+                rows = [row for row in rows if str(row.get(partition[0])) == partition[1]]
+            rows = sorted(rows, key=lambda row: tuple(self._sort_key(row.get(column)) for column in columns))
+            keys = [self._sort_key(row.get(columns[0])) for row in rows]
+            view = self._views[view_key] = (keys, rows)
+        return view
+
+    @staticmethod
+    def _sort_key(value: Any) -> Tuple:
+        # NULL 排在最后，与 PostgreSQL 升序一致
+        value = _normalize(value)
+        return (1, '') if value is None else (0, value)
+
+    def _invalidate(self, rows: List[Row]) -> None:
+        if not rows or not self._views:
+            return
+        stale = [
+            view_key for view_key in self._views
+            if view_key[0] is None or any(str(row.get(view_key[0][0])) == view_key[0][1] for row in rows)
+        ]
+        for view_key in stale:
+            del self._views[view_key]
+
+
+class MemoryQuery:
+    """supabase 查询构建器的内存实现，支持本项目用到的方法"""
+
+    def __init__(self, table: MemoryTable):
+        self._table = table
+        self._operation = 'select'
+        self._columns = '*'
+        self._count: Optional[str] = None
+        self._head = False
+        self._payload: Any = None
+        self._conditions: List[Condition] = []
+        self._orders: List[Tuple[str, bool]] = []
+        self._range: Optional[Tuple[int, int]] = None
+        self._limit: Optional[int] = None
+
+    def select(self, columns: str = '*', count: Optional[str] = None, head: bool = False) -> "MemoryQuery":
+        self._columns, self._count, self._head = columns, count, head
+        return self
+
+    def insert(self, data: Any) -> "MemoryQuery":
+        self._operation = 'insert'
+        self._payload = data if isinstance(data, list) else [data]
+        return self
+
+    def upsert(self, data: Any, on_conflict: str = '') -> "MemoryQuery":
+        self._operation = 'upsert'
+        self._payload = data if isinstance(data, list) else [data]
+        self._on_conflict = tuple(column.strip() for column in on_conflict.split(',')) if on_conflict else ('id',)
+        return self
+
+    def update(self, data: Row) -> "MemoryQuery":
+        self._operation, self._payload = 'update', data
+        return self
+
+    def delete(self) -> "MemoryQuery":
+        self._operation = 'delete'
+        return self
+
+    def _where(self, op: str, column: str, value: Any) -> "MemoryQuery":
+        self._conditions.append((op, column, value))
+        return self
+
+    def eq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('eq', column, value)
+
+    def neq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('neq', column, value)
+
+    def gt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('gt', column, value)
+
+    def gte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('gte', column, value)
+
+    def lt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('lt', column, value)
+
+    def lte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._where('lte', column, value)
+
+    def in_(self, column: str, values: List[Any]) -> "MemoryQuery":
+        return self._where('in', column, list(values))
+
+    def or_(self, expression: str) -> "MemoryQuery":
+        return self._where('or', '', _parse_or(expression))
+
+    def order(self, column: str, desc: bool = False) -> "MemoryQuery":
+        self._orders.append((column, desc))
+        return self
+
+    def range(self, start: int, end: int) -> "MemoryQuery":
+        self._range = (start, end)
+        return self
+
+    def limit(self, size: int) -> "MemoryQuery":
+        self._limit = size
+        return self
+
+    def execute(self) -> MemoryResponse:
+        if self._operation == 'insert':
+            return MemoryResponse(self._table.insert(self._payload))
+        if self._operation == 'upsert':
+            return MemoryResponse(self._table.upsert(self._payload, self._on_conflict))
+        if self._operation == 'delete':
+            return MemoryResponse(self._table.delete(self._conditions))
+        if self._operation == 'update':
+            return MemoryResponse(self._table.update(self._conditions, self._payload))
+
+        start, stop = 0, None
+        if self._range is not None:
+            start, stop = self._range[0], self._range[1] + 1
+        if self._limit is not None:
+            stop = start + self._limit if stop is None else min(stop, start + self._limit)
+        if self._head:
+            stop = start
+        rows, total = self._table.select(self._conditions, self._orders, start, stop, count=bool(self._count))
+        return MemoryResponse(self._project(rows), total if self._count else None)
+
+    def _project(self, rows: List[Row]) -> List[Row]:
+        # 返回副本，与真实客户端每次反序列化出新对象一致
+        if self._columns.strip() == '*':
+            return [dict(row) for row in rows]
+        columns = [column.strip() for column in self._columns.split(',')]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+
+class MemorySupabase:
+    """supabase 客户端的进程内替身，用于基准测试
+
+    只实现表查询（不含 auth/rpc/storage），并统计 table() 调用次数作为数据库往返次数。
+    """
+
+    def __init__(self):
+        self.tables: Dict[str, MemoryTable] = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def table(self, name: str) -> MemoryQuery:
+        with self._lock:
+            self.calls += 1
+            table = self.tables.get(name)
+            if table is None:
+                table = self.tables[name] = MemoryTable(name)
+        return MemoryQuery(table)
+
+    def row_count(self, name: Optional[str] = None) -> int:
+        tables = [self.tables[name]] if name in self.tables else ([] if name else list(self.tables.values()))
+        return sum(len(table.rows) for table in tables)
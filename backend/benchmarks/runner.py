@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import numpy as np
+from core.config import settings
+from core.database import set_supabase_client
+from benchmarks.memory_supabase import MemorySupabase
+from benchmarks.synthetic import SyntheticBars
+from benchmarks.startup import measure_startup
+
+# 上传接口把文件写入该序列
+SERIES_KEY = '5m'
+
+CHART_INTERVALS = ('5m', '15m', '1h', '1d', 'session')
+RESAMPLE_INTERVALS = ('15m', '1h', '4h', '1d', 'session')
+PAGE_SIZE = 1000
+
+# 比较基线时参与判断的指标：耗时越大越差，吞吐越小越差
+LATENCY_METRICS = ('p50_ms', 'p95_ms')
+THROUGHPUT_METRICS = ('throughput',)
+
+
+class RssSampler:
+    """后台线程采样常驻内存，记录区间内的峰值（MB）
+
+    /proc 不可用时退化为进程级 ru_maxrss（只增不减）。
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._page_mb = os.sysconf('SC_PAGE_SIZE') / 1024 / 1024 if hasattr(os, 'sysconf') else 0
+
+    def current(self) -> float:
+        try:
+            with open('/proc/self/statm') as handle:
+                return int(handle.read().split()[1]) * self._page_mb
+        except (OSError, ValueError, IndexError):
+            return max_rss_mb()
+
+    def __enter__(self) -> "RssSampler":
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+
+def max_rss_mb() -> float:
+    """进程启动以来的峰值常驻内存（Linux 单位为KB，macOS 为字节）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+@dataclass
+class ScenarioResult:
+    """单个场景的测量结果"""
+    name: str
+    bars: int
+    latencies_ms: List[float]
+    items: int  # 每次迭代处理的K线/行数，用于计算吞吐
+    db_calls: int = 0
+    peak_rss_mb: float = 0.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = np.asarray(self.latencies_ms)
+        total_seconds = latencies.sum() / 1000
+        result = {
+            'bars': self.bars,
+            'iterations': len(latencies),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'max_ms': round(float(latencies.max()), 3),
+            'mean_ms': round(float(latencies.mean()), 3),
+            'throughput': round(self.items * len(latencies) / total_seconds, 1) if total_seconds else None,
+            'db_calls': self.db_calls,
+            'peak_rss_mb': round(self.peak_rss_mb, 1)
+        }
+        result.update(self.extra)
+        return result
+
+
+class BenchmarkRunner:
+    """在本地替身上运行真实的 FuturesService 与路由
+
+    supabase 引擎使用进程内 MemorySupabase 替身（统计数据库往返次数），local 引擎使用临时目录
+    下的列式文件。每个规模先清空数据，经上传接口导入模拟K线，再测量各读取场景。
+    """
+
+    def __init__(self, engine: str, iterations: int, data_dir: str):
+        self.engine = engine
+        self.iterations = iterations
+        self.data_dir = data_dir
+        self.client = MemorySupabase()
+        settings.STORAGE_ENGINE = engine
+        settings.LOCAL_STORE_DIR = os.path.join(data_dir, 'klines')
+        set_supabase_client(self.client)
+
+        # 存储实例在导入时按上面的配置创建
+        import httpx
+        from main import app
+        from api.routes.futures import futures_service
+        self.service = futures_service
+        self.http = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark')
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    async def measure(
+        self,
+        name: str,
+        bars: int,
+        func: Callable[[], Awaitable[Any]],
+        items: int,
+        iterations: Optional[int] = None,
+        setup: Optional[Callable[[], Any]] = None,
+        warmup: int = 0
+    ) -> ScenarioResult:
+        """执行 iterations 次并记录延迟，setup 在每次迭代前执行且不计时"""
+        iterations = iterations or self.iterations
+        for _ in range(warmup):
+            if setup is not None:
+                setup()
+            await func()
+
+        latencies = []
+        calls = self.client.calls
+        with RssSampler() as sampler:
+            for _ in range(iterations):
+                if setup is not None:
+                    setup()
+                started = time.perf_counter()
+                await func()
+                latencies.append((time.perf_counter() - started) * 1000)
+        result = ScenarioResult(
+            name=name,
+            bars=bars,
+            latencies_ms=latencies,
+            items=items,
+            db_calls=(self.client.calls - calls) // iterations,
+            peak_rss_mb=sampler.peak
+        )
+        self.results[f"{name}@{bars}"] = result.to_dict()
+        summary = self.results[f"{name}@{bars}"]
+        print(
+            f"  {name:<28} p50 {summary['p50_ms']:>10.2f} ms  p95 {summary['p95_ms']:>10.2f} ms  "
+            f"rss {summary['peak_rss_mb']:>8.1f} MB  db {summary['db_calls']}"
+        )
+        return result
+
+    async def request(self, method: str, path: str, **kwargs) -> Any:
+        response = await self.http.request(method, path, **kwargs)
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {path} 返回 {response.status_code}: {response.text[:200]}")
+        return response
+
+    async def run_size(self, bars: int, generator: SyntheticBars) -> None:
+        print(f"[{self.engine}] {bars} 根K线")
+        csv_path = os.path.join(self.data_dir, f'bench_{bars}.csv')
+        file_size = generator.write_csv(csv_path, bars)
+        try:
+            await self.request('DELETE', '/api/futures/data')
+            await self.bench_ingest(bars, csv_path, file_size)
+        finally:
+            os.remove(csv_path)
+
+        await self.measure('instruments', bars, lambda: self.request('GET', '/api/futures/instruments'), items=1)
+        await self.bench_chart_data(bars)
+        await self.bench_pages(bars)
+        await self.bench_resample(bars)
+
+    async def bench_ingest(self, bars: int, csv_path: str, file_size: int) -> None:
+        """经 FuturesService 流式导入（含预汇总重建），文件从磁盘分块读取"""
+        from fastapi import UploadFile
+
+        async def ingest():
+            with open(csv_path, 'rb') as handle:
+                await self.service.upload_csv_file(UploadFile(file=handle, filename=os.path.basename(csv_path)))
+
+        result = await self.measure('ingest_csv', bars, ingest, items=bars, iterations=1)
+        self.results[f"ingest_csv@{bars}"]['bytes_per_second'] = round(
+            file_size / (result.latencies_ms[0] / 1000), 1
+        )
+
+    async def bench_chart_data(self, bars: int) -> None:
+        cache = self.service.cache
+
+        def cold():
+            cache.clear()
+            self.service.indicators.clear()
+
+        for interval in CHART_INTERVALS:
+            body = {'instrument': SERIES_KEY, 'interval': interval}
+            await self.measure(
+                f'chart_data_cold[{interval}]', bars,
+                lambda: self.request('POST', '/api/futures/chart-data', json=body), items=bars, setup=cold
+            )
+            await self.measure(
+                f'chart_data_warm[{interval}]', bars,
+                lambda: self.request('POST', '/api/futures/chart-data', json=body), items=bars, warmup=1
+            )
+
+        variants = {
+            'chart_data_lttb': {'downsample': 'lttb', 'max_points': 2000},
+            'chart_data_ohlc_2000': {'max_points': 2000},
+            'chart_data_columnar': {'encoding': 'columnar'},
+            'chart_data_binary': {'encoding': 'binary'},
+            'chart_data_indicators': {'indicators': ['MA(20)', 'MACD', 'BOLL', 'RSI', 'KDJ']},
+            'chart_data_category': {'axis': 'category', 'max_points': 2000},
+        }
+        for name, extra in variants.items():
+            body = dict({'instrument': SERIES_KEY, 'interval': '5m'}, **extra)
+            await self.measure(
+                name, bars, lambda: self.request('POST', '/api/futures/chart-data', json=body), items=bars, warmup=1
+            )
+
+    async def bench_pages(self, bars: int) -> None:
+        """游标翻页（最多取前 20 页）与深页码的偏移分页"""
+        pages = max(min(bars // PAGE_SIZE, 20), 1)
+
+        async def walk():
+            cursor = None
+            for _ in range(pages):
+                params = {'instrument': SERIES_KEY, 'page_size': PAGE_SIZE}
+                if cursor:
+                    params['cursor'] = cursor
+                cursor = (await self.request('GET', '/api/futures/data', params=params)).json().get('next_cursor')
+                if not cursor:
+                    break
+
+        await self.measure('data_cursor_pages', bars, walk, items=pages * PAGE_SIZE)
+        deep_page = max(bars // PAGE_SIZE // 2, 1)
+        await self.measure(
+            'data_offset_deep_page', bars,
+            lambda: self.request('GET', '/api/futures/data', params={
+                'instrument': SERIES_KEY, 'page': deep_page, 'page_size': PAGE_SIZE
+            }),
+            items=PAGE_SIZE
+        )
+        await self.measure(
+            'data_count_exact', bars,
+            lambda: self.request('GET', '/api/futures/data', params={
+                'instrument': SERIES_KEY, 'page_size': 1, 'count': 'exact'
+            }),
+            items=1
+        )
+
+    async def bench_resample(self, bars: int) -> None:
+        """直接调用重采样，不含读取"""
+        from services.resample import resample_ohlcv
+
+        series = self.service.storage.read_range(SERIES_KEY)
+        for interval in RESAMPLE_INTERVALS:
+            async def resample(interval=interval):
+                resample_ohlcv(series, interval)
+
+            await self.measure(f'resample[{interval}]', bars, resample, items=len(series))
+
+    async def close(self) -> None:
+        await self.http.aclose()
+
+
+def environment() -> Dict[str, Any]:
+    """记录运行环境，比较基线时提示环境差异"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'commit': commit
+    }
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    max_regression: float,
+    min_delta_ms: float = 1.0
+) -> List[str]:
+    """与基线逐场景比较，返回超过容忍比例的退化项（耗时差小于 min_delta_ms 的视为噪声）"""
+    regressions = []
+    for name, metrics in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            old, new = previous.get(metric), metrics.get(metric)
+            if not old or not new:
+                continue
+            if metric in LATENCY_METRICS:
+                if new - old < min_delta_ms:
+                    continue
+                change = new / old - 1
+            else:
+                if metrics['p50_ms'] - previous['p50_ms'] < min_delta_ms:
+                    continue
+                change = old / new - 1
+            if change > max_regression:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def bench_startup(iterations: int) -> Dict[str, Dict[str, Any]]:
+    """冷启动：每次在全新进程中导入应用、执行启动事件并请求 /livez 与 /readyz"""
+    print("[startup] 冷启动")
+    samples = measure_startup(iterations)
+    peak = max(sample['rss_mb'] for sample in samples)
+    heavy = sorted({name for sample in samples for name in sample['heavy_modules']})
+    phases = {
+        'startup_import': 'import_s',
+        'startup_live': 'live_s',
+        'startup_ready': 'ready_s',
+        'startup_spawn_to_live': 'spawn_to_live_s'
+    }
+    results = {}
+    for name, field_name in phases.items():
+        latencies = [sample[field_name] * 1000 for sample in samples if sample[field_name] is not None]
+        if latencies:
+            result = ScenarioResult(name, 0, latencies, 1, peak_rss_mb=peak, extra={'heavy_modules': heavy})
+            results[name] = result.to_dict()
+            print(f"  {name:<28} p50 {results[name]['p50_ms']:>10.2f} ms  p95 {results[name]['p95_ms']:>10.2f} ms  rss {peak:>8.1f} MB")
+    return results
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    data_dir = tempfile.mkdtemp(prefix='kline-bench-')
+    # 冷启动测量在子进程中进行，先于本进程导入应用
+    startup = bench_startup(args.startup_iterations) if args.startup_iterations else {}
+    runner = BenchmarkRunner(args.engine, args.iterations, data_dir)
+    runner.results.update(startup)
+    generator = SyntheticBars(start=args.start, step_minutes=args.step_minutes, seed=args.seed)
+    try:
+        for bars in args.sizes:
+            await runner.run_size(bars, generator)
+    finally:
+        await runner.close()
+        shutil.rmtree(data_dir, ignore_errors=True)
+    return {
+        'engine': args.engine,
+        'environment': environment(),
+        'peak_rss_mb': round(max_rss_mb(), 1),
+        'results': runner.results
+    }
+
+
+def parse_sizes(text: str) -> List[int]:
+    sizes = []
+    for value in text.split(','):
+        value = value.strip().lower()
+        scale = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+        sizes.append(int(float(value.rstrip('km')) * scale))
+    return sizes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="K线服务基准测试")
+    parser.add_argument('--engine', choices=['local', 'supabase'], default='local',
+                        help="存储引擎，supabase 使用进程内替身（建议不超过数十万根K线）")
+    parser.add_argument('--sizes', type=parse_sizes, default=parse_sizes('10k,100k'),
+                        help="K线规模，逗号分隔，支持 k/m 后缀，如 10k,1m,20m")
+    parser.add_argument('--iterations', type=int, default=5, help="每个读取场景的迭代次数")
+    parser.add_argument('--startup-iterations', type=int, default=3, help="冷启动测量次数，0 表示不测量")
+    parser.add_argument('--start', default='2010-01-04 09:00:00', help="模拟K线起始时间")
+    parser.add_argument('--step-minutes', type=int, default=5, help="模拟K线周期（分钟）")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="结果JSON路径，可作为以后比较的基线")
+    parser.add_argument('--compare', help="基线JSON路径")
+    parser.add_argument('--max-regression', type=float, default=0.2, help="允许的退化比例，默认 20%%")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="小于该耗时差的变化视为噪声")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(report, handle, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        if baseline.get('engine') != report['engine']:
+            print(f"警告: 基线引擎为 {baseline.get('engine')}，当前为 {report['engine']}")
+        regressions = compare(report, baseline, args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("性能退化:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("未发现超过阈值的退化")
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 启动路径上不应加载的重型依赖，出现时记录到结果中
+HEAVY_MODULES = ('pandas', 'supabase', 'postgrest', 'httpx', 'jose', 'cryptography', 'pyarrow')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as handle:
+            return int(handle.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+async def _get(app, path: str) -> int:
+    """不经 HTTP 客户端直接调用 ASGI 应用，返回状态码"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': [(b'host', b'startup')], 'client': ('127.0.0.1', 0), 'server': ('startup', 80)
+    }
+    status = {}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status['code'] = message['status']
+
+    await app(scope, receive, send)
+    return status.get('code', 0)
+
+
+async def _serve(app, started: float, timeout: float) -> Tuple[float, float, Optional[float], List[str]]:
+    async with app.router.lifespan_context(app):
+        if await _get(app, '/livez') != 200:
+            raise RuntimeError("/livez 未返回200")
+        live_at = time.time()
+        live = time.perf_counter() - started
+        # 存活时已加载的重型依赖（就绪检测随后会在后台创建数据库客户端）
+        loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+        ready = None
+        while time.perf_counter() - started < timeout:
+            if await _get(app, '/readyz') == 200:
+                ready = time.perf_counter() - started
+                break
+            await asyncio.sleep(0.005)
+    return live_at, live, ready, loaded
+
+
+def probe(timeout: float = 30.0) -> None:
+    """在全新进程中导入并启动应用，输出各阶段耗时（秒）与内存（JSON单行）"""
+    started = time.perf_counter()
+    from core.database import set_supabase_client
+    from benchmarks.memory_supabase import MemorySupabase
+    set_supabase_client(MemorySupabase())
+    import main
+    imported = time.perf_counter() - started
+    import_rss = _rss_mb()
+    live_at, live, ready, loaded = asyncio.run(_serve(main.app, started, timeout))
+    print(json.dumps({
+        'live_at': live_at,
+        'import_s': imported,
+        'live_s': live,
+        'ready_s': ready,
+        'import_rss_mb': import_rss,
+        'rss_mb': _rss_mb(),
+        'heavy_modules': loaded
+    }))
+
+
+def measure_startup(iterations: int) -> List[Dict[str, Any]]:
+    """启动 iterations 个全新进程测量冷启动，返回每次的测量结果（含从 fork 到存活的总耗时）"""
+    samples = []
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    for _ in range(iterations):
+        spawned = time.time()
+        result = subprocess.run(
+            [sys.executable, '-c', 'from benchmarks.startup import probe; probe()'],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=120
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"启动测量失败: {result.stderr.strip()[-500:]}")
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['spawn_to_live_s'] = sample['live_at'] - spawned
+        samples.append(sample)
+    return samples
@@ -0,0 +1,142 @@
+import csv
+from typing import Iterator, Optional
+import numpy as np
+import pandas as pd
+from services.kline_series import KlineSeries
+from services.trading_calendar import TradingCalendar, get_trading_calendar, trading_times, MS_PER_DAY, MS_PER_MINUTE
+
+# 与上传接口一致的CSV列与时间格式
+CSV_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+CSV_TIME_FORMAT = '%Y%m%d%H%M%S'
+
+
+def csv_times(timestamp: np.ndarray) -> np.ndarray:
+    """毫秒时间戳转为 CSV_TIME_FORMAT 对应的整数（如 20240102090500），比逐个格式化快数倍"""
+    times = timestamp.astype('datetime64[ms]')
+    months = times.astype('datetime64[M]')
+    year = times.astype('datetime64[Y]').astype(np.int64) + 1970
+    month = months.astype(np.int64) % 12 + 1
+    day = (times.astype('datetime64[D]') - months.astype('datetime64[D]')).astype(np.int64) + 1
+    seconds = (timestamp // 1000) % 86400
+    clock = seconds // 3600 * 10000 + seconds // 60 % 60 * 100 + seconds % 60
+    return ((year * 100 + month) * 100 + day) * 1000000 + clock
+
+
+class SyntheticBars:
+    """模拟期货K线生成器
+
+    时间点只落在交易时段内（含夜盘、跳过周末与节假日），并随机缺失单根K线与整个交易日
+    模拟停牌和数据中断；价格为带波动聚集的对数随机游走，休市后的首根K线带跳空，成交量
+    在开盘后放大。按块生成，千万级K线的峰值内存只与块大小有关。
+    """
+
+    def __init__(
+        self,
+        start: str = '2015-01-05 09:00:00',
+        step_minutes: int = 5,
+        price: float = 3500.0,
+        tick_size: float = 1.0,
+        volatility: float = 0.001,
+        missing_rate: float = 0.002,
+        missing_day_rate: float = 0.005,
+        seed: int = 0,
+        calendar: Optional[TradingCalendar] = None
+    ):
+        self.start_ms = int(pd.Timestamp(start).value // 1_000_000)
+        self.step_ms = step_minutes * MS_PER_MINUTE
+        self.price = price
+        self.tick_size = tick_size
+        self.volatility = volatility
+        self.missing_rate = missing_rate
+        self.missing_day_rate = missing_day_rate
+        self.seed = seed
+        self.calendar = calendar or get_trading_calendar()
+
+    def chunks(self, count: int, chunk_size: int = 1_000_000) -> Iterator[KlineSeries]:
+        """按块生成共 count 根K线"""
+        rng = np.random.default_rng(self.seed)
+        cursor = self.start_ms
+        log_price = np.log(self.price)
+        regime_level = 0.0
+        last_time = None
+        produced = 0
+        while produced < count:
+            size = min(chunk_size, count - produced)
+            # 多取一些时间点，抵消随机缺失
+            times = trading_times(self.calendar, cursor, int(size * 1.1) + 16, self.step_ms)
+            cursor = int(times[-1]) + self.step_ms
+            times = times[self._keep(times, rng)][:size]
+            if not len(times):
+                continue
+
+            # 休市间隔（含夜盘与日盘之间、周末）后的首根K线
+            previous = np.concatenate(([last_time if last_time is not None else times[0]], times[:-1]))
+            opening = (times - previous) > self.step_ms
+            if last_time is None:
+                opening[0] = True
+
+            # 对数波动率为缓慢变化的随机过程（波动聚集），开盘后波动放大
+            regime = pd.Series(np.concatenate(([regime_level], rng.standard_normal(len(times))))).ewm(
+                alpha=0.02, adjust=False
+            ).mean().to_numpy()[1:]
+            regime_level = float(regime[-1])
+            sigma = self.volatility * np.exp(5 * regime) * np.where(opening, 2.0, 1.0)
+            shocks = rng.standard_normal(len(times))
+            gaps = np.where(opening, rng.normal(0, 3 * self.volatility, len(times)), 0.0)
+
+            close_log = log_price + np.cumsum(gaps + sigma * shocks)
+            open_log = np.concatenate(([log_price], close_log[:-1])) + gaps
+            log_price = float(close_log[-1])
+            open_price = self._round(np.exp(open_log))
+            close_price = self._round(np.exp(close_log))
+            wick = np.abs(rng.standard_normal((2, len(times)))) * sigma * 0.5
+            high = np.maximum(self._round(np.maximum(open_price, close_price) * np.exp(wick[0])), np.maximum(open_price, close_price))
+            low = np.minimum(self._round(np.minimum(open_price, close_price) * np.exp(-wick[1])), np.minimum(open_price, close_price))
+            volume = np.round(rng.lognormal(7, 0.6, len(times)) * np.where(opening, 3.0, 1.0))
+
+            last_time = int(times[-1])
+            produced += len(times)
+            yield KlineSeries(
+                timestamp=times,
+                open=open_price,
+                high=high,
+                low=low,
+                close=close_price,
+                volume=volume
+            )
+
+    def series(self, count: int) -> KlineSeries:
+        """一次生成 count 根K线"""
+        chunks = list(self.chunks(count))
+        return KlineSeries(**{
+            name: np.concatenate([getattr(chunk, name) for chunk in chunks])
+            for name in ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+        })
+
+    def write_csv(self, path: str, count: int, chunk_size: int = 1_000_000) -> int:
+        """按上传接口的格式写入CSV，返回文件字节数"""
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(CSV_COLUMNS)
+            for chunk in self.chunks(count, chunk_size):
+                writer.writerows(zip(
+                    csv_times(chunk.timestamp).tolist(),
+                    chunk.open.tolist(),
+                    chunk.high.tolist(),
+                    chunk.low.tolist(),
+                    chunk.close.tolist(),
+                    chunk.volume.astype(np.int64).tolist()
+                ))
+            return handle.tell()
+
+    def _keep(self, times: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """去掉节假日、随机缺失的交易日与单根K线"""
+        trading_days = self.calendar.trading_days(times)
+        dates = (times // MS_PER_DAY).astype('datetime64[D]')
+        keep = ~np.isin(dates, self.calendar.holidays) & (rng.random(len(times)) >= self.missing_rate)
+        # 按交易日散列决定整日缺失，跨块保持一致
+        hashed = (trading_days * 2654435761 + self.seed * 40503) % 1000003
+        return keep & (hashed / 1000003 >= self.missing_day_rate)
+
+    def _round(self, prices: np.ndarray) -> np.ndarray:
+        return np.round(prices / self.tick_size) * self.tick_size
@@ -1,9 +1,13 @@
+import hashlib
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+from typing import Any, Dict, Optional, Tuple
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from .config import settings
+from .cache import LRUCache
+from .metrics import register_cache
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -25,11 +29,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.utcnow() + timedelta(minutes=settings.JWT_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
 def verify_token(token: str) -> dict:
     """验证令牌"""
+    # jose 依赖 cryptography，加载较慢，首次验证时再导入
+    from jose import JWTError, jwt
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return payload
@@ -38,4 +45,68 @@ def verify_token(token: str) -> dict:
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的令牌",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+
+class AuthCache:
+    """已验证令牌的缓存：令牌哈希 -> (解码后的payload, 用户行)
+
+    条目在令牌过期与 AUTH_CACHE_TTL_SECONDS 两者较早者失效；按 sub 失效时递增该用户的
+    版本号，旧版本条目在读取时被丢弃。
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.ttl = ttl
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Optional[Tuple[dict, dict]]:
+        """命中时返回 (payload, user)"""
+        entry = self._cache.get(self._key(token))
+        if entry is None:
+            return None
+        payload, user, generation = entry
+        if generation != self.generation(payload.get('sub')):
+            self._cache.pop(self._key(token))
+            return None
+        return payload, user
+
+    def generation(self, sub: Optional[str]) -> int:
+        """查询用户行之前取得版本号，写回时传给 set，避免把失效前读到的旧行写入缓存"""
+        with self._lock:
+            return self._generations.get(sub, 0)
+
+    def set(self, token: str, payload: dict, user: dict, generation: Optional[int] = None) -> None:
+        ttl = self.ttl
+        if payload.get('exp') is not None:
+            ttl = min(ttl, float(payload['exp']) - time.time())
+        if ttl <= 0:
+            return
+        current = self.generation(payload.get('sub'))
+        if generation is not None and generation != current:
+            return
+        self._cache.set(self._key(token), (payload, user, current), ttl=ttl)
+
+    def invalidate(self, sub: Optional[str] = None, token: Optional[str] = None) -> None:
+        """失效指定令牌、指定用户的全部令牌，或（均为空时）清空缓存"""
+        if token is not None:
+            self._cache.pop(self._key(token))
+        if sub is not None:
+            with self._lock:
+                self._generations[sub] = self._generations.get(sub, 0) + 1
+        if token is None and sub is None:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+auth_cache = AuthCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL_SECONDS
+)
+register_cache('auth', auth_cache.stats)
@@ -26,15 +26,100 @@ class Settings(BaseSettings):
             return [host.strip() for host in v.split(',')]
         return v
     
+    # 交易日历配置
+    DEFAULT_EXCHANGE: str = "SHFE"
+    TRADING_HOLIDAYS: str = ""  # 逗号分隔的休市日期，如 2024-02-12,2024-02-13
+    
+    @field_validator('TRADING_HOLIDAYS')
+    @classmethod
+    def parse_trading_holidays(cls, v):
+        if isinstance(v, str):
+            return [day.strip() for day in v.split(',') if day.strip()]
+        return v
+    
+    # 数据库线程池大小（supabase 客户端为同步调用）
+    DB_THREAD_POOL_SIZE: int = 16
+    
+    # K线存储配置：supabase 或 local（本地内存映射列式文件）
+    STORAGE_ENGINE: str = "supabase"
+    LOCAL_STORE_DIR: str = "data/klines"
+    SUPABASE_PAGE_SIZE: int = 1000  # 与 PostgREST 单次返回行数上限一致
+    
+    # K线序列缓存配置
+    SERIES_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    SERIES_CACHE_TTL_SECONDS: int = 300  # 0表示不过期
+    
+    # 技术指标缓存配置
+    INDICATOR_CACHE_MAX_ENTRIES: int = 1024
+    INDICATOR_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # 含结果保留的输入序列
+    INDICATOR_CACHE_TTL_SECONDS: int = 600  # 0表示不过期
+    
+    # 预汇总配置
+    ROLLUP_BUILD_CHUNK_DAYS: int = 30  # 重建汇总时每次读取的原始K线时间跨度
+    
+    # 序列目录配置
+    CATALOG_TTL_SECONDS: int = 300  # 0表示不过期，仅由写路径维护
+    CATALOG_COUNT_METHOD: str = "estimated"  # 目录K线数统计方式：exact 精确；estimated 小序列精确、大序列取执行计划估计；planned 仅取估计
+    
+    # K线推送配置
+    BAR_STREAM_MAX_PENDING: int = 2000  # 单个订阅者积压K线上限，超过后改为通知客户端增量补拉
+    BAR_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    
+    # 逐笔成交聚合配置
+    TICK_FLUSH_BARS: int = 1000  # 已收盘K线达到该数量时立即写入
+    TICK_FLUSH_INTERVAL_SECONDS: float = 1.0  # 定时收盘与写入间隔
+    TICK_CLOSE_GRACE_MS: int = 5000  # 周期结束后等待迟到成交的时间，之后无新成交也收盘
+    
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
-    MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_SIZE: int = 8 * 1024 * 1024 * 1024  # 8GB，上传按块流式解析，不再整体载入内存
+    INGEST_CHUNK_BYTES: int = 4 * 1024 * 1024  # 每次读取并解析的块大小，决定导入峰值内存
+    
+    # 批量写入配置
+    BULK_WRITE_BATCH_SIZE: int = 1000
+    BULK_WRITE_CONCURRENCY: int = 4  # 同时在途的写入批次数
+    BULK_WRITE_MAX_RETRIES: int = 3
+    BULK_WRITE_RETRY_BACKOFF_SECONDS: float = 0.5  # 指数退避的初始间隔
+    
+    # 监控指标配置
+    METRICS_ENABLED: bool = True
+    METRICS_MAX_SERIES_LABELS: int = 200  # 按序列统计行数时保留的不同序列数，其余归入 other
+    
+    # 导出配置
+    EXPORT_CHUNK_ROWS: int = 10000  # 每次从存储读取并编码的K线数（Supabase 存储不超过 SUPABASE_PAGE_SIZE）
+    
+    # HTML报告配置
+    REPORT_DIR: str = "data/reports"  # 按内容哈希缓存生成的报告
+    REPORT_CACHE_MAX_FILES: int = 500
+    REPORT_MAX_POINTS: int = 5000  # 超出时按蜡烛合并降采样
+    REPORT_ECHARTS_JS: str = ""  # 本地 echarts.min.js 路径，设置后内联到报告中（离线可用）
+    REPORT_ECHARTS_URL: str = "https://cdn.jsdelivr.net/npm/echarts@5.4.3/dist/echarts.min.js"
+    
+    # 就绪探针配置（后台检测数据库，/readyz 只返回最近一次结果）
+    READINESS_CHECK_INTERVAL_SECONDS: float = 10.0
+    READINESS_RETRY_SECONDS: float = 1.0  # 未就绪时的重试间隔
+    READINESS_TIMEOUT_SECONDS: float = 2.0
+    
+    # 请求性能剖析配置（令牌为空时关闭）
+    PROFILING_TOKEN: str = ""  # 请求头 X-Profile 或查询参数 profile 等于该令牌时剖析该请求
+    PROFILE_DEFAULT_MODE: str = "sampling"  # sampling（collapsed stacks）或 cprofile（pstats）
+    PROFILE_SAMPLE_INTERVAL_SECONDS: float = 0.005
+    PROFILE_DIR: str = "data/profiles"
+    PROFILE_MAX_FILES: int = 200
     
     # JWT配置
     JWT_SECRET_KEY: str = "your-secret-key-here"
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRE_MINUTES: int = 30
     
+    # 令牌与用户信息缓存配置
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    AUTH_CACHE_TTL_SECONDS: int = 60  # 同时受令牌过期时间约束
+    
+    # 数据集/图表配置归属索引配置
+    OWNERSHIP_CACHE_MAX_USERS: int = 10000
+    OWNERSHIP_CACHE_TTL_SECONDS: int = 300  # 0表示不过期
+    
     class Config:
         env_file = ".env"
 
@@ -1,18 +1,72 @@
-from supabase import create_client, Client
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar
 from .config import settings
+from .metrics import record_db_call
+from .profiling import profiled
 
-# 创建Supabase客户端
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+if TYPE_CHECKING:
+    from supabase import Client
+
+T = TypeVar('T')
+
+# Supabase客户端在首次使用时创建，导入本模块既不加载 supabase 包也不建立连接
+supabase: Optional["Client"] = None
+_client_lock = threading.Lock()
 
 # 获取Supabase客户端实例
-def get_supabase_client() -> Client:
+def get_supabase_client() -> "Client":
+    global supabase
+    if supabase is None:
+        with _client_lock:
+            if supabase is None:
+                from supabase import create_client
+                supabase = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
     return supabase
 
+def set_supabase_client(client: "Client") -> None:
+    """替换全局客户端（基准测试等场景使用本地替身）"""
+    global supabase
+    supabase = client
+
+# 阻塞的数据库调用统一放到固定大小的线程池执行，避免慢查询阻塞事件循环
+_db_executor = ThreadPoolExecutor(max_workers=settings.DB_THREAD_POOL_SIZE, thread_name_prefix='db')
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在数据库线程池中执行阻塞调用（沿用当前上下文，指标可归属到发起请求的路由）"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_db_executor, functools.partial(context.run, profiled(func), *args, **kwargs))
+
+def execute_query(query: Any) -> Any:
+    """执行 supabase 查询并记录耗时"""
+    started = time.perf_counter()
+    try:
+        return query.execute()
+    finally:
+        record_db_call(time.perf_counter() - started)
+
+async def db_execute(query: Any) -> Any:
+    """在数据库线程池中执行已构建好的 supabase 查询"""
+    return await run_db(execute_query, query)
+
+def shutdown_db_executor() -> None:
+    """关闭数据库线程池"""
+    _db_executor.shutdown(wait=False, cancel_futures=True)
+
+def ping() -> None:
+    """执行一次最小查询，连接失败时抛出异常（首次调用时创建客户端）"""
+    execute_query(get_supabase_client().table('users').select('id').limit(1))
+
 # 数据库连接测试
 async def test_connection():
     try:
         # 测试连接
-        result = supabase.table('users').select('*').limit(1).execute()
+        await run_db(ping)
         return True
     except Exception as e:
         print(f"数据库连接失败: {e}")
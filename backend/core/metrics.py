@@ -0,0 +1,239 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from core.config import settings
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 响应大小直方图的桶上界（字节）
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 当前请求的 ASGI scope，路由匹配后其中的 route 即为路由模板；不在请求内时为 None
+_request_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('request_scope', default=None)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """按标签分组的计数器"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self, lines: List[str]) -> None:
+        lines.append(f'# HELP {self.name} {self.documentation}')
+        lines.append(f'# TYPE {self.name} counter')
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}')
+
+
+class Histogram:
+    """按标签分组的直方图，输出累积桶、总和与次数"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # 标签 -> [各桶计数（非累积，末位为 +Inf）, 总和]
+        self._values: Dict[Labels, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Labels, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def render(self, lines: List[str]) -> None:
+        lines.append(f'# HELP {self.name} {self.documentation}')
+        lines.append(f'# TYPE {self.name} histogram')
+        with self._lock:
+            values = sorted((labels, list(counts), total) for labels, (counts, total) in self._values.items())
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labels, labels)} {cumulative}')
+
+
+class MetricsRegistry:
+    """进程内指标，以 Prometheus 文本格式输出
+
+    多进程部署时每个 worker 各自统计，由 Prometheus 按实例分别抓取后聚合。序列标签
+    （数据集id/合约周期）最多保留 max_series_labels 个不同值，其余归入 other。
+    """
+
+    def __init__(self, max_series_labels: int):
+        self.max_series_labels = max_series_labels
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'HTTP请求耗时（至响应体发送完毕）',
+            ('method', 'route', 'status'), LATENCY_BUCKETS
+        )
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'HTTP响应体字节数', ('method', 'route'), SIZE_BUCKETS
+        )
+        self.db_duration = Histogram(
+            'supabase_call_duration_seconds', 'Supabase查询耗时', ('route',), LATENCY_BUCKETS
+        )
+        self.rows_fetched = Counter('kline_rows_fetched_total', '从存储读取的K线行数', ('route', 'series'))
+        self.rows_returned = Counter('kline_rows_returned_total', '返回给客户端的K线行数', ('route',))
+        self._caches: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._series_labels: set = set()
+        self._lock = threading.Lock()
+
+    def register_cache(self, name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+        """登记缓存，抓取时读取其 stats()（hits/misses/entries/bytes/evictions）"""
+        self._caches[name] = stats
+
+    def series_label(self, key: Optional[str]) -> str:
+        if key is None:
+            return 'all'
+        with self._lock:
+            if key in self._series_labels:
+                return key
+            if len(self._series_labels) < self.max_series_labels:
+                self._series_labels.add(key)
+                return key
+        return 'other'
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (self.request_duration, self.response_size, self.db_duration, self.rows_fetched, self.rows_returned):
+            metric.render(lines)
+        self._render_caches(lines)
+        return '\n'.join(lines) + '\n'
+
+    def _render_caches(self, lines: List[str]) -> None:
+        stats = {}
+        for name, provider in list(self._caches.items()):
+            try:
+                stats[name] = provider()
+            except Exception:
+                continue
+        series = (
+            ('cache_hits_total', 'counter', '缓存命中次数', 'hits'),
+            ('cache_misses_total', 'counter', '缓存未命中次数', 'misses'),
+            ('cache_hit_ratio', 'gauge', '缓存命中率', 'hit_ratio'),
+            ('cache_entries', 'gauge', '缓存条目数', 'entries'),
+            ('cache_bytes', 'gauge', '缓存占用字节数（按条目计数的缓存为条目数）', 'bytes'),
+            ('cache_evictions_total', 'counter', '缓存淘汰次数', 'evictions'),
+        )
+        for metric, kind, documentation, field in series:
+            lines.append(f'# HELP {metric} {documentation}')
+            lines.append(f'# TYPE {metric} {kind}')
+            for name, values in sorted(stats.items()):
+                if field in values:
+                    lines.append(f'{metric}{_format_labels(("cache",), (name,))} {_format_value(values[field])}')
+
+
+metrics = MetricsRegistry(max_series_labels=settings.METRICS_MAX_SERIES_LABELS)
+
+
+def get_metrics() -> MetricsRegistry:
+    """获取全局指标"""
+    return metrics
+
+
+def current_route() -> str:
+    """当前请求匹配的路由模板；路由前或未匹配为 unmatched，请求之外（后台任务）为 background"""
+    scope = _request_scope.get()
+    if scope is None:
+        return 'background'
+    template = getattr(scope.get('route'), 'path', None)
+    if not template:
+        return 'unmatched'
+    # 部分 FastAPI 版本中 include_router 的路由模板不含前缀，按模板段数从请求路径补齐
+    depth = template.rstrip('/').count('/')
+    segments = scope.get('path', '').rstrip('/').split('/')
+    prefix = '/'.join(segments[:len(segments) - depth])
+    return prefix + template
+
+
+def record_db_call(seconds: float) -> None:
+    metrics.db_duration.observe((current_route(),), seconds)
+
+
+def record_rows_fetched(key: Optional[str], count: int) -> None:
+    metrics.rows_fetched.inc((current_route(), metrics.series_label(key)), count)
+
+
+def record_rows_returned(count: int) -> None:
+    metrics.rows_returned.inc((current_route(),), count)
+
+
+def register_cache(name: str, stats: Callable[[], Dict[str, Any]]) -> None:
+    metrics.register_cache(name, stats)
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时、状态码与响应体字节数
+
+    纯 ASGI 中间件，不缓冲响应体，对 SSE 等流式响应同样适用；耗时统计到最后一块响应体发出。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        state = {'status': 500, 'bytes': 0}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                state['bytes'] += len(message.get('body', b''))
+            await send(message)
+
+        token = _request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = current_route()
+            _request_scope.reset(token)
+            method = scope.get('method', '')
+            metrics.request_duration.observe((method, route, str(state['status'])), time.perf_counter() - started)
+            metrics.response_size.observe((method, route), state['bytes'])
@@ -0,0 +1,285 @@
+import asyncio
+import contextvars
+import cProfile
+import functools
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+from urllib.parse import parse_qs
+from core.config import settings
+
+# sampling：定时采样调用栈，输出 collapsed stacks（可直接生成火焰图）；cprofile：确定性剖析，输出 pstats
+PROFILE_MODES = ('sampling', 'cprofile')
+ARTIFACT_SUFFIX = {'sampling': '.collapsed', 'cprofile': '.pstats'}
+
+_PROFILE_ID = re.compile(r'^[0-9A-Za-z-]+$')
+
+# 获取剖析结果的接口本身不剖析，避免其结果挤掉要查看的剖析
+PROFILES_API_PREFIX = '/api/profiles'
+
+# 当前请求的剖析会话，run_db 据此在数据库线程中同样剖析该请求的调用
+_active_session: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    'profile_session', default=None
+)
+
+
+def _frame_label(code) -> str:
+    path = code.co_filename.replace('\\', '/').split('/')
+    return f"{code.co_name} ({'/'.join(path[-2:])}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """单个请求的剖析
+
+    事件循环线程在请求期间全程剖析（同一时间交错执行的其他请求也会计入），数据库线程只在
+    执行该请求的 run_db 调用时剖析。
+    """
+
+    def __init__(self, profile_id: str, mode: str, method: str, path: str):
+        self.profile_id = profile_id
+        self.mode = mode
+        self.method = method
+        self.path = path
+        self.status = 500
+        self.started_at = datetime.now(timezone.utc)
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        self._profiles: List[cProfile.Profile] = []
+        self._threads: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._loop_thread = threading.get_ident()
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        if self.mode == 'sampling':
+            self._sampler = threading.Thread(target=self._sample_loop, name='profiler', daemon=True)
+            self._sampler.start()
+        else:
+            self._enable(self._new_profile())
+
+    def stop(self) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        elif self._profiles:
+            self._profiles[0].disable()
+
+    def run_in_worker(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在数据库线程中执行并剖析该请求的调用"""
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads.add(thread_id)
+        profile = self._new_profile() if self.mode == 'cprofile' else None
+        enabled = profile is not None and self._enable(profile)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if enabled:
+                profile.disable()
+            with self._lock:
+                self._threads.discard(thread_id)
+
+    def save(self, directory: str) -> Dict[str, Any]:
+        """写入剖析结果与元数据，返回元数据"""
+        os.makedirs(directory, exist_ok=True)
+        artifact = os.path.join(directory, self.profile_id + ARTIFACT_SUFFIX[self.mode])
+        if self.mode == 'sampling':
+            with open(artifact, 'w', encoding='utf-8') as handle:
+                for stack, count in self.stacks.most_common():
+                    handle.write(f'{stack} {count}\n')
+        else:
+            stats = None
+            for profile in self._profiles:
+                if profile.getstats():
+                    stats = pstats.Stats(profile) if stats is None else stats.add(profile)
+            if stats is None:
+                stats = pstats.Stats(self._profiles[0])
+            stats.dump_stats(artifact)
+
+        metadata = {
+            'id': self.profile_id,
+            'mode': self.mode,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration_ms, 3),
+            'samples': self.samples,
+            'artifact': os.path.basename(artifact)
+        }
+        with open(os.path.join(directory, self.profile_id + '.json'), 'w', encoding='utf-8') as handle:
+            json.dump(metadata, handle, ensure_ascii=False)
+        return metadata
+
+    def _new_profile(self) -> cProfile.Profile:
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        return profile
+
+    @staticmethod
+    def _enable(profile: cProfile.Profile) -> bool:
+        # Python 3.12 起剖析器为进程级，已在事件循环线程启用时其他线程的调用已被覆盖
+        try:
+            profile.enable()
+            return True
+        except ValueError:
+            return False
+
+    def _sample_loop(self) -> None:
+        interval = settings.PROFILE_SAMPLE_INTERVAL_SECONDS
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = {self._loop_thread} | self._threads
+            for thread_id in threads:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                labels.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+
+def profiled(func: Callable[..., Any]) -> Callable[..., Any]:
+    """当前请求正在剖析时，包装为在数据库线程中同样剖析的调用"""
+    session = _active_session.get()
+    if session is None:
+        return func
+    return functools.partial(session.run_in_worker, func)
+
+
+def requested_mode(scope: dict) -> Optional[str]:
+    """请求携带正确的剖析令牌时返回剖析模式，否则返回 None（令牌错误不报错，按普通请求处理）"""
+    token = settings.PROFILING_TOKEN
+    if not token or scope.get('path', '').startswith(PROFILES_API_PREFIX):
+        return None
+    headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope.get('headers', [])}
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    provided = headers.get('x-profile') or (query.get('profile') or [''])[0]
+    if not provided or not hmac.compare_digest(provided, token):
+        return None
+    mode = headers.get('x-profile-mode') or (query.get('profile_mode') or [''])[0] or settings.PROFILE_DEFAULT_MODE
+    return mode if mode in PROFILE_MODES else settings.PROFILE_DEFAULT_MODE
+
+
+def new_profile_id() -> str:
+    return datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f') + '-' + secrets.token_hex(4)
+
+
+def artifact_path(profile_id: str) -> Optional[str]:
+    """剖析结果文件路径，不存在或id非法时返回 None"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    for suffix in ARTIFACT_SUFFIX.values():
+        path = os.path.join(settings.PROFILE_DIR, profile_id + suffix)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    """已保存的剖析元数据，最新的在前"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(settings.PROFILE_DIR), reverse=True):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(settings.PROFILE_DIR, name), encoding='utf-8') as handle:
+                    profiles.append(json.load(handle))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def pstats_text(path: str, sort: str = 'cumulative', limit: int = 50) -> str:
+    """pstats 文件的文本摘要"""
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+
+def prune_profiles(directory: str, keep: int) -> None:
+    """只保留最新的 keep 份剖析结果"""
+    names = sorted(name[:-5] for name in os.listdir(directory) if name.endswith('.json'))
+    for profile_id in names[:max(len(names) - keep, 0)]:
+        for suffix in ('.json',) + tuple(ARTIFACT_SUFFIX.values()):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware:
+    """按请求开启剖析：请求头 X-Profile 或查询参数 profile 等于 PROFILING_TOKEN 时剖析该请求
+
+    响应头 X-Profile-Id 返回剖析id，结果保存在 PROFILE_DIR，通过 /api/profiles 获取。
+    确定性剖析同一时间只允许一个请求，避免多个剖析器相互覆盖。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._cprofile_lock: Optional[asyncio.Lock] = None
+
+    async def __call__(self, scope, receive, send):
+        mode = requested_mode(scope) if scope['type'] == 'http' else None
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(new_profile_id(), mode, scope.get('method', ''), scope.get('path', ''))
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                session.status = message['status']
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-id', session.profile_id.encode('ascii')))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        if mode == 'cprofile':
+            if self._cprofile_lock is None:
+                self._cprofile_lock = asyncio.Lock()
+            await self._cprofile_lock.acquire()
+        token = _active_session.set(session)
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            _active_session.reset(token)
+            if mode == 'cprofile':
+                self._cprofile_lock.release()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._store, session)
+
+    @staticmethod
+    def _store(session: ProfileSession) -> None:
+        try:
+            session.save(settings.PROFILE_DIR)
+            prune_profiles(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+        except Exception as e:
+            print(f"保存剖析结果失败: {str(e)}")
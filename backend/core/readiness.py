@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+from core.config import settings
+from core.database import ping
+
+
+def check_local_store() -> None:
+    """本地存储目录存在（不存在时创建）且可写，否则抛出异常"""
+    directory = settings.LOCAL_STORE_DIR
+    os.makedirs(directory, exist_ok=True)
+    if not os.access(directory, os.W_OK):
+        raise Exception(f"本地存储目录不可写: {directory}")
+
+
+class ReadinessProbe:
+    """就绪状态
+
+    后台任务周期性检测K线存储（失败时按更短的间隔重试），探针只读取最近一次结果，
+    不在请求中等待数据库。supabase 引擎检测数据库连通性，首次检测同时完成客户端的创建，
+    避免首个业务请求承担；local 引擎只检测本地存储目录，不依赖 Supabase。检测在独立的
+    单线程中执行，超时的检测不占用数据库线程池，未结束前也不会发起新的检测。
+    """
+
+    def __init__(self, interval: float, retry_interval: float, timeout: float, engine: Optional[str] = None):
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.engine = engine or settings.STORAGE_ENGINE
+        self.ready = False
+        self.error: Optional[str] = "启动中"
+        self.checked_at: Optional[datetime] = None
+        self.latency_ms: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
+
+    def ensure_started(self) -> None:
+        """启动后台检测任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor, self._pending = None, None
+
+    async def check(self) -> bool:
+        """检测一次并更新状态；超时只放弃等待，线程中的检测自行结束，结束前跳过新的检测"""
+        if self._pending is not None and not self._pending.done():
+            self.ready, self.error = False, f"{self._target_name}检测超时，上次检测仍未结束"
+            self.checked_at = datetime.now(timezone.utc)
+            return self.ready
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readiness')
+        started = time.perf_counter()
+        self._pending = self._executor.submit(self._check_target())
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(self._pending), self.timeout)
+            self.ready, self.error = True, None
+        except asyncio.TimeoutError:
+            self.ready, self.error = False, f"{self._target_name}检测超时（{self.timeout}秒）"
+        except Exception as e:
+            self.ready, self.error = False, f"{self._failure}: {str(e)}"
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.checked_at = datetime.now(timezone.utc)
+        return self.ready
+
+    def status(self) -> Dict[str, Any]:
+        if self.engine == 'local':
+            database = 'not_required'
+        else:
+            database = 'connected' if self.ready else 'disconnected'
+        return {
+            'ready': self.ready,
+            'storage': self.engine,
+            'database': database,
+            'error': self.error,
+            'checked_at': self.checked_at.isoformat() if self.checked_at else None,
+            'latency_ms': self.latency_ms
+        }
+
+    @property
+    def _target_name(self) -> str:
+        return '本地存储' if self.engine == 'local' else '数据库'
+
+    @property
+    def _failure(self) -> str:
+        return '本地存储不可用' if self.engine == 'local' else '数据库连接失败'
+
+    def _check_target(self) -> Callable[[], None]:
+        return check_local_store if self.engine == 'local' else ping
+
+    async def _run(self) -> None:
+        while True:
+            ready = await self.check()
+            await asyncio.sleep(self.interval if ready else self.retry_interval)
+
+
+_readiness: Optional[ReadinessProbe] = None
+
+
+def get_readiness() -> ReadinessProbe:
+    """获取全局就绪状态"""
+    global _readiness
+    if _readiness is None:
+        _readiness = ReadinessProbe(
+            settings.READINESS_CHECK_INTERVAL_SECONDS,
+            settings.READINESS_RETRY_SECONDS,
+            settings.READINESS_TIMEOUT_SECONDS
+        )
+    return _readiness
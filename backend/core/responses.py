@@ -0,0 +1,38 @@
+import json
+from typing import Any
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，缺失时退回标准库
+    orjson = None
+
+
+def _json_default(value: Any) -> Any:
+    """标准库 json 无法直接处理的 numpy 类型"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为紧凑的UTF-8 JSON，优先使用 orjson，支持 numpy 数组与标量"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(',', ':'),
+        default=_json_default
+    ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """跳过模型校验、直接序列化的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
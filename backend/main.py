@@ -4,10 +4,15 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, JSONResponse
 from core.config import settings
-from core.database import test_connection
-from api import auth, data, charts
+from core.metrics import MetricsMiddleware, get_metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from core.profiling import ProfilingMiddleware
+from core.database import test_connection, shutdown_db_executor
+from core.readiness import get_readiness
+from api import auth, data, charts, profiles
 from api.routes import futures
+from services.tick_aggregator import get_tick_aggregator
 
 app = FastAPI(title=settings.APP_NAME, debug=settings.DEBUG)
 
@@ -20,10 +25,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按请求开启的性能剖析（配置 PROFILING_TOKEN 后生效）
+if settings.PROFILING_TOKEN:
+    app.add_middleware(ProfilingMiddleware)
+
+# 请求耗时/响应大小指标，最外层以覆盖完整的请求处理
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # 注册路由
 app.include_router(auth.router, prefix="/api")
 app.include_router(data.router, prefix="/api")
 app.include_router(charts.router, prefix="/api")
+app.include_router(profiles.router, prefix="/api")
 app.include_router(futures.router, prefix="/api/futures")
 
 @app.get("/")
@@ -40,20 +54,36 @@ async def health_check():
         "message": "期货数据可视化API服务状态"
     }
 
+@app.get("/livez")
+async def livez():
+    """存活探针：进程能处理请求即为存活，不检查外部依赖"""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readyz():
+    """就绪探针：返回后台存储检测（数据库或本地存储目录）的最近结果，未就绪时为503"""
+    state = get_readiness().status()
+    return JSONResponse(state, status_code=200 if state['ready'] else 503)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 文本格式的监控指标"""
+    return PlainTextResponse(get_metrics().render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
     print(f"🚀 {settings.APP_NAME} 正在启动...")
-    db_status = await test_connection()
-    if db_status:
-        print("✅ 数据库连接成功")
-    else:
-        print("❌ 数据库连接失败")
+    # 数据库检测放到后台，不阻塞启动；就绪状态见 /readyz
+    get_readiness().ensure_started()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
     print(f"🛑 {settings.APP_NAME} 正在关闭...")
+    await get_readiness().stop()
+    await get_tick_aggregator().stop()
+    shutdown_db_executor()
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Literal
 from datetime import datetime
 
 class FuturesData(BaseModel):
@@ -17,21 +17,49 @@ class FuturesData(BaseModel):
 class FuturesDataResponse(BaseModel):
     """期货数据响应模型"""
     data: List[FuturesData]
-    total: int
+    total: Optional[int] = None  # 仅在请求count时返回
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # 下一页游标，为空表示没有更多数据
     
 class ChartDataRequest(BaseModel):
     """图表数据请求模型"""
     instrument: str = Field(..., description="合约代码")
     start_time: Optional[datetime] = Field(None, description="开始时间")
     end_time: Optional[datetime] = Field(None, description="结束时间")
-    interval: str = Field("5m", description="时间间隔")
+    interval: Literal["1m", "5m", "15m", "30m", "1h", "4h", "1d", "session"] = Field("5m", description="时间间隔，服务端按该周期重采样")
+    exchange: Optional[str] = Field(None, description="交易所代码，决定交易日与交易时段划分")
+    axis: Literal["time", "category"] = Field("time", description="横轴类型，category时返回无间隙类目轴标签")
+    max_points: Optional[int] = Field(None, ge=3, description="最大返回点数，超出时服务端保形降采样")
+    downsample: Literal["ohlc", "lttb"] = Field("ohlc", description="降采样方法：ohlc按桶合并蜡烛，lttb按收盘价选点")
+    encoding: Literal["rows", "columnar", "binary"] = Field("rows", description="响应编码：rows行数组，columnar列式JSON，binary小端float64列")
+    since: Optional[int] = Field(None, description="增量水位（毫秒时间戳），只返回该时间及之后的K线，通常取上次响应的watermark")
+    indicators: Optional[List[str]] = Field(None, description="技术指标，如 MA(20)、EMA(12)、MACD(12,26,9)、BOLL(20,2)、RSI(14)、ATR(14)、KDJ(9,3,3)")
     
 class ChartDataResponse(BaseModel):
     """图表数据响应模型"""
     instrument: str
     data: List[List[float]]  # [timestamp, open, close, low, high, volume]
+    categories: Optional[List[str]] = None  # 类目轴标签，与data一一对应
+    watermark: Optional[int] = None  # 最后一根K线的时间戳，作为下次增量请求的since
+    indicators: Optional[Dict[str, Dict[str, List[Optional[float]]]]] = None  # {指标: {输出列: 值}}，与data一一对应
+    
+class TickData(BaseModel):
+    """逐笔成交模型"""
+    instrument: str = Field(..., description="合约代码")
+    time: datetime = Field(..., description="成交时间")
+    price: float = Field(..., description="成交价")
+    size: float = Field(0, ge=0, description="成交量")
+    
+class TickBatchRequest(BaseModel):
+    """逐笔成交批量写入请求模型"""
+    ticks: List[TickData]
+    
+class TickBatchResponse(BaseModel):
+    """逐笔成交批量写入响应模型"""
+    accepted: int
+    late_ticks: int  # 累计丢弃的迟到成交
+    pending_bars: int  # 已收盘待写入的K线数
     
 class UploadResponse(BaseModel):
     """文件上传响应模型"""
@@ -0,0 +1,153 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set
+from core.config import settings
+from core.responses import dumps
+from services.kline_series import KlineSeries
+
+# (序列键, 周期, 起始时间戳) -> 包含起始时间戳所在周期及之后的K线
+BarResolver = Callable[[str, str, int], Awaitable[KlineSeries]]
+
+
+class BarSubscription:
+    """单个订阅者的待推送K线
+
+    待推送K线按时间戳合并，慢消费者只会收到每根K线的最新版本；积压超过 max_pending 时
+    丢弃积压并改为推送一次 resync，由客户端按 since 增量补拉。
+    """
+
+    def __init__(self, key: str, interval: str, max_pending: int):
+        self.key = key
+        self.interval = interval
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending: Dict[float, List[float]] = {}
+        self._resync_from: Optional[int] = None
+        self._ready = asyncio.Event()
+
+    def offer(self, rows: List[List[float]]) -> None:
+        """加入待推送K线（行格式与 chart-data 一致，首列为时间戳）"""
+        if not rows:
+            return
+        if self._resync_from is not None:
+            self._resync_from = min(self._resync_from, int(rows[0][0]))
+        else:
+            for row in rows:
+                self._pending[row[0]] = row
+            if len(self._pending) > self.max_pending:
+                self.resync(int(min(self._pending)))
+                return
+        self._ready.set()
+
+    def resync(self, since: int) -> None:
+        """放弃积压，通知客户端从 since 起重新拉取"""
+        self._pending.clear()
+        self._resync_from = since if self._resync_from is None else min(self._resync_from, since)
+        self.dropped += 1
+        self._ready.set()
+
+    async def next_event(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """等待下一条事件，超时返回 None"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        self._ready.clear()
+        payload = {'instrument': self.key, 'interval': self.interval}
+        if self._resync_from is not None:
+            payload['since'] = self._resync_from
+            self._resync_from = None
+            return {'event': 'resync', 'data': payload}
+        rows = [self._pending[timestamp] for timestamp in sorted(self._pending)]
+        self._pending.clear()
+        payload['data'] = rows
+        payload['watermark'] = int(rows[-1][0])
+        return {'event': 'bars', 'data': payload}
+
+
+class BarBus:
+    """K线推送总线：写入方发布一次，按 (序列键, 周期) 聚合一次后扇出给全部订阅者
+
+    仅在事件循环内调用；订阅关系保存在当前进程内。
+    """
+
+    def __init__(self, max_pending: int, resolver: Optional[BarResolver] = None):
+        self.max_pending = max_pending
+        self._resolver = resolver
+        self._topics: Dict[str, Dict[str, Set[BarSubscription]]] = {}
+
+    def set_resolver(self, resolver: BarResolver) -> None:
+        self._resolver = resolver
+
+    def subscribe(self, key: str, interval: str) -> BarSubscription:
+        subscription = BarSubscription(key, interval, self.max_pending)
+        self._topics.setdefault(key, {}).setdefault(interval, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: BarSubscription) -> None:
+        topics = self._topics.get(subscription.key, {})
+        subscribers = topics.get(subscription.interval)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del topics[subscription.interval]
+        if not topics:
+            self._topics.pop(subscription.key, None)
+
+    def subscriber_count(self, key: Optional[str] = None) -> int:
+        keys = [key] if key is not None else list(self._topics)
+        return sum(len(subscribers) for k in keys for subscribers in self._topics.get(k, {}).values())
+
+    async def publish(self, key: str, since_ms: int, bar_count: int = 1) -> None:
+        """通知序列自 since_ms 起写入了 bar_count 根原始K线，无订阅者时立即返回"""
+        topics = self._topics.get(key)
+        if not topics or bar_count <= 0:
+            return
+        for interval, subscribers in list(topics.items()):
+            if bar_count > self.max_pending or self._resolver is None:
+                # 批量导入等大批写入不逐根推送
+                for subscription in list(subscribers):
+                    subscription.resync(since_ms)
+                continue
+            try:
+                rows = (await self._resolver(key, interval, since_ms)).to_chart_rows()
+            except Exception:
+                for subscription in list(subscribers):
+                    subscription.resync(since_ms)
+                continue
+            for subscription in list(subscribers):
+                subscription.offer(rows)
+
+    def resync(self, key: Optional[str] = None, since: int = 0) -> None:
+        """数据被删除或重写时通知订阅者重新拉取"""
+        for topic_key in ([key] if key is not None else list(self._topics)):
+            for subscribers in self._topics.get(topic_key, {}).values():
+                for subscription in list(subscribers):
+                    subscription.resync(since)
+
+
+async def sse_events(
+    bus: BarBus,
+    subscription: BarSubscription,
+    is_disconnected: Callable[[], Awaitable[bool]],
+    heartbeat: Optional[float] = None
+) -> AsyncIterator[bytes]:
+    """将订阅转换为 Server-Sent Events 字节流，空闲时发送注释行心跳"""
+    heartbeat = heartbeat or settings.BAR_STREAM_HEARTBEAT_SECONDS
+    try:
+        yield b'retry: 3000\n\n'
+        while not await is_disconnected():
+            event = await subscription.next_event(timeout=heartbeat)
+            if event is None:
+                yield b': keep-alive\n\n'
+                continue
+            yield b'event: ' + event['event'].encode('ascii') + b'\ndata: ' + dumps(event['data']) + b'\n\n'
+    finally:
+        bus.unsubscribe(subscription)
+
+
+bar_bus = BarBus(max_pending=settings.BAR_STREAM_MAX_PENDING)
+
+
+def get_bar_bus() -> BarBus:
+    """获取全局K线推送总线"""
+    return bar_bus
@@ -0,0 +1,108 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Set
+from core.config import settings
+from core.database import run_db
+from services.kline_series import KlineSeries
+from services.storage import KlineStorage
+
+
+@dataclass
+class BulkWriteProgress:
+    """批量写入进度"""
+    batches_total: int = 0
+    batches_done: int = 0
+    batches_failed: int = 0
+    rows_submitted: int = 0
+    rows_written: int = 0
+    retries: int = 0
+
+
+class BulkWriteError(Exception):
+    """部分批次在重试后仍写入失败"""
+
+    def __init__(self, progress: BulkWriteProgress, errors: List[BaseException]):
+        self.progress = progress
+        self.errors = errors
+        super().__init__(
+            f"{progress.batches_failed}/{progress.batches_total} 个批次写入失败，"
+            f"已写入 {progress.rows_written} 行: {errors[0]}"
+        )
+
+
+class BulkWriter:
+    """分批、限并发、按批重试的K线写入器
+
+    submit() 把序列切成 batch_size 行的批次并调度到数据库线程池执行阻塞写入，在途批次数
+    达到上限时等待，使上游解析自然受到背压；flush() 等待全部批次完成，任一批次重试
+    耗尽后抛出 BulkWriteError（其余批次仍会写完）。存储的 append 按 (序列键, 时间) 幂等写入，
+    请求超时但服务端已提交的批次被重试时不会重复写入。
+    """
+
+    def __init__(
+        self,
+        storage: KlineStorage,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+        on_progress: Optional[Callable[[BulkWriteProgress], None]] = None
+    ):
+        self.storage = storage
+        self.batch_size = batch_size or settings.BULK_WRITE_BATCH_SIZE
+        concurrency = concurrency or settings.BULK_WRITE_CONCURRENCY
+        # 存储声明了写入并发上限时（如本地文件需按序追加）以其为准
+        if storage.max_concurrent_writes:
+            concurrency = min(concurrency, storage.max_concurrent_writes)
+        self.concurrency = concurrency
+        self.max_retries = settings.BULK_WRITE_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = settings.BULK_WRITE_RETRY_BACKOFF_SECONDS if retry_backoff is None else retry_backoff
+        self.on_progress = on_progress
+        self.progress = BulkWriteProgress()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._errors: List[BaseException] = []
+
+    async def submit(self, key: str, series: KlineSeries) -> None:
+        """切分并调度写入，在途批次已满时等待空位"""
+        for start in range(0, len(series), self.batch_size):
+            batch = series.take(slice(start, start + self.batch_size))
+            await self._semaphore.acquire()
+            self.progress.batches_total += 1
+            self.progress.rows_submitted += len(batch)
+            task = asyncio.create_task(self._write(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> BulkWriteProgress:
+        """等待全部在途批次完成"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        if self._errors:
+            raise BulkWriteError(self.progress, self._errors)
+        return self.progress
+
+    async def write(self, key: str, series: KlineSeries) -> BulkWriteProgress:
+        """一次性写入完整序列"""
+        await self.submit(key, series)
+        return await self.flush()
+
+    async def _write(self, key: str, batch: KlineSeries) -> None:
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    await run_db(self.storage.append, key, batch)
+                    self.progress.rows_written += len(batch)
+                    break
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        self.progress.batches_failed += 1
+                        self._errors.append(e)
+                        break
+                    self.progress.retries += 1
+                    await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+            self.progress.batches_done += 1
+            if self.on_progress:
+                self.on_progress(self.progress)
+        finally:
+            self._semaphore.release()
@@ -0,0 +1,137 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from core.config import settings
+from services.resample import INTERVAL_SECONDS
+from services.storage import get_kline_storage
+
+
+def split_series_key(key: str) -> Tuple[str, Optional[str]]:
+    """序列键拆分为 (合约, 周期)：'RB_5m' -> ('RB', '5m')，'5m' -> ('5m', '5m')"""
+    if key in INTERVAL_SECONDS:
+        return key, key
+    instrument, _, interval = key.rpartition('_')
+    if instrument and interval in INTERVAL_SECONDS:
+        return instrument, interval
+    return key, None
+
+
+@dataclass
+class CatalogEntry:
+    """单个序列的目录信息"""
+    key: str
+    bar_count: int
+    first_timestamp: int
+    last_timestamp: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        instrument, timeframe = split_series_key(self.key)
+        return {
+            'key': self.key,
+            'instrument': instrument,
+            'timeframe': timeframe,
+            'bar_count': self.bar_count,
+            'first_timestamp': self.first_timestamp,
+            'last_timestamp': self.last_timestamp
+        }
+
+
+class SeriesCatalog:
+    """按命名空间维护的序列目录（首末时间、K线数），常驻内存
+
+    首次访问某命名空间时通过存储层的键跳跃扫描与逐序列摘要建立目录，此后由导入、
+    清空等写路径按序列增量刷新；超过 CATALOG_TTL_SECONDS 后重新建立，以收敛其他
+    进程的写入。K线数按 CATALOG_COUNT_METHOD 统计，默认大序列只取执行计划估计，
+    刷新不会对每个序列做全量计数。
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[str, CatalogEntry]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def entries(self, namespace: str) -> List[CatalogEntry]:
+        """命名空间内全部序列，按键排序"""
+        self._ensure_loaded(namespace)
+        with self._lock:
+            entries = self._entries.get(namespace, {})
+            return [entries[key] for key in sorted(entries)]
+
+    def keys(self, namespace: str) -> List[str]:
+        return [entry.key for entry in self.entries(namespace)]
+
+    def entry(self, namespace: str, key: str) -> Optional[CatalogEntry]:
+        """单个序列的目录信息，未登记时只摘要该序列"""
+        with self._lock:
+            entry = self._entries.get(namespace, {}).get(key)
+            loaded = namespace in self._loaded_at
+        if entry is None and not loaded:
+            entry = self.refresh(namespace, key)
+        return entry
+
+    def refresh(self, namespace: str, key: str) -> Optional[CatalogEntry]:
+        """从存储层重新摘要单个序列（耗时与K线数无关）"""
+        summary = get_kline_storage(namespace).summary(key, settings.CATALOG_COUNT_METHOD)
+        with self._lock:
+            entries = self._entries.setdefault(namespace, {})
+            if summary is None:
+                entries.pop(key, None)
+                return None
+            entries[key] = CatalogEntry(key, *summary)
+            return entries[key]
+
+    def extend(self, namespace: str, key: str, bar_count: int, first_ms: int, last_ms: int) -> None:
+        """追加写入新K线后就地更新目录，不查询存储"""
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if entries is None:
+                # 尚未建立目录，首次访问时会包含该序列
+                return
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = CatalogEntry(key, bar_count, first_ms, last_ms)
+            else:
+                entry.bar_count += bar_count
+                entry.first_timestamp = min(entry.first_timestamp, first_ms)
+                entry.last_timestamp = max(entry.last_timestamp, last_ms)
+
+    def remove(self, namespace: str, key: Optional[str] = None) -> None:
+        """序列被删除后移除（key 为空时清空命名空间）"""
+        with self._lock:
+            if key is None:
+                self._entries[namespace] = {}
+            else:
+                self._entries.get(namespace, {}).pop(key, None)
+
+    def invalidate(self, namespace: Optional[str] = None) -> None:
+        """丢弃目录，下次访问时重新建立"""
+        with self._lock:
+            for name in ([namespace] if namespace else list(self._loaded_at)):
+                self._loaded_at.pop(name, None)
+                self._entries.pop(name, None)
+
+    def _ensure_loaded(self, namespace: str) -> None:
+        with self._lock:
+            loaded_at = self._loaded_at.get(namespace)
+        if loaded_at is not None and (not self.ttl or time.monotonic() - loaded_at < self.ttl):
+            return
+
+        storage = get_kline_storage(namespace)
+        entries = {}
+        for key in storage.keys():
+            summary = storage.summary(key, settings.CATALOG_COUNT_METHOD)
+            if summary is not None:
+                entries[key] = CatalogEntry(key, *summary)
+        with self._lock:
+            self._entries[namespace] = entries
+            self._loaded_at[namespace] = time.monotonic()
+
+
+series_catalog = SeriesCatalog(ttl=settings.CATALOG_TTL_SECONDS or None)
+
+
+def get_series_catalog() -> SeriesCatalog:
+    """获取全局序列目录"""
+    return series_catalog
@@ -0,0 +1,126 @@
+from typing import Tuple
+import numpy as np
+from services.kline_series import KlineSeries
+from services.resample import aggregate_by_key, group_starts
+
+DOWNSAMPLE_METHODS = ('ohlc', 'lttb')
+
+# LTTB 每块计算的点数
+LTTB_BLOCK_POINTS = 16384
+
+
+def ohlc_bucket_keys(length: int, max_points: int) -> np.ndarray:
+    """把 length 根K线均分为 max_points 个连续分桶"""
+    return (np.arange(length, dtype=np.int64) * max_points) // length
+
+
+def _segment_argmax(values: np.ndarray, starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """每个连续分段内最大值的首个下标（与 np.argmax 的取法一致）"""
+    maxima = np.repeat(np.maximum.reduceat(values, starts), counts)
+    positions = np.flatnonzero(values == maxima)
+    return positions[np.searchsorted(positions, starts)]
+
+
+def _select_points(
+    x: np.ndarray,
+    y: np.ndarray,
+    starts: np.ndarray,
+    sizes: np.ndarray,
+    anchor_x: np.ndarray,
+    anchor_y: np.ndarray,
+    next_x: np.ndarray,
+    next_y: np.ndarray
+) -> np.ndarray:
+    """一组桶内与 (锚点, 下一个桶均值点) 围成三角形面积最大的点的下标"""
+    segment_starts = np.cumsum(sizes) - sizes
+    points = np.arange(sizes.sum()) + np.repeat(starts - segment_starts, sizes)
+    ax = np.repeat(anchor_x, sizes)
+    ay = np.repeat(anchor_y, sizes)
+    areas = ax - np.repeat(next_x, sizes)
+    areas *= y[points] - ay
+    ax -= x[points]
+    ax *= np.repeat(next_y, sizes) - ay
+    areas -= ax
+    np.abs(areas, out=areas)
+    # 缺失价格的面积为 NaN，视为最小
+    np.nan_to_num(areas, copy=False, nan=-1.0)
+    return points[_segment_argmax(areas, segment_starts, sizes)]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets 选点，返回保留点的下标
+
+    每个桶的锚点是上一个桶选中的点。所有桶的三角形面积一次向量化计算，锚点变化后
+    只重算受影响的桶，直到选点不再变化；第一个桶的锚点固定，每轮至少确定一个桶，
+    结果与逐桶顺序计算的 LTTB 完全一致，通常几轮即收敛。
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+
+    # 首尾固定，中间点均分为 threshold-2 个桶
+    buckets = threshold - 2
+    edges = 1 + (np.arange(threshold - 1, dtype=np.int64) * (length - 2)) // buckets
+    counts = np.diff(edges)
+    starts = edges[:-1] - 1
+    middle_x = x[1:length - 1]
+    middle_y = y[1:length - 1]
+    mean_x = np.add.reduceat(middle_x, starts) / counts
+    mean_y = np.add.reduceat(middle_y, starts) / counts
+    # 每个桶的第三个顶点：下一个桶的均值点，最后一个桶用末点
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    # 首轮以上一个桶的均值点近似锚点
+    anchor_x = np.append(x[0], mean_x[:-1])
+    anchor_y = np.append(y[0], mean_y[:-1])
+    chosen = np.zeros(buckets, dtype=np.int64)
+    anchors = np.full(buckets, -1, dtype=np.int64)
+    active = np.arange(buckets)
+    while len(active):
+        # 只重算锚点变化的桶；按块处理，临时数组保持在缓存大小以内
+        sizes = counts[active]
+        ends = np.cumsum(sizes)
+        first = 0
+        while first < len(active):
+            limit = ends[first] - sizes[first] + LTTB_BLOCK_POINTS
+            last = max(first + 1, int(np.searchsorted(ends, limit, side='right')))
+            block = active[first:last]
+            chosen[block] = 1 + _select_points(
+                middle_x, middle_y, starts[block], sizes[first:last],
+                anchor_x[block], anchor_y[block], next_x[block], next_y[block]
+            )
+            first = last
+
+        updated = np.append(0, chosen[:-1])
+        active = np.flatnonzero(updated != anchors)
+        anchors = updated
+        anchor_x, anchor_y = x[anchors], y[anchors]
+
+    return np.concatenate(([0], chosen, [length - 1]))
+
+
+def downsample_ohlcv(
+    series: KlineSeries,
+    max_points: int,
+    method: str = 'ohlc'
+) -> Tuple[KlineSeries, np.ndarray]:
+    """保形降采样，返回降采样后的序列及每个点对应的原始下标
+
+    ohlc: 按桶合并蜡烛（首开、最高、最低、末收），保留每个桶的极值；
+    lttb: 按收盘价做LTTB选点，适合折线图。
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的降采样方法: {method}")
+    if max_points is None or len(series) <= max_points:
+        return series, np.arange(len(series))
+
+    if method == 'lttb':
+        index = lttb_indices(series.timestamp, series.close, max_points)
+        return series.take(index), index
+
+    keys = ohlc_bucket_keys(len(series), max_points)
+    return aggregate_by_key(series, keys), group_starts(keys)
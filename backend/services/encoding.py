@@ -0,0 +1,81 @@
+import struct
+from urllib.parse import quote
+from typing import Optional, List, Dict, Any
+import numpy as np
+from fastapi.responses import Response
+from core.responses import FastJSONResponse
+from services.kline_series import KlineSeries
+
+CHART_ENCODINGS = ('rows', 'columnar', 'binary')
+
+# 二进制格式：16字节头 + 6列小端 float64（t, o, h, l, c, v）+ 可选的附加列（如指标）
+# 头部：magic(4s) | version(u16) | column_count(u16) | length(u32) | reserved(u32)
+BINARY_MAGIC = b'KLN1'
+BINARY_VERSION = 1
+BINARY_COLUMNS = ('t', 'o', 'h', 'l', 'c', 'v')
+BINARY_HEADER = struct.Struct('<4sHHII')
+BINARY_MEDIA_TYPE = 'application/vnd.kline+octet-stream'
+
+
+def to_columnar(series: KlineSeries) -> Dict[str, List[float]]:
+    """列式字典 {t, o, h, l, c, v}"""
+    return {
+        't': series.timestamp.tolist(),
+        'o': series.open.tolist(),
+        'h': series.high.tolist(),
+        'l': series.low.tolist(),
+        'c': series.close.tolist(),
+        'v': series.volume.tolist()
+    }
+
+
+def to_binary(series: KlineSeries, extra_columns: Optional[Dict[str, np.ndarray]] = None) -> bytes:
+    """编码为带头部的小端 float64 列数组，前端可直接映射为 Float64Array"""
+    columns = [series.timestamp, series.open, series.high, series.low, series.close, series.volume]
+    columns.extend((extra_columns or {}).values())
+    header = BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(columns), len(series), 0)
+    return header + b''.join(np.ascontiguousarray(column, dtype='<f8').tobytes() for column in columns)
+
+
+def from_binary(payload: bytes) -> KlineSeries:
+    """解析二进制格式（用于校验与测试）"""
+    magic, version, column_count, length, _ = BINARY_HEADER.unpack_from(payload)
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("不支持的二进制K线格式")
+    values = np.frombuffer(payload, dtype='<f8', offset=BINARY_HEADER.size, count=column_count * length)
+    columns = values.reshape(column_count, length)
+    return KlineSeries(
+        timestamp=columns[0].astype(np.int64),
+        open=columns[1].copy(),
+        high=columns[2].copy(),
+        low=columns[3].copy(),
+        close=columns[4].copy(),
+        volume=columns[5].copy()
+    )
+
+
+def encode_series_response(
+    series: KlineSeries,
+    encoding: str,
+    instrument: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None
+) -> Response:
+    """按请求的编码直接构造响应，跳过逐元素的模型校验"""
+    if encoding == 'binary':
+        extra_columns = (extra or {}).get('columns')
+        names = BINARY_COLUMNS + tuple(extra_columns or ())
+        headers = {'X-Kline-Columns': quote(','.join(names), safe=',')}
+        if instrument:
+            headers['X-Instrument'] = quote(instrument)
+        if extra and extra.get('watermark') is not None:
+            headers['X-Kline-Watermark'] = str(extra['watermark'])
+        return Response(content=to_binary(series, extra_columns), media_type=BINARY_MEDIA_TYPE, headers=headers)
+
+    if encoding == 'columnar':
+        content: Dict[str, Any] = {'instrument': instrument} if instrument is not None else {}
+        content.update(to_columnar(series))
+        if extra:
+            content.update(extra)
+        return FastJSONResponse(content=content)
+
+    raise ValueError(f"不支持的编码: {encoding}")
@@ -0,0 +1,169 @@
+import re
+import zlib
+from typing import AsyncIterator, Iterator, List, Optional
+import numpy as np
+from core.config import settings
+from core.database import run_db
+from core.metrics import record_rows_returned
+from core.responses import dumps
+from services.kline_series import KlineSeries, MIN_TIMESTAMP, MAX_TIMESTAMP
+from services.storage import KlineStorage
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'parquet')
+
+EXPORT_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+
+def _float_strings(values: np.ndarray) -> List[str]:
+    # 最短往返表示，与 JSON 输出一致；NaN 输出为空
+    return ['' if value != value else repr(value) for value in values.tolist()]
+
+
+class _ParquetSink:
+    """ParquetWriter 的输出目标，每写完一个行组即取出已生成的字节"""
+
+    def __init__(self):
+        self.closed = False
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self._parts = b''.join(self._parts), []
+        return data
+
+
+class ExportEncoder:
+    """把K线块编码为导出格式，每次返回可直接发送的字节
+
+    csv/ndjson 可选整体 gzip（流式压缩，输出为标准 .gz 文件）；parquet 每块写为一个行组，
+    compress 时使用 Parquet 内置的 gzip 编码而不是再包一层。
+    """
+
+    def __init__(self, fmt: str, compress: bool = False):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.fmt = fmt
+        self.compress = compress
+        self.rows = 0
+        self._started = False
+        self._gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress and fmt != 'parquet' else None
+        self._writer = None
+        if fmt == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ValueError("Parquet 导出需要安装 pyarrow")
+            self._pa = pa
+            self._sink = _ParquetSink()
+            self._schema = pa.schema([
+                ('time', pa.timestamp('ms', tz='UTC')),
+                ('open', pa.float64()),
+                ('high', pa.float64()),
+                ('low', pa.float64()),
+                ('close', pa.float64()),
+                ('volume', pa.float64())
+            ])
+            self._writer = pq.ParquetWriter(self._sink, self._schema, compression='gzip' if compress else 'snappy')
+
+    @property
+    def media_type(self) -> str:
+        return 'application/gzip' if self._gzip is not None else MEDIA_TYPES[self.fmt]
+
+    @property
+    def extension(self) -> str:
+        return self.fmt + ('.gz' if self._gzip is not None else '')
+
+    def encode(self, series: KlineSeries) -> bytes:
+        self.rows += len(series)
+        if self.fmt == 'parquet':
+            times = np.asarray(series.timestamp).astype('datetime64[ms]')
+            arrays = [self._pa.array(times, type=self._schema.field('time').type)]
+            arrays += [self._pa.array(np.asarray(getattr(series, name))) for name in EXPORT_COLUMNS[1:]]
+            self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+            return self._sink.drain()
+
+        data = self._encode_text(series)
+        if not self._started:
+            self._started = True
+            if self.fmt == 'csv':
+                data = (','.join(EXPORT_COLUMNS) + '\n').encode('utf-8') + data
+        return self._gzip.compress(data) if self._gzip is not None else data
+
+    def finish(self) -> bytes:
+        """结束输出：补全表头（空结果时）、gzip 尾部或 Parquet 文件尾"""
+        if self.fmt == 'parquet':
+            self._writer.close()
+            return self._sink.drain()
+        data = b''
+        if not self._started and self.fmt == 'csv':
+            data = (','.join(EXPORT_COLUMNS) + '\n').encode('utf-8')
+        self._started = True
+        if self._gzip is not None:
+            return self._gzip.compress(data) + self._gzip.flush()
+        return data
+
+    def _encode_text(self, series: KlineSeries) -> bytes:
+        if not len(series):
+            return b''
+        times = series.iso_times()
+        if self.fmt == 'ndjson':
+            rows = zip(times, *(getattr(series, name).tolist() for name in EXPORT_COLUMNS[1:]))
+            return b''.join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b'\n' for row in rows)
+        columns = [times] + [_float_strings(np.asarray(getattr(series, name))) for name in EXPORT_COLUMNS[1:]]
+        return ('\n'.join(map(','.join, zip(*columns))) + '\n').encode('utf-8')
+
+
+def export_filename(key: str, encoder: ExportEncoder) -> str:
+    """下载文件名，键中的非安全字符替换为下划线"""
+    return f"{re.sub(r'[^0-9A-Za-z_.@-]', '_', key)}.{encoder.extension}"
+
+
+def _next_block(chunks: Iterator[KlineSeries], encoder: ExportEncoder) -> Optional[bytes]:
+    """读取并编码下一块，全部读完时返回 None"""
+    for series in chunks:
+        record_rows_returned(len(series))
+        data = encoder.encode(series)
+        if data:
+            return data
+    return None
+
+
+async def stream_export(
+    storage: KlineStorage,
+    key: str,
+    encoder: ExportEncoder,
+    start_ms: int = MIN_TIMESTAMP,
+    end_ms: int = MAX_TIMESTAMP
+) -> AsyncIterator[bytes]:
+    """逐块读取并编码序列，读取与编码都在数据库线程池中执行，事件循环只负责发送"""
+    chunks = storage.iter_range(key, start_ms, end_ms, settings.EXPORT_CHUNK_ROWS)
+    while True:
+        data = await run_db(_next_block, chunks, encoder)
+        if data is None:
+            break
+        yield data
+    tail = await run_db(encoder.finish)
+    if tail:
+        yield tail
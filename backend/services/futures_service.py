@@ -1,20 +1,60 @@
-import pandas as pd
-from typing import Optional, List, Dict, Any
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
 from datetime import datetime
+import numpy as np
 from fastapi import UploadFile
-from core.database import get_supabase_client
-from models.futures import (
-    FuturesData,
-    FuturesDataResponse,
-    ChartDataRequest,
-    ChartDataResponse,
-    UploadResponse
-)
-import io
+from fastapi.responses import Response
+from models.futures import ChartDataRequest, UploadResponse
+from core.config import settings
+from core.database import run_db
+from core.metrics import record_rows_returned
+from core.responses import FastJSONResponse
+from services.kline_series import KlineSeries, to_epoch_ms, MIN_TIMESTAMP, MAX_TIMESTAMP
+from services.resample import resample_ohlcv, parse_interval, CALENDAR_INTERVALS, INTERVAL_SECONDS
+from services.downsample import downsample_ohlcv
+from services.trading_calendar import TradingCalendar, get_trading_calendar, category_labels
+from services.encoding import encode_series_response
+from services.series_cache import get_series_cache, FUTURES_NAMESPACE
+from services.storage import get_kline_storage, PageCursor
+from services.ingest import ingest_csv, UploadTooLargeError
+from services.catalog import get_series_catalog
+from services.bar_bus import get_bar_bus
+from services.indicators import get_indicator_cache, parse_indicators, indicator_payload
+from services.rollups import get_rollup_pyramid
+from services.export import ExportEncoder, stream_export
+from services.report import render_report, default_title
+import json
+import base64
+
+# 日线/时段线的增量回看窗口：覆盖交易日夜盘到日盘之间的周末与节假日间隔
+CALENDAR_LOOKBACK_MS = 7 * 24 * 3600 * 1000
+
+def encode_cursor(timestamp_ms: int, row_id: str) -> str:
+    """将 (时间戳, id) 编码为不透明的分页游标"""
+    raw = json.dumps([int(timestamp_ms), str(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> PageCursor:
+    """解析分页游标"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp_ms, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return int(timestamp_ms), str(row_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+def since_index(series: KlineSeries, since_ms: int) -> int:
+    """since 所在K线的下标：since 为水位时即水位K线本身，为任意原始K线时间时为其所在周期"""
+    return max(int(np.searchsorted(series.timestamp, since_ms, side='right')) - 1, 0)
 
 class FuturesService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.storage = get_kline_storage(FUTURES_NAMESPACE)
+        self.cache = get_series_cache()
+        self.catalog = get_series_catalog()
+        self.bus = get_bar_bus()
+        self.indicators = get_indicator_cache()
+        self.rollups = get_rollup_pyramid()
+        self.bus.set_resolver(self.bars_since)
     
     async def get_futures_data(
         self,
@@ -22,161 +62,359 @@ class FuturesService:
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
         page: int = 1,
-        page_size: int = 100
-    ) -> FuturesDataResponse:
-        """获取期货数据"""
+        page_size: int = 100,
+        cursor: Optional[str] = None,
+        count: Optional[str] = None
+    ) -> Response:
+        """获取期货数据，按 (datetime, id) 键集分页，返回与 FuturesDataResponse 结构一致的JSON"""
+        after = decode_cursor(cursor) if cursor else None
+        
         try:
-            # 构建查询
-            query = self.supabase.table('kline_data').select('*')
+            start_ms = to_epoch_ms(start_time, MIN_TIMESTAMP)
+            end_ms = to_epoch_ms(end_time, MAX_TIMESTAMP)
             
-            if start_time:
-                query = query.gte('datetime', start_time.isoformat())
-            if end_time:
-                query = query.lte('datetime', end_time.isoformat())
+            # 总数仅在请求时由存储层统计（exact/estimated），不传输数据行
+            total = None
+            if count:
+                total = await run_db(self.storage.count, instrument, start_ms, end_ms, method=count)
             
-            # 获取总数
-            count_result = query.execute()
-            total = len(count_result.data) if count_result.data else 0
-            
-            # 分页查询
-            start = (page - 1) * page_size
-            end = start + page_size - 1
-            
-            result = query.order('datetime').range(start, end).execute()
+            # 游标分页定位到上一页最后一行之后，耗时与页深无关；页码分页作为兼容
+            # 多取一行用于判断是否还有下一页
+            rows, keys, values = await run_db(
+                self.storage.read_page,
+                instrument,
+                start_ms,
+                end_ms,
+                limit=page_size + 1,
+                after=after,
+                offset=(page - 1) * page_size,
+                columns=('dataset_id',)
+            )
             
-            if not result.data:
-                return FuturesDataResponse(
-                    data=[],
-                    total=0,
-                    page=page,
-                    page_size=page_size
-                )
+            next_cursor = None
+            if len(rows) > page_size:
+                rows = rows.take(slice(0, page_size))
+                keys = keys[:page_size]
+                values = {column: column_values[:page_size] for column, column_values in values.items()}
+                next_cursor = encode_cursor(rows.timestamp[-1], rows.ids[-1])
+            record_rows_returned(len(rows))
             
-            data = []
-            for row in result.data:
-                data.append(FuturesData(
-                    instrument=row.get('dataset_id', 'unknown'),
-                    time=datetime.fromisoformat(row['datetime'].replace('Z', '+00:00')),
-                    interface=row.get('timeframe', 'default'),
-                    open=float(row['open_price']),
-                    high=float(row['high_price']),
-                    low=float(row['low_price']),
-                    close=float(row['close_price']),
-                    volume=int(row['volume']),
-                    open_interest=None
-                ))
+            # 按列向量化生成行字典并直接序列化，跳过逐行模型构造与响应校验
+            columns = {
+                'instrument': [dataset_id or 'unknown' for dataset_id in values['dataset_id'].tolist()],
+                'time': rows.iso_times(),
+                'interface': [key or 'default' for key in keys.tolist()],
+                'open': rows.open.tolist(),
+                'high': rows.high.tolist(),
+                'low': rows.low.tolist(),
+                'close': rows.close.tolist(),
+                'volume': rows.volume.astype(np.int64).tolist(),
+                'open_interest': [None] * len(rows)
+            }
+            names = list(columns)
+            data = [dict(zip(names, values)) for values in zip(*columns.values())]
             
-            return FuturesDataResponse(
-                data=data,
-                total=total,
-                page=page,
-                page_size=page_size
-            )
+            return FastJSONResponse(content={
+                'data': data,
+                'total': total,
+                'page': page,
+                'page_size': page_size,
+                'next_cursor': next_cursor
+            })
         except Exception as e:
             raise Exception(f"获取期货数据失败: {str(e)}")
     
-    async def get_chart_data(self, request: ChartDataRequest) -> ChartDataResponse:
-        """获取图表数据"""
+    async def get_chart_data(self, request: ChartDataRequest) -> Response:
+        """获取图表数据，按请求的编码直接返回与 ChartDataResponse 结构一致的响应"""
         try:
-            query = self.supabase.table('kline_data').select('*')
+            calendar = get_trading_calendar(request.exchange)
+            start_ms = to_epoch_ms(request.start_time, MIN_TIMESTAMP)
+            end_ms = to_epoch_ms(request.end_time, MAX_TIMESTAMP)
             
-            if request.start_time:
-                query = query.gte('datetime', request.start_time.isoformat())
-            if request.end_time:
-                query = query.lte('datetime', request.end_time.isoformat())
+            specs = parse_indicators(request.indicators) if request.indicators else []
+            indicators = None
+            if specs:
+                # 指标依赖完整历史：在完整区间的重采样序列上（增量）计算后再与返回的K线对齐
+                full = await self._load_resampled(request, calendar, start_ms, end_ms)
+                variant = f"{request.interval}@{calendar.exchange}"
+                results = await run_db(
+                    self.indicators.compute_all,
+                    (FUTURES_NAMESPACE, request.instrument, variant, start_ms, end_ms),
+                    specs,
+                    full
+                )
+                if request.since is not None:
+                    first = since_index(full, max(request.since, start_ms))
+                    series = full.take(slice(first, None))
+                    points = slice(first, None)
+                else:
+                    series, points = full, None
+                    if request.max_points:
+                        series, index = downsample_ohlcv(full, request.max_points, request.downsample)
+                        # 合并蜡烛取每个桶最后一根K线的指标值，LTTB 取选中点
+                        points = index if request.downsample == 'lttb' else np.r_[index[1:], len(full)] - 1
+                indicators = {label: result.outputs(points) for label, result in results.items()}
+            elif request.since is not None:
+                series = await self._load_incremental(request, calendar, start_ms, end_ms)
+            else:
+                level = await run_db(self._zoom_level, request, start_ms, end_ms)
+                if level is not None:
+                    request = request.model_copy(update={'interval': level})
+                series = await self._load_resampled(request, calendar, start_ms, end_ms)
+                if request.max_points:
+                    series, _ = downsample_ohlcv(series, request.max_points, request.downsample)
             
-            result = query.order('datetime').execute()
+            # 水位为返回的最后一根K线时间，客户端下次以此作为 since
+            watermark = int(series.timestamp[-1]) if len(series) else request.since
+            record_rows_returned(len(series))
             
-            data = []
-            for row in result.data:
-                timestamp = int(datetime.fromisoformat(row['datetime'].replace('Z', '+00:00')).timestamp() * 1000)
-                data.append([
-                    timestamp,
-                    float(row['open_price']),
-                    float(row['close_price']),
-                    float(row['low_price']),
-                    float(row['high_price']),
-                    int(row['volume'])
-                ])
+            categories = None
+            if request.axis == 'category':
+                categories = category_labels(series.timestamp, daily=request.interval == '1d')
             
-            return ChartDataResponse(
-                instrument=request.instrument,
-                data=data
-            )
+            if request.encoding != 'rows':
+                extra = {'watermark': watermark}
+                if categories is not None:
+                    extra['categories'] = categories
+                if indicators is not None and request.encoding == 'binary':
+                    # 二进制编码将指标输出作为附加列，列名为 指标.输出列
+                    extra['columns'] = {
+                        f"{label}.{name}": values
+                        for label, columns in indicators.items() for name, values in columns.items()
+                    }
+                elif indicators is not None:
+                    extra['indicators'] = indicator_payload(indicators)
+                return encode_series_response(series, request.encoding, request.instrument, extra)
+            
+            return FastJSONResponse(content={
+                'instrument': request.instrument,
+                'data': series.to_chart_rows(),
+                'categories': categories,
+                'watermark': watermark,
+                'indicators': indicator_payload(indicators) if indicators is not None else None
+            })
+        except ValueError:
+            raise
         except Exception as e:
             raise Exception(f"获取图表数据失败: {str(e)}")
     
-    async def get_instruments(self) -> List[str]:
-        """获取所有合约代码"""
+    async def _load_resampled(
+        self,
+        request: ChartDataRequest,
+        calendar: TradingCalendar,
+        start_ms: int,
+        end_ms: int
+    ) -> KlineSeries:
+        """完整区间的重采样序列，按 周期@交易所 缓存，未命中时从原始序列缓存（支持超集切片）计算"""
+        variant = f"{request.interval}@{calendar.exchange}"
+        series = self.cache.get(FUTURES_NAMESPACE, request.instrument, start_ms, end_ms, variant)
+        if series is None:
+            generation = self.cache.generation(FUTURES_NAMESPACE, request.instrument)
+            raw = await run_db(self._load_source, request.instrument, request.interval, start_ms, end_ms)
+            series = resample_ohlcv(raw, request.interval, calendar)
+            self.cache.set(
+                FUTURES_NAMESPACE, request.instrument, start_ms, end_ms, series,
+                variant=variant, generation=generation
+            )
+        return series
+    
+    async def _load_incremental(
+        self,
+        request: ChartDataRequest,
+        calendar: TradingCalendar,
+        start_ms: int,
+        end_ms: int
+    ) -> KlineSeries:
+        """since 所在周期及之后的K线（含被修订的水位K线），不做降采样
+        
+        完整区间的重采样结果已缓存时直接二分截取；否则只读取水位前一个回看窗口之后的原始K线
+        重新聚合，回看窗口保证水位所在周期的原始K线完整。
+        """
+        since_ms = max(request.since, start_ms)
+        variant = f"{request.interval}@{calendar.exchange}"
+        series = self.cache.get(FUTURES_NAMESPACE, request.instrument, start_ms, end_ms, variant)
+        if series is None:
+            if request.interval in CALENDAR_INTERVALS:
+                lookback_ms = CALENDAR_LOOKBACK_MS
+            else:
+                lookback_ms = parse_interval(request.interval) * 1000
+            load_start = max(start_ms, since_ms - lookback_ms)
+            raw = await run_db(self._load_series, request.instrument, load_start, end_ms, False)
+            series = resample_ohlcv(raw, request.interval, calendar)
+        series = series.slice_range(MIN_TIMESTAMP, end_ms)
+        return series.take(slice(since_index(series, since_ms), None))
+    
+    async def bars_since(self, instrument: str, interval: str, since_ms: int) -> KlineSeries:
+        """since_ms 所在周期及之后的重采样K线，供推送总线按周期聚合一次后扇出"""
+        request = ChartDataRequest(instrument=instrument, interval=interval, since=since_ms)
+        calendar = get_trading_calendar(request.exchange)
+        return await self._load_incremental(request, calendar, MIN_TIMESTAMP, MAX_TIMESTAMP)
+    
+    def _load_source(self, instrument: str, interval: str, start_ms: int, end_ms: int) -> KlineSeries:
+        """重采样的输入：可聚合出目标周期的最粗预汇总，未就绪时为原始K线"""
+        level = self.rollups.select_level(instrument, interval)
+        if level is None:
+            return self._load_series(instrument, start_ms, end_ms)
+        return self.rollups.read(instrument, level, start_ms, end_ms)
+    
+    def _zoom_level(self, request: ChartDataRequest, start_ms: int, end_ms: int) -> Optional[str]:
+        """合并蜡烛降采样时可直接使用比请求周期更粗的汇总，只要其区间内K线数仍不少于 max_points"""
+        if not request.max_points or request.downsample != 'ohlc' or request.interval in CALENDAR_INTERVALS:
+            return None
+        for level in sorted(self.rollups.ready_levels(request.instrument), key=INTERVAL_SECONDS.get, reverse=True):
+            if level in CALENDAR_INTERVALS or INTERVAL_SECONDS[level] <= INTERVAL_SECONDS[request.interval]:
+                continue
+            if self.rollups.estimated_bars(request.instrument, level, start_ms, end_ms) >= request.max_points:
+                return level
+        return None
+    
+    def _load_series(
+        self,
+        instrument: str,
+        start_ms: int,
+        end_ms: int,
+        cache_result: bool = True
+    ) -> KlineSeries:
+        """读取合约的原始K线序列，优先命中缓存"""
+        series = self.cache.get(FUTURES_NAMESPACE, instrument, start_ms, end_ms)
+        if series is not None:
+            return series
+        
+        generation = self.cache.generation(FUTURES_NAMESPACE, instrument)
+        series = self.storage.read_range(instrument, start_ms, end_ms)
+        if cache_result:
+            self.cache.set(FUTURES_NAMESPACE, instrument, start_ms, end_ms, series, generation=generation)
+        return series
+    
+    async def rebuild_rollups(self, instrument: str) -> Dict[str, int]:
+        """完整重建序列的预汇总（用于启用汇总前已导入的数据）"""
         try:
-            # 查询所有不重复的timeframe作为合约类型
-            result = self.supabase.table('kline_data').select('timeframe').execute()
+            return await run_db(self.rollups.rebuild, instrument)
+        except Exception as e:
+            raise Exception(f"重建预汇总失败: {str(e)}")
+        finally:
+            self.cache.invalidate(FUTURES_NAMESPACE, instrument)
+    
+    async def export_data(
+        self,
+        instrument: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        fmt: str = 'csv',
+        compress: bool = False
+    ) -> Tuple[ExportEncoder, AsyncIterator[bytes]]:
+        """流式导出合约K线，返回编码器（媒体类型、扩展名）与字节流"""
+        # 编码器在开始响应前创建，格式不可用（如未安装 pyarrow）时以 ValueError 返回400
+        encoder = await run_db(ExportEncoder, fmt, compress)
+        start_ms = to_epoch_ms(start_time, MIN_TIMESTAMP)
+        end_ms = to_epoch_ms(end_time, MAX_TIMESTAMP)
+        return encoder, stream_export(self.storage, instrument, encoder, start_ms, end_ms)
+    
+    async def get_report(
+        self,
+        request: ChartDataRequest,
+        title: Optional[str] = None
+    ) -> str:
+        """生成独立的 HTML K线报告（按内容哈希缓存在磁盘上），返回文件路径"""
+        try:
+            calendar = get_trading_calendar(request.exchange)
+            start_ms = to_epoch_ms(request.start_time, MIN_TIMESTAMP)
+            end_ms = to_epoch_ms(request.end_time, MAX_TIMESTAMP)
+            # 报告始终按蜡烛合并降采样，保证邮件中的文件大小可控
+            request = request.model_copy(update={
+                'max_points': request.max_points or settings.REPORT_MAX_POINTS,
+                'downsample': 'ohlc'
+            })
             
-            if not result.data:
-                return []
+            interval = request.interval
+            level = await run_db(self._zoom_level, request, start_ms, end_ms)
+            if level is not None:
+                request = request.model_copy(update={'interval': level})
+            series = await self._load_resampled(request, calendar, start_ms, end_ms)
+            series, _ = downsample_ohlcv(series, request.max_points, 'ohlc')
+            record_rows_returned(len(series))
             
-            # 去重并返回
-            instruments = list(set(item['timeframe'] for item in result.data if item.get('timeframe')))
-            return sorted(instruments)
+            title = title or default_title(request.instrument, interval)
+            return await run_db(render_report, series, title, interval in CALENDAR_INTERVALS)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise Exception(f"生成报告失败: {str(e)}")
+    
+    async def get_instruments(self) -> List[str]:
+        """获取所有合约代码"""
+        try:
+            # 由序列目录提供，不再扫描K线表
+            return await run_db(self.catalog.keys, FUTURES_NAMESPACE)
         except Exception as e:
             raise Exception(f"获取合约代码失败: {str(e)}")
     
+    async def get_catalog(self) -> List[Dict[str, Any]]:
+        """获取序列目录：每个序列的合约、周期、首末时间与K线数"""
+        try:
+            entries = await run_db(self.catalog.entries, FUTURES_NAMESPACE)
+            return [entry.to_dict() for entry in entries]
+        except Exception as e:
+            raise Exception(f"获取序列目录失败: {str(e)}")
+    
     async def upload_csv_file(self, file: UploadFile) -> UploadResponse:
-        """上传CSV文件"""
+        """上传CSV文件（按块流式解析并分批写入）"""
+        timeframe = '5m'  # 根据文件名RBHot_5m.csv判断为5分钟数据
+        written = []  # 各批次 (首末时间戳, K线数)，用于更新预汇总与通知推送订阅者
         try:
-            # 读取CSV文件
-            content = await file.read()
-            df = pd.read_csv(io.StringIO(content.decode('utf-8')))
-            
-            # 数据预处理和列名映射
-            df['time'] = pd.to_datetime(df['time'], format='%Y%m%d%H%M%S').dt.strftime('%Y-%m-%dT%H:%M:%S')
-            
-            # 映射CSV列名到数据库列名
-            column_mapping = {
-                'time': 'datetime',
-                'open': 'open_price',
-                'high': 'high_price', 
-                'low': 'low_price',
-                'close': 'close_price',
-                'volume': 'volume'
-            }
-            
-            # 选择需要的列并重命名
-            df_mapped = df[list(column_mapping.keys())].rename(columns=column_mapping)
-            
-            # 添加默认的dataset_id和timeframe
-            df_mapped['dataset_id'] = '550e8400-e29b-41d4-a716-446655440001'
-            df_mapped['timeframe'] = '5m'  # 根据文件名RBHot_5m.csv判断为5分钟数据
-            
-            # 转换为字典列表
-            data_list = df_mapped.to_dict('records')
-            
-            # 批量插入数据库
-            if data_list:
-                # Supabase批量插入
-                result = self.supabase.table('kline_data').insert(data_list).execute()
-                if not result.data:
-                    raise Exception("数据插入失败")
+            result = await ingest_csv(
+                file,
+                self.storage,
+                timeframe,
+                time_column='time',
+                time_format='%Y%m%d%H%M%S',
+                on_batch=lambda series: written.append(
+                    (int(series.timestamp.min()), int(series.timestamp.max()), len(series))
+                )
+            )
+            await run_db(self.catalog.refresh, FUTURES_NAMESPACE, timeframe)
+            if written:
+                # 同步重建受影响时间段的 5m/15m/1h/1d 汇总
+                await run_db(
+                    self.rollups.update,
+                    timeframe,
+                    min(first_ms for first_ms, _, _ in written),
+                    max(last_ms for _, last_ms, _ in written)
+                )
             
             return UploadResponse(
                 message="文件上传成功",
                 filename=file.filename,
-                records_count=len(data_list)
+                records_count=result.records_count
             )
+        except UploadTooLargeError:
+            self.catalog.invalidate(FUTURES_NAMESPACE)
+            raise
         except Exception as e:
+            # 可能已写入部分批次，目录下次访问时重新建立
+            self.catalog.invalidate(FUTURES_NAMESPACE)
             raise Exception(f"文件上传失败: {str(e)}")
+        finally:
+            # 部分批次写入后失败时同样需要失效缓存并通知订阅者
+            self.cache.invalidate(FUTURES_NAMESPACE, timeframe)
+            if written:
+                await self.bus.publish(
+                    timeframe,
+                    min(first_ms for first_ms, _, _ in written),
+                    sum(count for _, _, count in written)
+                )
     
     async def clear_data(self, instrument: Optional[str] = None) -> Dict[str, Any]:
         """清空数据"""
         try:
-            if instrument:
-                # 删除指定timeframe的数据
-                result = self.supabase.table('kline_data').delete().eq('timeframe', instrument).execute()
-            else:
-                # 删除所有数据
-                result = self.supabase.table('kline_data').delete().neq('id', '').execute()
+            # 删除指定timeframe的数据，未指定时删除所有数据
+            deleted = await run_db(self.storage.delete, instrument)
+            await run_db(self.rollups.remove, instrument)
+            self.cache.invalidate(FUTURES_NAMESPACE, instrument)
+            self.catalog.remove(FUTURES_NAMESPACE, instrument)
+            self.bus.resync(instrument)
             
             # 返回删除的记录数
-            return len(result.data) if result.data else 0
+            return deleted
         except Exception as e:
             raise Exception(f"清空数据失败: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,303 @@
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
+from core.cache import LRUCache
+from core.config import settings
+from core.metrics import register_cache
+from services.kline_series import KlineSeries
+
+# 各指标的默认参数
+INDICATOR_DEFAULTS: Dict[str, Tuple[float, ...]] = {
+    'MA': (20,),
+    'EMA': (20,),
+    'MACD': (12, 26, 9),
+    'BOLL': (20, 2),
+    'RSI': (14,),
+    'ATR': (14,),
+    'KDJ': (9, 3, 3),
+}
+
+_SPEC_PATTERN = re.compile(r'^\s*([A-Za-z]+)\s*(?:\(([^)]*)\))?\s*$')
+
+# 指标输出列，以 _ 开头的列为增量计算所需的内部状态，不返回给客户端
+Columns = Dict[str, np.ndarray]
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """指标及其参数，如 MACD(12,26,9)"""
+    name: str
+    params: Tuple[float, ...]
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}({','.join(f'{value:g}' for value in self.params)})"
+
+
+def parse_indicator(text: str) -> IndicatorSpec:
+    """解析指标描述：'MA(20)'、'macd'、'BOLL(20,2)'，缺省参数取默认值"""
+    match = _SPEC_PATTERN.match(text)
+    if not match or match.group(1).upper() not in INDICATOR_DEFAULTS:
+        raise ValueError(f"不支持的指标: {text}")
+    name = match.group(1).upper()
+    defaults = INDICATOR_DEFAULTS[name]
+    raw = [value.strip() for value in (match.group(2) or '').split(',') if value.strip()]
+    if len(raw) > len(defaults):
+        raise ValueError(f"指标参数过多: {text}")
+    try:
+        params = tuple(float(value) for value in raw) + defaults[len(raw):]
+    except ValueError:
+        raise ValueError(f"无效的指标参数: {text}")
+    if any(value <= 0 for value in params):
+        raise ValueError(f"指标参数必须为正数: {text}")
+    # 除布林带宽度外，参数均为周期
+    periods = params if name != 'BOLL' else params[:1]
+    if any(value != int(value) for value in periods):
+        raise ValueError(f"指标周期必须为整数: {text}")
+    return IndicatorSpec(name, params)
+
+
+def parse_indicators(texts: Sequence[str]) -> List[IndicatorSpec]:
+    """解析并去重，保持请求顺序"""
+    specs = []
+    for text in texts:
+        spec = parse_indicator(text)
+        if spec not in specs:
+            specs.append(spec)
+    return specs
+
+
+def _ewm(values: np.ndarray, alpha: float, seed: Optional[float] = None) -> np.ndarray:
+    """y[i] = alpha * x[i] + (1 - alpha) * y[i-1]，给出 seed 时作为 y[-1]"""
+    import pandas as pd
+    if seed is None or np.isnan(seed):
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    extended = np.concatenate(([seed], values))
+    return pd.Series(extended).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _rolling(values: np.ndarray, window: int, start: int, how: str, min_periods: Optional[int] = None) -> np.ndarray:
+    """从 start 起的滚动窗口统计，只读取所需的前 window-1 个历史值"""
+    import pandas as pd
+    offset = max(start - window + 1, 0)
+    rolling = pd.Series(values[offset:]).rolling(window, min_periods=min_periods or window)
+    result = rolling.std(ddof=0) if how == 'std' else getattr(rolling, how)()
+    return result.to_numpy()[start - offset:]
+
+
+def _seed(previous: Optional[Columns], column: str, start: int) -> Optional[float]:
+    if previous is None or start == 0:
+        return None
+    return float(previous[column][start - 1])
+
+
+def _ma(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    return {'ma': _rolling(series.close, int(params[0]), start, 'mean')}
+
+
+def _ema(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    alpha = 2 / (params[0] + 1)
+    return {'ema': _ewm(series.close[start:], alpha, _seed(previous, 'ema', start))}
+
+
+def _macd(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    fast, slow, signal = params
+    close = series.close[start:]
+    fast_ema = _ewm(close, 2 / (fast + 1), _seed(previous, '_fast', start))
+    slow_ema = _ewm(close, 2 / (slow + 1), _seed(previous, '_slow', start))
+    dif = fast_ema - slow_ema
+    dea = _ewm(dif, 2 / (signal + 1), _seed(previous, 'dea', start))
+    return {'dif': dif, 'dea': dea, 'macd': 2 * (dif - dea), '_fast': fast_ema, '_slow': slow_ema}
+
+
+def _boll(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    window, width = int(params[0]), params[1]
+    mid = _rolling(series.close, window, start, 'mean')
+    std = _rolling(series.close, window, start, 'std')
+    return {'mid': mid, 'upper': mid + width * std, 'lower': mid - width * std}
+
+
+def _rsi(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    # 首根K线没有涨跌幅，从第二根开始按 Wilder 平滑
+    first = max(start, 1)
+    delta = series.close[first:] - series.close[first - 1:-1]
+    alpha = 1 / params[0]
+    gain = _ewm(np.maximum(delta, 0), alpha, _seed(previous, '_gain', first) if start else None)
+    loss = _ewm(np.maximum(-delta, 0), alpha, _seed(previous, '_loss', first) if start else None)
+    total = gain + loss
+    rsi = np.divide(100 * gain, total, out=np.full(len(total), 50.0), where=total > 0)
+    if start == 0 and len(series):
+        pad = np.array([np.nan])
+        gain, loss, rsi = (np.concatenate((pad, column)) for column in (gain, loss, rsi))
+    return {'rsi': rsi, '_gain': gain, '_loss': loss}
+
+
+def _atr(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    high, low = series.high[start:], series.low[start:]
+    prev_close = series.close[start - 1:-1] if start else np.concatenate((series.close[:1], series.close[:-1]))
+    true_range = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return {'atr': _ewm(true_range, 1 / params[0], _seed(previous, 'atr', start))}
+
+
+def _kdj(series: KlineSeries, params: Tuple[float, ...], previous: Optional[Columns], start: int) -> Columns:
+    window, k_period, d_period = int(params[0]), params[1], params[2]
+    lowest = _rolling(series.low, window, start, 'min', min_periods=1)
+    highest = _rolling(series.high, window, start, 'max', min_periods=1)
+    spread = highest - lowest
+    rsv = np.divide(
+        (series.close[start:] - lowest) * 100, spread,
+        out=np.full(len(spread), 50.0), where=spread > 0
+    )
+    k = _ewm(rsv, 1 / k_period, _seed(previous, 'k', start) if start else 50.0)
+    d = _ewm(k, 1 / d_period, _seed(previous, 'd', start) if start else 50.0)
+    return {'k': k, 'd': d, 'j': 3 * k - 2 * d}
+
+
+# 每个函数计算 [start, n) 区间的输出，previous 提供 start 之前的输出（递推指标的初值）
+INDICATOR_FUNCTIONS: Dict[str, Callable[..., Columns]] = {
+    'MA': _ma,
+    'EMA': _ema,
+    'MACD': _macd,
+    'BOLL': _boll,
+    'RSI': _rsi,
+    'ATR': _atr,
+    'KDJ': _kdj,
+}
+
+
+@dataclass
+class IndicatorResult:
+    """指标计算结果，保留输入序列用于下次增量计算时比对"""
+    spec: IndicatorSpec
+    series: KlineSeries
+    columns: Columns
+
+    @property
+    def nbytes(self) -> int:
+        """输出列与保留的输入序列的总字节数"""
+        return self.series.nbytes + sum(column.nbytes for column in self.columns.values())
+
+    def outputs(self, index=None) -> Columns:
+        """对外输出列（可按下标或切片选取，用于与降采样/增量结果对齐）"""
+        return {
+            name: column if index is None else column[index]
+            for name, column in self.columns.items() if not name.startswith('_')
+        }
+
+
+def unchanged_prefix(old: KlineSeries, new: KlineSeries) -> int:
+    """两个序列从头开始完全相同（时间与高低收）的K线数"""
+    if old is new:
+        return len(new)
+    length = min(len(old), len(new))
+    changed = (
+        (old.timestamp[:length] != new.timestamp[:length])
+        | (old.high[:length] != new.high[:length])
+        | (old.low[:length] != new.low[:length])
+        | (old.close[:length] != new.close[:length])
+    )
+    positions = np.flatnonzero(changed)
+    return int(positions[0]) if len(positions) else length
+
+
+def compute_indicator(
+    spec: IndicatorSpec,
+    series: KlineSeries,
+    previous: Optional[IndicatorResult] = None
+) -> Tuple[IndicatorResult, int]:
+    """计算指标，给出上次结果时只重算第一根变化的K线及之后的部分，返回 (结果, 重算的K线数)"""
+    start = 0
+    if previous is not None and previous.spec == spec:
+        start = unchanged_prefix(previous.series, series)
+        if start == len(series) == len(previous.series):
+            return previous, 0
+
+    prefix = previous.columns if start else None
+    tail = INDICATOR_FUNCTIONS[spec.name](series, spec.params, prefix, start)
+    if prefix is not None:
+        columns = {name: np.concatenate((prefix[name][:start], values)) for name, values in tail.items()}
+    else:
+        columns = {name: np.asarray(values, dtype=np.float64) for name, values in tail.items()}
+    return IndicatorResult(spec, series, columns), len(series) - start
+
+
+def indicator_payload(results: Dict[str, Columns]) -> Dict[str, Dict[str, List[Optional[float]]]]:
+    """转换为JSON结构 {标签: {列: [值]}}，预热期的 NaN 输出为 null"""
+    payload = {}
+    for label, columns in results.items():
+        payload[label] = {}
+        for name, values in columns.items():
+            values = np.round(values, 6)
+            payload[label][name] = np.where(np.isnan(values), None, values).tolist()
+    return payload
+
+
+class IndicatorCache:
+    """按 (序列, 周期, 区间, 指标参数) 缓存指标结果
+
+    序列缓存因写入失效后，上次的指标结果仍保留作为增量计算的起点：只重算与上次输入
+    不同的第一根K线（通常是被修订的最后一根）及之后的新K线。
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        self._cache = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl=ttl,
+            sizeof=lambda result: result.nbytes
+        )
+        self._lock = threading.Lock()
+        self.full_computations = 0
+        self.incremental_computations = 0
+        self.bars_computed = 0
+
+    def compute(self, key: Hashable, spec: IndicatorSpec, series: KlineSeries) -> IndicatorResult:
+        cache_key = (key, spec)
+        previous = self._cache.get(cache_key)
+        result, computed = compute_indicator(spec, series, previous)
+        if result is not previous:
+            self._cache.set(cache_key, result)
+        with self._lock:
+            if previous is None or computed == len(series):
+                self.full_computations += 1
+            elif computed:
+                self.incremental_computations += 1
+            self.bars_computed += computed
+        return result
+
+    def compute_all(
+        self,
+        key: Hashable,
+        specs: Sequence[IndicatorSpec],
+        series: KlineSeries
+    ) -> Dict[str, IndicatorResult]:
+        return {spec.label: self.compute(key, spec, series) for spec in specs}
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({
+            'full_computations': self.full_computations,
+            'incremental_computations': self.incremental_computations,
+            'bars_computed': self.bars_computed
+        })
+        return stats
+
+
+indicator_cache = IndicatorCache(
+    max_entries=settings.INDICATOR_CACHE_MAX_ENTRIES,
+    max_bytes=settings.INDICATOR_CACHE_MAX_BYTES,
+    ttl=settings.INDICATOR_CACHE_TTL_SECONDS or None
+)
+
+
+register_cache('indicators', indicator_cache.stats)
+
+
+def get_indicator_cache() -> IndicatorCache:
+    """获取全局指标缓存"""
+    return indicator_cache
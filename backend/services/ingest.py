@@ -0,0 +1,131 @@
+import csv
+import io
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional, Sequence
+from fastapi import UploadFile
+from core.config import settings
+from services.kline_series import KlineSeries
+from services.storage import KlineStorage
+from services.bulk_writer import BulkWriter, BulkWriteProgress, BulkWriteError
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过 MAX_FILE_SIZE"""
+
+
+class MissingColumnsError(ValueError):
+    """CSV表头缺少必需列"""
+
+
+@dataclass
+class IngestResult:
+    """流式导入结果"""
+    records_count: int = 0
+    bytes_read: int = 0
+    batches: int = 0
+
+
+class CsvChunkReader:
+    """按固定字节数分块读取上传的CSV，在最后一个换行处切分，逐块解析为 DataFrame
+
+    每块只携带表头与完整行，未完成的行留到下一块，峰值内存与块大小相关而与文件大小无关。
+    """
+
+    def __init__(
+        self,
+        file: UploadFile,
+        chunk_bytes: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        required_columns: Sequence[str] = ()
+    ):
+        self.file = file
+        self.chunk_bytes = chunk_bytes or settings.INGEST_CHUNK_BYTES
+        self.max_bytes = settings.MAX_FILE_SIZE if max_bytes is None else max_bytes
+        self.required_columns = list(required_columns)
+        self.bytes_read = 0
+
+    async def frames(self) -> AsyncIterator["pd.DataFrame"]:
+        import pandas as pd
+
+        header = None
+        pending = b''
+
+        while True:
+            chunk = await self.file.read(self.chunk_bytes)
+            self.bytes_read += len(chunk)
+            if self.max_bytes and self.bytes_read > self.max_bytes:
+                raise UploadTooLargeError(f"文件大小超过限制 {self.max_bytes} 字节")
+            if not chunk:
+                break
+
+            pending += chunk
+            if header is None:
+                newline = pending.find(b'\n')
+                if newline < 0:
+                    continue
+                header, pending = self._parse_header(pending[:newline + 1]), pending[newline + 1:]
+
+            cut = pending.rfind(b'\n')
+            if cut < 0:
+                continue
+            body, pending = pending[:cut + 1], pending[cut + 1:]
+            if body.strip():
+                yield pd.read_csv(io.BytesIO(header + body))
+
+        if header is None:
+            if not pending.strip():
+                raise pd.errors.EmptyDataError("No columns to parse from file")
+            header, pending = self._parse_header(pending + b'\n'), b''
+        if pending.strip():
+            yield pd.read_csv(io.BytesIO(header + pending))
+
+    def _parse_header(self, header: bytes) -> bytes:
+        """按CSV规则解析表头（支持引号、去掉 UTF-8 BOM 与列名两侧空白）并校验必需列，
+        返回规范化后供后续每块复用的表头，使 pandas 看到的列名与校验的一致"""
+        text = header.decode('utf-8').lstrip('\ufeff')
+        columns = [name.strip().lstrip('\ufeff') for name in next(csv.reader([text]), [])]
+        if any(name not in columns for name in self.required_columns):
+            raise MissingColumnsError(f"CSV文件必须包含以下列: {', '.join(self.required_columns)}")
+        line = io.StringIO()
+        csv.writer(line, lineterminator='\n').writerow(columns)
+        return line.getvalue().encode('utf-8')
+
+
+async def ingest_csv(
+    file: UploadFile,
+    storage: KlineStorage,
+    key: str,
+    time_column: str,
+    time_format: Optional[str] = None,
+    required_columns: Sequence[str] = (),
+    on_batch: Optional[Callable[[KlineSeries], None]] = None,
+    on_progress: Optional[Callable[[BulkWriteProgress], None]] = None
+) -> IngestResult:
+    """流式导入CSV：逐块解析为K线序列，经 BulkWriter 分批并发写入存储"""
+    result = IngestResult()
+    reader = CsvChunkReader(file, required_columns=required_columns)
+    writer = BulkWriter(storage, on_progress=on_progress)
+    try:
+        async for frame in reader.frames():
+            series = KlineSeries.from_frame(frame, time_column=time_column, time_format=time_format)
+            del frame
+            if not len(series):
+                continue
+            await writer.submit(key, series)
+            if on_batch:
+                on_batch(series)
+    except Exception:
+        # 解析失败时也等待已提交的批次结束，避免后台任务继续写入，并保留原始错误
+        try:
+            await writer.flush()
+        except BulkWriteError:
+            pass
+        raise
+    progress = await writer.flush()
+    result.records_count = progress.rows_written
+    result.batches = progress.batches_total
+    result.bytes_read = reader.bytes_read
+    return result
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Optional, List, Dict, Any
+import numpy as np
+
+# pandas 只在解析时间字符串与转换 DataFrame 时用到，按需导入以缩短服务启动时间
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 无界区间的端点
+MIN_TIMESTAMP = np.iinfo(np.int64).min
+MAX_TIMESTAMP = np.iinfo(np.int64).max
+
+
+def to_epoch_ms(value: Optional[datetime], default: int) -> int:
+    """datetime 转毫秒时间戳，无时区时按UTC处理（与数据库存储一致）"""
+    if value is None:
+        return default
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+@dataclass
+class KlineSeries:
+    """列式K线序列，时间戳为UTC毫秒"""
+    timestamp: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+    ids: Optional[np.ndarray] = None  # 可选的数据库行id
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @classmethod
+    def empty(cls) -> "KlineSeries":
+        """空序列"""
+        return cls(
+            timestamp=np.empty(0, dtype=np.int64),
+            open=np.empty(0, dtype=np.float64),
+            high=np.empty(0, dtype=np.float64),
+            low=np.empty(0, dtype=np.float64),
+            close=np.empty(0, dtype=np.float64),
+            volume=np.empty(0, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        rows: List[Dict[str, Any]],
+        time_column: str = 'datetime',
+        id_column: Optional[str] = None
+    ) -> "KlineSeries":
+        """从数据库行构建序列，一次性向量化解析时间字符串"""
+        if not rows:
+            return cls.empty()
+        import pandas as pd
+
+        times = pd.to_datetime([row[time_column] for row in rows], utc=True, format='ISO8601')
+        series = cls(
+            timestamp=times.as_unit('ms').asi8.astype(np.int64),
+            open=np.asarray([row['open_price'] for row in rows], dtype=np.float64),
+            high=np.asarray([row['high_price'] for row in rows], dtype=np.float64),
+            low=np.asarray([row['low_price'] for row in rows], dtype=np.float64),
+            close=np.asarray([row['close_price'] for row in rows], dtype=np.float64),
+            volume=np.asarray([row['volume'] or 0 for row in rows], dtype=np.float64),
+            ids=np.asarray([row[id_column] for row in rows], dtype=object) if id_column else None
+        )
+        return series.sorted()
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: "pd.DataFrame",
+        time_column: str = 'time',
+        time_format: Optional[str] = None
+    ) -> "KlineSeries":
+        """从包含 open/high/low/close/volume 列的 DataFrame 构建序列"""
+        if df.empty:
+            return cls.empty()
+        import pandas as pd
+
+        times = pd.to_datetime(df[time_column].astype(str), format=time_format, utc=True)
+        series = cls(
+            timestamp=times.dt.as_unit('ms').astype(np.int64).to_numpy(),
+            open=df['open'].to_numpy(dtype=np.float64),
+            high=df['high'].to_numpy(dtype=np.float64),
+            low=df['low'].to_numpy(dtype=np.float64),
+            close=df['close'].to_numpy(dtype=np.float64),
+            volume=df['volume'].fillna(0).to_numpy(dtype=np.float64)
+        )
+        return series.sorted()
+
+    def take(self, index) -> "KlineSeries":
+        """按下标或切片取子序列"""
+        return KlineSeries(
+            timestamp=self.timestamp[index],
+            open=self.open[index],
+            high=self.high[index],
+            low=self.low[index],
+            close=self.close[index],
+            volume=self.volume[index],
+            ids=self.ids[index] if self.ids is not None else None
+        )
+
+    def slice_range(self, start_ms: int, end_ms: int) -> "KlineSeries":
+        """按闭区间 [start_ms, end_ms] 二分截取"""
+        left = np.searchsorted(self.timestamp, start_ms, side='left')
+        right = np.searchsorted(self.timestamp, end_ms, side='right')
+        if left == 0 and right == len(self):
+            return self
+        return self.take(slice(left, right))
+
+    @property
+    def nbytes(self) -> int:
+        """近似内存占用"""
+        size = sum(column.nbytes for column in (
+            self.timestamp, self.open, self.high, self.low, self.close, self.volume
+        ))
+        if self.ids is not None:
+            size += self.ids.nbytes + 64 * len(self.ids)
+        return size
+
+    def sorted(self) -> "KlineSeries":
+        """保证按时间升序"""
+        if len(self) < 2 or np.all(self.timestamp[1:] >= self.timestamp[:-1]):
+            return self
+        return self.take(np.argsort(self.timestamp, kind='stable'))
+
+    def iso_times(self) -> List[str]:
+        """UTC ISO8601 时间字符串，格式与 pydantic 序列化带时区 datetime 一致"""
+        times = self.timestamp.astype('datetime64[ms]')
+        strings = np.datetime_as_string(times, unit='s')
+        fractional = (self.timestamp % 1000) != 0
+        if fractional.any():
+            # 非整秒时输出6位小数秒
+            strings = np.where(fractional, np.datetime_as_string(times, unit='us'), strings)
+        return [value + 'Z' for value in strings.tolist()]
+
+    def to_chart_rows(self) -> List[List[float]]:
+        """转换为图表行格式 [timestamp, open, close, low, high, volume]"""
+        if not len(self):
+            return []
+        return np.column_stack((
+            self.timestamp.astype(np.float64),
+            self.open,
+            self.close,
+            self.low,
+            self.high,
+            self.volume
+        )).tolist()
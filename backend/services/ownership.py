@@ -0,0 +1,89 @@
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Set
+from core.cache import LRUCache
+from core.config import settings
+from core.database import get_supabase_client, db_execute
+from core.metrics import register_cache
+
+# 受归属校验保护的资源表
+DATASETS_RESOURCE = 'datasets'
+CHART_CONFIGS_RESOURCE = 'chart_configs'
+
+
+class OwnershipIndex:
+    """用户 -> 资源id集合 的内存索引
+
+    首次校验某用户时只查询其全部资源的 id 列并缓存；创建/删除时同步更新。索引中未命中的
+    id 再做一次按主键的单行 id 查询（覆盖其他进程新建的资源），条目按 TTL 过期以收敛
+    其他进程的删除。
+    """
+
+    def __init__(self, table: str, max_users: int, ttl: Optional[float] = None):
+        self.table = table
+        self._cache = LRUCache(max_entries=max_users, ttl=ttl)
+        self._lock = threading.Lock()
+
+    async def owns(self, user_id: str, resource_id: str) -> bool:
+        """判断资源是否属于该用户"""
+        ids = self._cache.get(user_id)
+        if ids is None:
+            ids = await self._load(user_id)
+        if resource_id in ids:
+            return True
+
+        supabase = get_supabase_client()
+        result = await db_execute(
+            supabase.table(self.table).select('id').eq('id', resource_id).eq('user_id', user_id).limit(1)
+        )
+        if not result.data:
+            return False
+        self.add(user_id, resource_id)
+        return True
+
+    def prime(self, user_id: str, resource_ids: Iterable[str]) -> None:
+        """用已查询到的该用户全部资源id填充索引"""
+        self._cache.set(user_id, set(resource_ids))
+
+    def add(self, user_id: str, resource_id: str) -> None:
+        """新建资源后登记（该用户尚未加载时无需处理，懒加载会包含它）"""
+        with self._lock:
+            ids = self._cache.get(user_id, record=False)
+            if ids is not None:
+                ids.add(resource_id)
+
+    def discard(self, user_id: str, resource_id: str) -> None:
+        """删除资源后移除"""
+        with self._lock:
+            ids = self._cache.get(user_id, record=False)
+            if ids is not None:
+                ids.discard(resource_id)
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """失效指定用户（为空时全部）的索引"""
+        if user_id is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(user_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+    async def _load(self, user_id: str) -> Set[str]:
+        supabase = get_supabase_client()
+        result = await db_execute(supabase.table(self.table).select('id').eq('user_id', user_id))
+        ids = {row['id'] for row in result.data or []}
+        self.prime(user_id, ids)
+        return ids
+
+
+@lru_cache(maxsize=None)
+def get_ownership_index(table: str) -> OwnershipIndex:
+    """获取指定资源表的归属索引"""
+    index = OwnershipIndex(
+        table,
+        max_users=settings.OWNERSHIP_CACHE_MAX_USERS,
+        ttl=settings.OWNERSHIP_CACHE_TTL_SECONDS or None
+    )
+    register_cache(f'ownership_{table}', index.stats)
+    return index
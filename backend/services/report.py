@@ -0,0 +1,187 @@
+import hashlib
+import html
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from core.config import settings
+from core.metrics import register_cache
+from core.responses import dumps
+from services.kline_series import KlineSeries
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates', 'kline_report.html')
+
+_PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+# 默认标题中的周期名称
+INTERVAL_NAMES = {
+    '1m': '1分钟', '5m': '5分钟', '15m': '15分钟', '30m': '30分钟',
+    '1h': '1小时', '4h': '4小时', '1d': '日线', 'session': '时段'
+}
+
+
+def default_title(name: str, interval: Optional[str] = None) -> str:
+    period = INTERVAL_NAMES.get(interval, interval) if interval else ''
+    return f"{name} {period}K线图"
+
+
+class ReportTemplate:
+    """预编译的报告模板
+
+    加载时按 {{name}} 占位符切分为静态字节片段，constants 中的占位符在此时直接并入静态片段，
+    渲染只做一次拼接。digest 标识模板与内联的 ECharts 版本，参与报告的内容哈希，模板变化后
+    旧报告自然失效。
+    """
+
+    def __init__(self, source: str, constants: Optional[Dict[str, str]] = None):
+        constants = constants or {}
+        parts = _PLACEHOLDER.split(source)
+        static, names = [parts[0]], []
+        for name, text in zip(parts[1::2], parts[2::2]):
+            if name in constants:
+                static[-1] += constants[name] + text
+            else:
+                names.append(name)
+                static.append(text)
+        self._static = [part.encode('utf-8') for part in static]
+        self._names = names
+        self.digest = hashlib.sha256('\0'.join(static + names).encode('utf-8')).digest()
+
+    def render(self, values: Dict[str, bytes]) -> bytes:
+        chunks = [self._static[0]]
+        for name, static in zip(self._names, self._static[1:]):
+            chunks.append(values[name])
+            chunks.append(static)
+        return b''.join(chunks)
+
+
+def _echarts_tag() -> str:
+    """配置了本地 echarts.min.js 时内联（离线可用，适合邮件附件），否则引用 CDN"""
+    if settings.REPORT_ECHARTS_JS:
+        with open(settings.REPORT_ECHARTS_JS, encoding='utf-8') as handle:
+            return '<script type="text/javascript">' + handle.read().replace('</script', '<\\/script') + '</script>'
+    return f'<script type="text/javascript" src="{html.escape(settings.REPORT_ECHARTS_URL)}"></script>'
+
+
+@lru_cache(maxsize=1)
+def get_report_template() -> ReportTemplate:
+    """加载并预编译报告模板（进程内只做一次）"""
+    with open(TEMPLATE_PATH, encoding='utf-8') as handle:
+        source = handle.read()
+    return ReportTemplate(source, constants={'echarts': _echarts_tag()})
+
+
+def report_data(series: KlineSeries, title: str, daily: bool = False) -> bytes:
+    """报告数据的一次性列式 JSON 序列化，可安全嵌入 <script>"""
+    columns = {
+        name: np.ascontiguousarray(getattr(series, column))
+        for name, column in (('o', 'open'), ('h', 'high'), ('l', 'low'), ('c', 'close'), ('v', 'volume'))
+    }
+    payload = dumps({'title': title, 'daily': daily, 't': np.ascontiguousarray(series.timestamp), **columns})
+    return payload.replace(b'</', b'<\\/')
+
+
+class ReportCache:
+    """按内容哈希保存在磁盘上的报告，超过 max_files 时删除最久未访问的"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, f'{digest}.html')
+
+    def get(self, digest: str) -> Optional[str]:
+        path = self.path(digest)
+        try:
+            # 更新访问时间，淘汰时按其排序
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def put(self, digest: str, content: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(digest)
+        # 先写临时文件再替换，并发生成同一报告时读者不会看到半个文件
+        temp = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp, 'wb') as handle:
+            handle.write(content)
+        os.replace(temp, path)
+        self._prune()
+        return path
+
+    def stats(self) -> Dict[str, Any]:
+        files = self._files()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / total if total else 0.0,
+                'entries': len(files),
+                'bytes': sum(size for _, size, _ in files),
+                'evictions': self.evictions
+            }
+
+    def _files(self) -> List[Tuple[str, int, float]]:
+        """(路径, 字节数, 访问时间)"""
+        if not os.path.isdir(self.directory):
+            return []
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.html'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                files.append((os.path.join(self.directory, name), stat.st_size, stat.st_mtime))
+        return files
+
+    def _prune(self) -> None:
+        files = self._files()
+        if len(files) <= self.max_files:
+            return
+        files.sort(key=lambda item: item[2])
+        for path, _, _ in files[:len(files) - self.max_files]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.evictions += 1
+
+
+_report_cache: Optional[ReportCache] = None
+
+
+def get_report_cache() -> ReportCache:
+    """获取全局报告缓存"""
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = ReportCache(settings.REPORT_DIR, settings.REPORT_CACHE_MAX_FILES)
+        register_cache('reports', _report_cache.stats)
+    return _report_cache
+
+
+def render_report(series: KlineSeries, title: str, daily: bool = False) -> str:
+    """生成独立的 HTML K线报告并返回文件路径；内容相同的报告直接复用磁盘上的文件"""
+    template = get_report_template()
+    data = report_data(series, title, daily)
+    digest = hashlib.sha256(template.digest + data).hexdigest()
+    cache = get_report_cache()
+    path = cache.get(digest)
+    if path is None:
+        content = template.render({'title': html.escape(title).encode('utf-8'), 'data': data})
+        path = cache.put(digest, content)
+    return path
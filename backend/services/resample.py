@@ -0,0 +1,81 @@
+from typing import Optional
+import numpy as np
+from services.kline_series import KlineSeries
+from services.trading_calendar import TradingCalendar, get_trading_calendar, MS_PER_DAY
+
+# 支持的重采样周期（秒）
+INTERVAL_SECONDS = {
+    '1m': 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '30m': 30 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+# 按交易日历而非自然时间切分的周期
+CALENDAR_INTERVALS = ('1d', 'session')
+
+
+def parse_interval(interval: str) -> int:
+    """解析时间间隔，返回秒数"""
+    if interval not in INTERVAL_SECONDS:
+        raise ValueError(f"不支持的时间间隔: {interval}")
+    return INTERVAL_SECONDS[interval]
+
+
+def group_starts(keys: np.ndarray) -> np.ndarray:
+    """每个分组首行的下标"""
+    return np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+
+
+def aggregate_by_key(
+    series: KlineSeries,
+    keys: np.ndarray,
+    bucket_time: Optional[np.ndarray] = None
+) -> KlineSeries:
+    """按相邻相同的分组键聚合OHLCV：首开、最高、最低、末收、量求和"""
+    if not len(series):
+        return series
+
+    starts = group_starts(keys)
+    ends = np.r_[starts[1:], len(series)] - 1
+
+    return KlineSeries(
+        timestamp=series.timestamp[starts] if bucket_time is None else bucket_time,
+        open=series.open[starts],
+        high=np.maximum.reduceat(series.high, starts),
+        low=np.minimum.reduceat(series.low, starts),
+        close=series.close[ends],
+        volume=np.add.reduceat(series.volume, starts),
+        ids=series.ids[starts] if series.ids is not None else None
+    )
+
+
+def resample_ohlcv(
+    series: KlineSeries,
+    interval: str,
+    calendar: Optional[TradingCalendar] = None
+) -> KlineSeries:
+    """将K线重采样到指定周期，日线与时段线按交易日历归属"""
+    if interval in CALENDAR_INTERVALS:
+        if not len(series):
+            return series
+        calendar = calendar or get_trading_calendar()
+        if interval == '1d':
+            keys = calendar.trading_days(series.timestamp)
+            return aggregate_by_key(series, keys, keys[group_starts(keys)] * MS_PER_DAY)
+        return aggregate_by_key(series, calendar.session_keys(series.timestamp))
+
+    step_ms = parse_interval(interval) * 1000
+    if not len(series):
+        return series
+
+    keys = series.timestamp // step_ms
+    starts = group_starts(keys)
+    if len(starts) == len(series) and np.all(series.timestamp % step_ms == 0):
+        # 源数据周期不小于目标周期，无需聚合
+        return series
+
+    return aggregate_by_key(series, keys, keys[starts] * step_ms)
@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from core.config import settings
+from services.catalog import get_series_catalog, split_series_key
+from services.kline_series import KlineSeries, MAX_TIMESTAMP
+from services.resample import INTERVAL_SECONDS, CALENDAR_INTERVALS, resample_ohlcv
+from services.series_cache import get_series_cache, FUTURES_NAMESPACE, ROLLUPS_NAMESPACE
+from services.storage import get_kline_storage
+from services.trading_calendar import TradingCalendar, get_trading_calendar, MS_PER_DAY
+
+# 预汇总的周期，由细到粗
+ROLLUP_LEVELS = ('5m', '15m', '1h', '1d')
+
+# 交易时段的边界都在整刻钟上，只能由不粗于15分钟的汇总聚合
+SESSION_MAX_LEVEL_SECONDS = 15 * 60
+
+# 日线汇总的回看窗口：覆盖交易日夜盘到日盘之间的周末与节假日间隔
+DAILY_LOOKBACK_MS = 7 * MS_PER_DAY
+
+
+def rollup_key(key: str, level: str) -> str:
+    """汇总序列键：'5m' 的小时汇总为 '5m@1h'"""
+    return f"{key}@{level}"
+
+
+def bucket_label(timestamp_ms: int, level: str, calendar: TradingCalendar) -> int:
+    """时间戳所属汇总K线的时间（与 resample_ohlcv 一致）"""
+    if level in CALENDAR_INTERVALS:
+        return int(calendar.trading_days(np.array([timestamp_ms], dtype=np.int64))[0]) * MS_PER_DAY
+    step_ms = INTERVAL_SECONDS[level] * 1000
+    return timestamp_ms // step_ms * step_ms
+
+
+def compatible_levels(interval: str, levels: Sequence[str]) -> List[str]:
+    """可无损聚合出目标周期的汇总周期，由粗到细"""
+    if interval == '1d':
+        candidates = [level for level in levels if level == '1d']
+    elif interval == 'session':
+        candidates = [
+            level for level in levels
+            if level not in CALENDAR_INTERVALS and INTERVAL_SECONDS[level] <= SESSION_MAX_LEVEL_SECONDS
+        ]
+    else:
+        # 定长周期按 时间 // 周期 对齐，细周期整除粗周期时逐级聚合与直接聚合结果相同
+        candidates = [
+            level for level in levels
+            if level not in CALENDAR_INTERVALS and INTERVAL_SECONDS[interval] % INTERVAL_SECONDS[level] == 0
+        ]
+    return sorted(candidates, key=lambda level: INTERVAL_SECONDS[level], reverse=True)
+
+
+class RollupPyramid:
+    """futures 序列的多周期预汇总（5m/15m/1h/1d），存放在 rollups 命名空间
+
+    源序列写入后按受影响的时间段分块重建各级汇总：每块从回看窗口起读取原始K线，重新聚合
+    后替换该块涉及的汇总K线（含被修订的边界K线）。读取时只使用完整覆盖源序列的汇总级别，
+    未建立或落后于源序列时回退到原始K线。
+    """
+
+    def __init__(
+        self,
+        levels: Sequence[str] = ROLLUP_LEVELS,
+        calendar: Optional[TradingCalendar] = None,
+        chunk_ms: Optional[int] = None
+    ):
+        self.levels = tuple(levels)
+        self.calendar = calendar or get_trading_calendar()
+        self.chunk_ms = chunk_ms or settings.ROLLUP_BUILD_CHUNK_DAYS * MS_PER_DAY
+        self.source = get_kline_storage(FUTURES_NAMESPACE)
+        self.storage = get_kline_storage(ROLLUPS_NAMESPACE)
+        self.catalog = get_series_catalog()
+        self.cache = get_series_cache()
+
+    def levels_for(self, key: str) -> List[str]:
+        """比源序列周期更粗的汇总周期"""
+        _, timeframe = split_series_key(key)
+        if timeframe is None:
+            return list(self.levels)
+        return [level for level in self.levels if INTERVAL_SECONDS[level] > INTERVAL_SECONDS[timeframe]]
+
+    def update(self, key: str, start_ms: int, end_ms: int = MAX_TIMESTAMP) -> Dict[str, int]:
+        """源序列在 [start_ms, end_ms] 内有写入后重建受影响的汇总，返回各级写入的K线数"""
+        levels = self.levels_for(key)
+        written = {level: 0 for level in levels}
+        if not levels:
+            return written
+        # 只需要首末时间，K线数取执行计划估计即可
+        summary = self.source.summary(key, count_method='planned')
+        if summary is None:
+            return written
+        end_ms = min(end_ms, summary[2])
+        lookback_ms = max(
+            DAILY_LOOKBACK_MS if level in CALENDAR_INTERVALS else INTERVAL_SECONDS[level] * 1000
+            for level in levels
+        )
+
+        try:
+            chunk_start = max(start_ms, summary[1])
+            while chunk_start <= end_ms:
+                chunk_end = min(chunk_start + self.chunk_ms - 1, end_ms)
+                raw = self.source.read_range(key, chunk_start - lookback_ms, chunk_end)
+                raw.ids = None
+                for level in levels:
+                    written[level] += self._rebuild(key, level, raw, chunk_start, chunk_end)
+                chunk_start = chunk_end + 1
+        except Exception:
+            # 部分重建的汇总可能与源序列不一致，删除后读取回退到原始K线，待重建
+            self.remove(key)
+            raise
+        finally:
+            for level in levels:
+                self.cache.invalidate(ROLLUPS_NAMESPACE, rollup_key(key, level))
+                self.catalog.refresh(ROLLUPS_NAMESPACE, rollup_key(key, level))
+        return written
+
+    def rebuild(self, key: str) -> Dict[str, int]:
+        """删除并完整重建序列的全部汇总"""
+        for level in self.levels_for(key):
+            self.storage.delete(rollup_key(key, level))
+        return self.update(key, 0)
+
+    def remove(self, key: Optional[str] = None) -> None:
+        """源序列被删除后删除其汇总（key 为空时删除全部）"""
+        if key is None:
+            self.storage.delete()
+            self.cache.invalidate(ROLLUPS_NAMESPACE)
+            self.catalog.remove(ROLLUPS_NAMESPACE)
+            return
+        for level in self.levels:
+            self.storage.delete(rollup_key(key, level))
+            self.cache.invalidate(ROLLUPS_NAMESPACE, rollup_key(key, level))
+            self.catalog.remove(ROLLUPS_NAMESPACE, rollup_key(key, level))
+
+    def ready_levels(self, key: str) -> List[str]:
+        """完整覆盖源序列当前首末K线的汇总周期"""
+        source = self.catalog.entry(FUTURES_NAMESPACE, key)
+        if source is None:
+            return []
+        ready = []
+        for level in self.levels_for(key):
+            entry = self.catalog.entry(ROLLUPS_NAMESPACE, rollup_key(key, level))
+            if entry is None:
+                continue
+            if entry.first_timestamp <= bucket_label(source.first_timestamp, level, self.calendar) and \
+                    entry.last_timestamp >= bucket_label(source.last_timestamp, level, self.calendar):
+                ready.append(level)
+        return ready
+
+    def select_level(self, key: str, interval: str) -> Optional[str]:
+        """可聚合出目标周期的最粗已就绪汇总，没有时返回 None（读取原始K线）"""
+        levels = compatible_levels(interval, self.ready_levels(key))
+        return levels[0] if levels else None
+
+    def estimated_bars(self, key: str, level: str, start_ms: int, end_ms: int) -> int:
+        """按汇总序列的平均密度估算区间内的K线数"""
+        entry = self.catalog.entry(ROLLUPS_NAMESPACE, rollup_key(key, level))
+        if entry is None or not entry.bar_count:
+            return 0
+        span = max(entry.last_timestamp - entry.first_timestamp, 1)
+        overlap = min(end_ms, entry.last_timestamp) - max(start_ms, entry.first_timestamp)
+        if overlap < 0:
+            return 0
+        return int(entry.bar_count * min(overlap / span, 1.0)) + 1
+
+    def read(self, key: str, level: str, start_ms: int, end_ms: int) -> KlineSeries:
+        """读取汇总K线，优先命中缓存"""
+        series_key = rollup_key(key, level)
+        series = self.cache.get(ROLLUPS_NAMESPACE, series_key, start_ms, end_ms)
+        if series is not None:
+            return series
+        generation = self.cache.generation(ROLLUPS_NAMESPACE, series_key)
+        series = self.storage.read_range(series_key, start_ms, end_ms)
+        self.cache.set(ROLLUPS_NAMESPACE, series_key, start_ms, end_ms, series, generation=generation)
+        return series
+
+    def _rebuild(self, key: str, level: str, raw: KlineSeries, chunk_start: int, chunk_end: int) -> int:
+        bars = resample_ohlcv(raw, level, self.calendar)
+        first = bucket_label(chunk_start, level, self.calendar)
+        left = int(np.searchsorted(bars.timestamp, first, side='left'))
+        bars = bars.take(slice(left, None))
+        if not len(bars):
+            return 0
+        return self.storage.replace(rollup_key(key, level), bars)
+
+
+_rollup_pyramid: Optional[RollupPyramid] = None
+
+
+def get_rollup_pyramid() -> RollupPyramid:
+    """获取全局预汇总管理器"""
+    global _rollup_pyramid
+    if _rollup_pyramid is None:
+        _rollup_pyramid = RollupPyramid()
+    return _rollup_pyramid
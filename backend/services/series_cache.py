@@ -0,0 +1,133 @@
+import threading
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+from core.cache import LRUCache
+from core.config import settings
+from core.metrics import register_cache
+from services.kline_series import KlineSeries
+
+# 缓存命名空间：futures 按 timeframe 区分序列，datasets 按 dataset_id 区分序列，
+# rollups 为 futures 序列的预汇总，键为 {序列键}@{周期}
+FUTURES_NAMESPACE = 'futures'
+DATASETS_NAMESPACE = 'datasets'
+ROLLUPS_NAMESPACE = 'rollups'
+
+# 原始（未重采样）序列，可用任意覆盖区间的超集切片命中
+RAW_VARIANT = 'raw'
+
+
+class SeriesCache:
+    """已解码K线序列的内存缓存
+
+    键为 (命名空间, 序列键, 变体, 覆盖区间起点, 覆盖区间终点)。原始序列可由覆盖
+    请求区间的超集切片返回；重采样等派生变体仅按完全相同的区间命中。
+    """
+
+    def __init__(self, max_bytes: int, ttl: Optional[float] = None):
+        self._cache = LRUCache(
+            max_bytes=max_bytes,
+            ttl=ttl,
+            sizeof=lambda series: series.nbytes,
+            on_evict=self._forget
+        )
+        self._index: Dict[Tuple[str, str], Set[Hashable]] = {}
+        self._generations: Dict[Tuple[str, Optional[str]], int] = {}
+        self._lock = threading.RLock()
+
+    def generation(self, namespace: str, key: str) -> Tuple[int, int]:
+        """读取数据前获取版本号，写回时校验，避免并发失效后写入过期数据"""
+        with self._lock:
+            return self._generations.get((namespace, None), 0), self._generations.get((namespace, key), 0)
+
+    def get(
+        self,
+        namespace: str,
+        key: str,
+        start_ms: int,
+        end_ms: int,
+        variant: str = RAW_VARIANT
+    ) -> Optional[KlineSeries]:
+        """查找缓存，原始序列支持超集切片"""
+        exact = (namespace, key, variant, start_ms, end_ms)
+        candidate = exact
+        if variant == RAW_VARIANT and exact not in self._candidates(namespace, key):
+            for cache_key in self._candidates(namespace, key):
+                _, _, cached_variant, cached_start, cached_end = cache_key
+                if cached_variant == variant and cached_start <= start_ms and cached_end >= end_ms:
+                    candidate = cache_key
+                    break
+
+        series = self._cache.get(candidate)
+        if series is None:
+            self._forget(candidate)
+            return None
+        if candidate is exact:
+            return series
+        return series.slice_range(start_ms, end_ms)
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        start_ms: int,
+        end_ms: int,
+        series: KlineSeries,
+        variant: str = RAW_VARIANT,
+        generation: Optional[Tuple[int, int]] = None
+    ) -> None:
+        """写入覆盖 [start_ms, end_ms] 的序列"""
+        cache_key = (namespace, key, variant, start_ms, end_ms)
+        with self._lock:
+            if generation is not None and generation != self.generation(namespace, key):
+                return
+            self._index.setdefault((namespace, key), set()).add(cache_key)
+            self._cache.set(cache_key, series)
+
+    def invalidate(self, namespace: str, key: Optional[str] = None) -> int:
+        """失效指定序列（key为空时失效整个命名空间）的全部缓存条目"""
+        with self._lock:
+            generation_key = (namespace, key)
+            self._generations[generation_key] = self._generations.get(generation_key, 0) + 1
+            if key is None:
+                groups = [group for group in self._index if group[0] == namespace]
+            else:
+                groups = [(namespace, key)]
+            cache_keys = [cache_key for group in groups for cache_key in self._index.pop(group, ())]
+            for cache_key in cache_keys:
+                self._cache.pop(cache_key)
+        return len(cache_keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.clear()
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中/淘汰计数"""
+        return self._cache.stats()
+
+    def _candidates(self, namespace: str, key: str) -> Set[Hashable]:
+        with self._lock:
+            return set(self._index.get((namespace, key), ()))
+
+    def _forget(self, cache_key: Hashable, value: Any = None) -> None:
+        namespace, key = cache_key[0], cache_key[1]
+        with self._lock:
+            group = self._index.get((namespace, key))
+            if group is not None:
+                group.discard(cache_key)
+                if not group:
+                    del self._index[(namespace, key)]
+
+
+series_cache = SeriesCache(
+    max_bytes=settings.SERIES_CACHE_MAX_BYTES,
+    ttl=settings.SERIES_CACHE_TTL_SECONDS or None
+)
+
+
+register_cache('series', series_cache.stats)
+
+
+def get_series_cache() -> SeriesCache:
+    """获取全局序列缓存"""
+    return series_cache
@@ -0,0 +1,321 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from core.config import settings
+from services.bar_bus import get_bar_bus
+from services.bulk_writer import BulkWriter
+from services.catalog import get_series_catalog
+from services.kline_series import KlineSeries, MIN_TIMESTAMP
+from services.resample import INTERVAL_SECONDS, CALENDAR_INTERVALS
+from services.series_cache import get_series_cache, FUTURES_NAMESPACE
+from services.storage import KlineStorage, get_kline_storage
+from services.trading_calendar import TradingCalendar, get_trading_calendar, MS_PER_DAY, MS_PER_MINUTE, NIGHT_CUTOFF_MINUTES
+
+logger = logging.getLogger(__name__)
+
+# 逐笔成交实时聚合的周期
+TICK_TIMEFRAMES = ('1m', '5m', '15m', '1h', '1d')
+
+# (合约, 毫秒时间戳, 价格, 成交量)
+Tick = Tuple[str, int, float, float]
+
+
+class BarState:
+    """单个周期正在形成的K线"""
+    __slots__ = ('segment', 'bucket', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, segment: int, bucket: int, price: float, size: float):
+        self.segment = segment
+        self.bucket = bucket
+        self.open = price
+        self.high = price
+        self.low = price
+        self.close = price
+        self.volume = size
+
+    def update(self, price: float, size: float) -> None:
+        if price > self.high:
+            self.high = price
+        elif price < self.low:
+            self.low = price
+        self.close = price
+        self.volume += size
+
+    def to_row(self) -> Tuple[int, float, float, float, float, float]:
+        return self.bucket, self.open, self.high, self.low, self.close, self.volume
+
+
+class TickAggregator:
+    """逐笔成交 -> 多周期K线的实时聚合器
+
+    每个合约每个周期只保留一根正在形成的K线，逐笔更新为 O(1)：定长周期按 时间 // 周期 判断
+    是否换桶，日线先按 自然日+是否夜盘 判断，只有跨段时才查询交易日历。收盘的K线暂存后按
+    批写入 `{合约}_{周期}` 序列，并同步失效缓存、更新目录、通知推送订阅者。早于当前K线或
+    落在已收盘K线内的迟到成交（按最细周期判断）整笔丢弃并计数，各周期都不计入，已收盘的K线不会被重新开启。
+    """
+
+    def __init__(
+        self,
+        storage: KlineStorage,
+        timeframes: Sequence[str] = TICK_TIMEFRAMES,
+        calendar: Optional[TradingCalendar] = None,
+        flush_bars: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        close_grace_ms: Optional[int] = None
+    ):
+        for timeframe in timeframes:
+            if timeframe not in INTERVAL_SECONDS:
+                raise ValueError(f"不支持的聚合周期: {timeframe}")
+        self.storage = storage
+        self.timeframes = tuple(timeframes)
+        self.calendar = calendar or get_trading_calendar()
+        self.flush_bars = flush_bars or settings.TICK_FLUSH_BARS
+        self.flush_interval = flush_interval or settings.TICK_FLUSH_INTERVAL_SECONDS
+        self.close_grace_ms = settings.TICK_CLOSE_GRACE_MS if close_grace_ms is None else close_grace_ms
+        # 日线等按交易日历切分的周期步长记为 0
+        self._steps = [
+            0 if timeframe in CALENDAR_INTERVALS else INTERVAL_SECONDS[timeframe] * 1000
+            for timeframe in self.timeframes
+        ]
+        # 迟到按最细的定长周期判断（全部为日历周期时取第一个）
+        fixed = [index for index, step in enumerate(self._steps) if step]
+        self._finest = min(fixed, key=self._steps.__getitem__) if fixed else 0
+        self._states: Dict[str, List[Optional[BarState]]] = {}
+        self._keys: Dict[str, List[str]] = {}
+        # 各合约各周期最后收盘的K线时间，此后落在其内或更早的成交视为迟到
+        self._closed_buckets: Dict[str, List[int]] = {}
+        # 各合约收到的最新成交时间及其到达时的本地单调时钟（秒）；合约当前时间按
+        # 最新成交时间 + 此后经过的本地时间推算，无新成交的合约也能按时收盘
+        self._clocks: Dict[str, int] = {}
+        self._clock_walls: Dict[str, float] = {}
+        self._closed: Dict[str, List[Tuple]] = {}
+        self._closed_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.cache = get_series_cache()
+        self.catalog = get_series_catalog()
+        self.bus = get_bar_bus()
+        self.clock_ms = 0  # 全部合约中最新的成交时间
+        self.ticks = 0
+        self.late_ticks = 0
+        self.bars_written = 0
+
+    def add_tick(self, instrument: str, time_ms: int, price: float, size: float = 0.0) -> None:
+        """聚合一笔成交"""
+        states = self._states.get(instrument)
+        if states is None:
+            states = self._states[instrument] = [None] * len(self._steps)
+            self._keys[instrument] = [f"{instrument}_{timeframe}" for timeframe in self.timeframes]
+            self._closed_buckets[instrument] = [MIN_TIMESTAMP] * len(self._steps)
+            self._clocks[instrument] = time_ms
+            self._clock_walls[instrument] = time.monotonic()
+        self.ticks += 1
+        if time_ms > self._clocks[instrument]:
+            self._clocks[instrument] = time_ms
+            self._clock_walls[instrument] = time.monotonic()
+        if time_ms > self.clock_ms:
+            self.clock_ms = time_ms
+
+        closed_buckets = self._closed_buckets[instrument]
+        if self._is_late(time_ms, states, closed_buckets):
+            # 最细周期已收盘或已换桶的成交整笔丢弃，各周期都不计入，保持多周期K线一致
+            self.late_ticks += 1
+            return
+
+        late = False
+        for index, step in enumerate(self._steps):
+            state = states[index]
+            segment = time_ms // step if step else self._day_segment(time_ms)
+            if state is not None and segment == state.segment:
+                state.update(price, size)
+                continue
+
+            bucket = self._bucket(step, segment, time_ms)
+            if state is None:
+                if bucket <= closed_buckets[index]:
+                    late = True
+                else:
+                    states[index] = BarState(segment, bucket, price, size)
+            elif bucket == state.bucket:
+                # 同一交易日的不同时段（如夜盘与次日日盘）
+                state.segment = segment
+                state.update(price, size)
+            elif bucket > state.bucket:
+                self._close(instrument, index, state)
+                states[index] = BarState(segment, bucket, price, size)
+            else:
+                late = True
+        if late:
+            self.late_ticks += 1
+
+    def close_stale(self, now_ms: Optional[int] = None) -> int:
+        """收盘结束时间已过（含宽限）但没有新成交的定长周期K线，返回收盘数
+
+        未指定 now_ms 时按各合约自己的时间判断：最新成交时间加上收到该成交后经过的本地时间。
+        行情落后的合约不会被其他合约的时间提前收盘，停止成交的合约在宽限期后也会收盘。
+        """
+        closed = 0
+        wall = time.monotonic()
+        for instrument, states in self._states.items():
+            if now_ms is None:
+                elapsed_ms = int((wall - self._clock_walls[instrument]) * 1000)
+                deadline = self._clocks[instrument] + elapsed_ms - self.close_grace_ms
+            else:
+                deadline = now_ms - self.close_grace_ms
+            for index, step in enumerate(self._steps):
+                state = states[index]
+                if step and state is not None and state.bucket + step <= deadline:
+                    self._close(instrument, index, state)
+                    states[index] = None
+                    closed += 1
+        return closed
+
+    def close_all(self) -> int:
+        """收盘全部正在形成的K线（回放结束或停止接收成交时使用）"""
+        closed = 0
+        for instrument, states in self._states.items():
+            for index, state in enumerate(states):
+                if state is not None:
+                    self._close(instrument, index, state)
+                    states[index] = None
+                    closed += 1
+        return closed
+
+    def open_bars(self, instrument: str) -> Dict[str, Tuple]:
+        """合约各周期正在形成的K线 (时间, 开, 高, 低, 收, 量)"""
+        states = self._states.get(instrument, [])
+        return {
+            timeframe: state.to_row()
+            for timeframe, state in zip(self.timeframes, states) if state is not None
+        }
+
+    async def ingest(self, ticks: Iterable[Tick]) -> int:
+        """聚合一批成交，收盘K线达到批量阈值时写入，返回成交笔数"""
+        self.ensure_started()
+        count = 0
+        for instrument, time_ms, price, size in ticks:
+            self.add_tick(instrument, time_ms, price, size)
+            count += 1
+        if self._closed_count >= self.flush_bars:
+            await self.flush()
+        return count
+
+    async def flush(self) -> int:
+        """写入已收盘的K线，返回写入的K线数"""
+        async with self._flush_lock:
+            closed, self._closed, self._closed_count = self._closed, {}, 0
+            if not closed:
+                return 0
+
+            batches = {}
+            writer = BulkWriter(self.storage)
+            try:
+                for key, rows in closed.items():
+                    columns = np.array(rows, dtype=np.float64).T
+                    batches[key] = KlineSeries(
+                        timestamp=columns[0].astype(np.int64),
+                        open=columns[1],
+                        high=columns[2],
+                        low=columns[3],
+                        close=columns[4],
+                        volume=columns[5]
+                    )
+                    await writer.submit(key, batches[key])
+                progress = await writer.flush()
+            except Exception:
+                # 放回待写队列下次重试（存储按唯一键 upsert，已写入的批次重写不会重复）；
+                # 部分批次可能已写入，失效缓存，目录下次访问重新建立；写入未成功前不通知订阅者
+                self._requeue(closed)
+                for key in batches:
+                    self.cache.invalidate(FUTURES_NAMESPACE, key)
+                self.catalog.invalidate(FUTURES_NAMESPACE)
+                raise
+
+            for key, series in batches.items():
+                self.cache.invalidate(FUTURES_NAMESPACE, key)
+                self.catalog.extend(
+                    FUTURES_NAMESPACE, key, len(series), int(series.timestamp[0]), int(series.timestamp[-1])
+                )
+                await self.bus.publish(key, int(series.timestamp[0]), len(series))
+            self.bars_written += progress.rows_written
+            return progress.rows_written
+
+    def ensure_started(self) -> None:
+        """启动后台定时收盘与写入任务"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并写入已收盘的K线（正在形成的K线不写入，避免重启后重复）"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'instruments': len(self._states),
+            'ticks': self.ticks,
+            'late_ticks': self.late_ticks,
+            'pending_bars': self._closed_count,
+            'bars_written': self.bars_written,
+            'clock_ms': self.clock_ms
+        }
+
+    def _close(self, instrument: str, index: int, state: BarState) -> None:
+        self._closed.setdefault(self._keys[instrument][index], []).append(state.to_row())
+        self._closed_buckets[instrument][index] = state.bucket
+        self._closed_count += 1
+
+    def _requeue(self, closed: Dict[str, List[Tuple]]) -> None:
+        """写入失败的K线放回待写队列，排在期间新收盘的K线之前"""
+        for key, rows in closed.items():
+            self._closed[key] = rows + self._closed.get(key, [])
+            self._closed_count += len(rows)
+
+    def _is_late(self, time_ms: int, states: List[Optional[BarState]], closed_buckets: List[int]) -> bool:
+        """成交是否落在最细周期当前K线之前或已收盘的K线内"""
+        index = self._finest
+        step = self._steps[index]
+        state = states[index]
+        segment = time_ms // step if step else self._day_segment(time_ms)
+        if state is not None and segment == state.segment:
+            return False
+        bucket = self._bucket(step, segment, time_ms)
+        return bucket <= closed_buckets[index] if state is None else bucket < state.bucket
+
+    def _bucket(self, step: int, segment: int, time_ms: int) -> int:
+        """成交所属K线的时间，日历周期为交易日"""
+        return segment * step if step else int(self.calendar.trading_days(np.array([time_ms]))[0]) * MS_PER_DAY
+
+    @staticmethod
+    def _day_segment(time_ms: int) -> int:
+        """自然日+是否夜盘，同一段内交易日不变"""
+        minutes = (time_ms // MS_PER_MINUTE) % (24 * 60)
+        return (time_ms // MS_PER_DAY) * 2 + (minutes >= NIGHT_CUTOFF_MINUTES)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                self.close_stale()
+                await self.flush()
+            except Exception:
+                logger.exception("K线写入失败，已收盘的K线将在下次写入时重试")
+
+
+_tick_aggregator: Optional[TickAggregator] = None
+
+
+def get_tick_aggregator() -> TickAggregator:
+    """获取全局逐笔聚合器（写入 futures 命名空间）"""
+    global _tick_aggregator
+    if _tick_aggregator is None:
+        _tick_aggregator = TickAggregator(get_kline_storage(FUTURES_NAMESPACE))
+    return _tick_aggregator
@@ -0,0 +1,103 @@
+from functools import lru_cache
+from typing import Optional, List, Tuple, Iterable
+import numpy as np
+from core.config import settings
+
+MS_PER_MINUTE = 60 * 1000
+MS_PER_DAY = 24 * 60 * MS_PER_MINUTE
+
+# 夜盘起点之后（含）的K线归属下一交易日（本地时间分钟数）
+NIGHT_CUTOFF_MINUTES = 18 * 60
+
+# 各交易所交易时段（本地时间 HH:MM），K线时间既可为起点也可为终点
+EXCHANGE_SESSIONS = {
+    'SHFE': [('night', '21:00', '02:30'), ('morning', '09:00', '11:30'), ('afternoon', '13:30', '15:00')],
+    'INE': [('night', '21:00', '02:30'), ('morning', '09:00', '11:30'), ('afternoon', '13:30', '15:00')],
+    'DCE': [('night', '21:00', '23:00'), ('morning', '09:00', '11:30'), ('afternoon', '13:30', '15:00')],
+    'CZCE': [('night', '21:00', '23:00'), ('morning', '09:00', '11:30'), ('afternoon', '13:30', '15:00')],
+    'GFEX': [('morning', '09:00', '11:30'), ('afternoon', '13:30', '15:00')],
+    'CFFEX': [('morning', '09:30', '11:30'), ('afternoon', '13:00', '15:00')],
+}
+
+
+def _to_minutes(hhmm: str) -> int:
+    hour, minute = hhmm.split(':')
+    return int(hour) * 60 + int(minute)
+
+
+class TradingCalendar:
+    """交易日历：一次向量化计算每根K线所属的交易日与交易时段"""
+
+    def __init__(self, exchange: str = 'SHFE', holidays: Iterable[str] = ()):
+        if exchange not in EXCHANGE_SESSIONS:
+            raise ValueError(f"不支持的交易所: {exchange}")
+        self.exchange = exchange
+        self.session_names = [name for name, _, _ in EXCHANGE_SESSIONS[exchange]]
+        self._sessions = [
+            (_to_minutes(start), _to_minutes(end)) for _, start, end in EXCHANGE_SESSIONS[exchange]
+        ]
+        self.holidays = np.array(sorted(holidays), dtype='datetime64[D]')
+
+    def trading_days(self, timestamp: np.ndarray) -> np.ndarray:
+        """交易日键（自1970-01-01起的天数），夜盘与周五夜盘顺延到下一交易日"""
+        if not len(timestamp):
+            return np.empty(0, dtype=np.int64)
+        minutes = (timestamp // MS_PER_MINUTE) % (24 * 60)
+        dates = (timestamp // MS_PER_DAY).astype('datetime64[D]')
+        offsets = (minutes >= NIGHT_CUTOFF_MINUTES).astype(np.int64)
+        days = np.busday_offset(dates, offsets, roll='forward', holidays=self.holidays)
+        return days.astype(np.int64)
+
+    def sessions(self, timestamp: np.ndarray) -> np.ndarray:
+        """交易时段序号（对应 session_names），不在任何时段内为 -1"""
+        minutes = (timestamp // MS_PER_MINUTE) % (24 * 60)
+        result = np.full(len(timestamp), -1, dtype=np.int8)
+        for index, (start, end) in enumerate(self._sessions):
+            if start <= end:
+                mask = (minutes >= start) & (minutes <= end)
+            else:
+                # 跨午夜的夜盘
+                mask = (minutes >= start) | (minutes <= end)
+            result[mask & (result < 0)] = index
+        return result
+
+    def assign(self, timestamp: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """同时返回交易日键与交易时段"""
+        return self.trading_days(timestamp), self.sessions(timestamp)
+
+    def session_keys(self, timestamp: np.ndarray) -> np.ndarray:
+        """交易日+时段组合键，可直接用于分组聚合"""
+        trading_days, sessions = self.assign(timestamp)
+        return trading_days * 8 + (sessions.astype(np.int64) + 1)
+
+
+def trading_times(calendar: TradingCalendar, start_ms: int, count: int, step_ms: int) -> np.ndarray:
+    """自 start_ms 起每 step_ms 一个、落在交易时段内的 count 个时间点（周六仅保留夜盘延续部分）"""
+    result = []
+    found = 0
+    cursor = start_ms
+    while found < count:
+        times = cursor + np.arange(max(count - found, 1024), dtype=np.int64) * step_ms
+        cursor = int(times[-1]) + step_ms
+        weekdays = ((times // MS_PER_DAY) + 3) % 7  # 1970-01-01 为周四，0 表示周一
+        minutes = (times // MS_PER_MINUTE) % (24 * 60)
+        weekend = (weekdays == 6) | ((weekdays == 5) & (minutes >= 6 * 60))
+        times = times[(calendar.sessions(times) >= 0) & ~weekend]
+        result.append(times[:count - found])
+        found += len(result[-1])
+    return np.concatenate(result)
+
+
+def category_labels(timestamp: np.ndarray, daily: bool = False) -> List[str]:
+    """生成ECharts类目轴标签，按K线顺序排列，跳过休市时段不留空白"""
+    if not len(timestamp):
+        return []
+    unit = 'D' if daily else 'm'
+    labels = np.datetime_as_string(timestamp.astype('datetime64[ms]'), unit=unit)
+    return np.char.replace(labels, 'T', ' ').tolist()
+
+
+@lru_cache(maxsize=None)
+def get_trading_calendar(exchange: Optional[str] = None) -> TradingCalendar:
+    """获取交易所日历实例"""
+    return TradingCalendar(exchange or settings.DEFAULT_EXCHANGE, settings.TRADING_HOLIDAYS)
@@ -1,7 +1,20 @@
-import React, { useEffect, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import ReactECharts from 'echarts-for-react'
-import { useQuery } from '@tanstack/react-query'
-import { getChartData } from '../services/api'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
+import { getChartData, subscribeBars, ChartDataResponse } from '../services/api'
+
+// 合并增量K线：替换水位处被修订的K线，追加新K线
+const mergeBars = (bars: number[][], delta: number[][]): number[][] => {
+  if (delta.length === 0) {
+    return bars
+  }
+  const first = delta[0][0]
+  let keep = bars.length
+  while (keep > 0 && bars[keep - 1][0] >= first) {
+    keep--
+  }
+  return bars.slice(0, keep).concat(delta)
+}
 
 interface ChartContainerProps {
   instrument: string
@@ -10,13 +23,67 @@ interface ChartContainerProps {
 
 const ChartContainer: React.FC<ChartContainerProps> = ({ instrument, refreshKey }) => {
   const [chartType, setChartType] = useState<'candlestick' | 'line'>('candlestick')
+  const queryClient = useQueryClient()
+
+  // 已加载的K线与水位；合约或refreshKey变化（如上传新数据）时全量重新加载
+  const seriesRef = useRef<{ key: string; data: number[][]; watermark: number | null } | null>(null)
+  const seriesKey = `${instrument}:${refreshKey ?? 0}`
 
   const { data, isLoading, error, refetch } = useQuery({
     queryKey: ['chartData', instrument, refreshKey],
-    queryFn: () => getChartData({ instrument }),
+    queryFn: async () => {
+      const current = seriesRef.current
+      if (current && current.key === seriesKey && current.watermark !== null) {
+        // 补拉只请求水位之后的K线
+        const delta = await getChartData({ instrument, since: current.watermark })
+        const merged = mergeBars(current.data, delta.data)
+        seriesRef.current = { key: seriesKey, data: merged, watermark: delta.watermark ?? current.watermark }
+        return { ...delta, data: merged }
+      }
+      const full = await getChartData({ instrument })
+      seriesRef.current = { key: seriesKey, data: full.data, watermark: full.watermark ?? null }
+      return full
+    },
     enabled: !!instrument,
   })
 
+  const loaded = !!data
+  useEffect(() => {
+    if (!instrument || !loaded) {
+      return
+    }
+    // 首次加载完成后订阅服务端推送，替代定时轮询
+    return subscribeBars(
+      { instrument, since: seriesRef.current?.watermark },
+      {
+        onBars: (event) => {
+          const current = seriesRef.current
+          if (!current || current.key !== seriesKey || !event.data) {
+            return
+          }
+          const merged = mergeBars(current.data, event.data)
+          seriesRef.current = { key: seriesKey, data: merged, watermark: event.watermark ?? current.watermark }
+          queryClient.setQueryData<ChartDataResponse>(['chartData', instrument, refreshKey], (previous) =>
+            previous ? { ...previous, data: merged, watermark: seriesRef.current?.watermark } : previous
+          )
+        },
+        onResync: (event) => {
+          const current = seriesRef.current
+          if (current && event.since) {
+            // 从服务端给出的位置补拉（可能早于当前水位）
+            const watermark = current.watermark === null ? event.since : Math.min(current.watermark, event.since)
+            seriesRef.current = { ...current, watermark }
+          } else {
+            // 数据被清空或重写，全量重新加载
+            seriesRef.current = null
+          }
+          refetch()
+        },
+        onReconnect: () => refetch(),
+      }
+    )
+  }, [instrument, refreshKey, seriesKey, loaded, queryClient, refetch])
+
   useEffect(() => {
     if (refreshKey) {
       refetch()
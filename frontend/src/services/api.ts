@@ -46,9 +46,10 @@ export interface FuturesData {
 
 export interface FuturesDataResponse {
   data: FuturesData[]
-  total: number
+  total?: number | null
   page: number
   page_size: number
+  next_cursor?: string | null
 }
 
 export interface ChartDataRequest {
@@ -56,11 +57,71 @@ export interface ChartDataRequest {
   start_time?: string
   end_time?: string
   interval?: string
+  exchange?: string
+  axis?: 'time' | 'category'
+  max_points?: number
+  downsample?: 'ohlc' | 'lttb'
+  encoding?: 'rows' | 'columnar' | 'binary'
+  since?: number // 增量水位：只返回该时间戳及之后的K线
+  indicators?: string[] // 技术指标，如 MA(20)、MACD(12,26,9)、BOLL(20,2)、RSI(14)、ATR(14)、KDJ(9,3,3)
 }
 
 export interface ChartDataResponse {
   instrument: string
   data: number[][] // [timestamp, open, close, low, high, volume]
+  categories?: string[] | null
+  watermark?: number | null // 最后一根K线时间戳，下次增量请求的since
+  indicators?: Record<string, Record<string, (number | null)[]>> | null // {指标: {输出列: 值}}，与data一一对应
+}
+
+// K线推送事件：bars 为更新的K线，resync 要求按 since 增量补拉
+export interface BarStreamEvent {
+  instrument: string
+  interval: string
+  data?: number[][]
+  watermark?: number
+  since?: number
+}
+
+// 列式K线数据（columnar/binary编码）
+export interface ColumnarChartData {
+  t: Float64Array | number[]
+  o: Float64Array | number[]
+  h: Float64Array | number[]
+  l: Float64Array | number[]
+  c: Float64Array | number[]
+  v: Float64Array | number[]
+  extra?: Record<string, Float64Array> // 二进制编码的附加列（如 'MA(20).ma'），预热期为NaN
+}
+
+// 解析二进制K线：16字节头（magic 'KLN1', version, 列数, 行数）+ 小端float64列
+export const decodeBinaryChartData = (buffer: ArrayBuffer, columnNames?: string[]): ColumnarChartData => {
+  const view = new DataView(buffer)
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4))
+  if (magic !== 'KLN1' || view.getUint16(4, true) !== 1) {
+    throw new Error('不支持的二进制K线格式')
+  }
+  const columnCount = view.getUint16(6, true)
+  const length = view.getUint32(8, true)
+  const columns: Float64Array[] = []
+  for (let i = 0; i < columnCount; i++) {
+    columns.push(new Float64Array(buffer, 16 + i * length * 8, length))
+  }
+  const [t, o, h, l, c, v] = columns
+  const extra: Record<string, Float64Array> = {}
+  columnNames?.slice(6).forEach((name, i) => {
+    extra[name] = columns[6 + i]
+  })
+  return { t, o, h, l, c, v, extra }
+}
+
+export interface CatalogEntry {
+  key: string
+  instrument: string
+  timeframe: string | null
+  bar_count: number
+  first_timestamp: number
+  last_timestamp: number
 }
 
 export interface UploadResponse {
@@ -76,6 +137,8 @@ export const getFuturesData = async (params: {
   end_time?: string
   page?: number
   page_size?: number
+  cursor?: string
+  count?: 'exact' | 'estimated'
 }): Promise<FuturesDataResponse> => {
   return api.get('/futures/data', { params })
 }
@@ -84,10 +147,51 @@ export const getChartData = async (request: ChartDataRequest): Promise<ChartData
   return api.post('/futures/chart-data', request)
 }
 
+export const getChartDataBinary = async (request: ChartDataRequest): Promise<ColumnarChartData> => {
+  const buffer: ArrayBuffer = await api.post('/futures/chart-data', { ...request, encoding: 'binary' }, {
+    responseType: 'arraybuffer',
+  })
+  return decodeBinaryChartData(buffer)
+}
+
 export const getInstruments = async (): Promise<string[]> => {
   return api.get('/futures/instruments')
 }
 
+export const getCatalog = async (): Promise<CatalogEntry[]> => {
+  return api.get('/futures/catalog')
+}
+
+// 订阅K线推送（Server-Sent Events），返回取消订阅函数
+export const subscribeBars = (
+  params: { instrument: string; interval?: string; since?: number | null },
+  handlers: {
+    onBars: (event: BarStreamEvent) => void
+    onResync: (event: BarStreamEvent) => void
+    onReconnect?: () => void
+  }
+): (() => void) => {
+  const query = new URLSearchParams({ instrument: params.instrument, interval: params.interval ?? '5m' })
+  if (params.since !== undefined && params.since !== null) {
+    query.set('since', String(params.since))
+  }
+  const source = new EventSource(`${API_BASE_URL}/futures/stream?${query}`)
+  let dropped = false
+  source.addEventListener('bars', (e) => handlers.onBars(JSON.parse((e as MessageEvent).data)))
+  source.addEventListener('resync', (e) => handlers.onResync(JSON.parse((e as MessageEvent).data)))
+  source.onerror = () => {
+    dropped = true
+  }
+  source.onopen = () => {
+    // 断线重连期间可能错过推送，由调用方按水位补拉
+    if (dropped) {
+      dropped = false
+      handlers.onReconnect?.()
+    }
+  }
+  return () => source.close()
+}
+
 export const uploadCsvFile = async (file: File): Promise<UploadResponse> => {
   const formData = new FormData()
   formData.append('file', file)
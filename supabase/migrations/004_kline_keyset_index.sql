@@ -0,0 +1,23 @@
+-- 对齐K线表结构：001 建表使用 time_stamp/interval_type，而后端（及 003 示例数据）读写
+-- datetime/timeframe，数据集K线使用 timestamp。补齐这些列，旧列不再必填
+ALTER TABLE kline_data ADD COLUMN IF NOT EXISTS datetime TIMESTAMPTZ;
+ALTER TABLE kline_data ADD COLUMN IF NOT EXISTS timeframe VARCHAR(64);
+ALTER TABLE kline_data ADD COLUMN IF NOT EXISTS "timestamp" TIMESTAMPTZ;
+
+-- 001 中的K线都属于某个数据集，只回填到数据集使用的 timestamp 列；不写入 datetime/timeframe，
+-- 否则这些行会同时出现在 futures 序列中
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'kline_data' AND column_name = 'time_stamp'
+    ) THEN
+        ALTER TABLE kline_data ALTER COLUMN time_stamp DROP NOT NULL;
+        UPDATE kline_data SET "timestamp" = time_stamp WHERE "timestamp" IS NULL AND datetime IS NULL;
+    END IF;
+END $$;
+
+-- 键集分页索引：按 (datetime, id) 定位下一页，避免大偏移量扫描
+CREATE INDEX IF NOT EXISTS idx_kline_data_datetime_id ON kline_data(datetime, id);
+CREATE INDEX IF NOT EXISTS idx_kline_data_timeframe_datetime_id ON kline_data(timeframe, datetime, id);
+CREATE INDEX IF NOT EXISTS idx_kline_data_dataset_timestamp_id ON kline_data(dataset_id, "timestamp", id);
@@ -0,0 +1,32 @@
+-- 预汇总K线（多周期金字塔）：series_key 为 {源序列键}@{周期}，如 5m@1h
+CREATE TABLE IF NOT EXISTS kline_rollups (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    dataset_id UUID REFERENCES datasets(id) ON DELETE CASCADE,
+    series_key VARCHAR(64) NOT NULL,
+    datetime TIMESTAMPTZ NOT NULL,
+    open_price DECIMAL(15, 6) NOT NULL,
+    high_price DECIMAL(15, 6) NOT NULL,
+    low_price DECIMAL(15, 6) NOT NULL,
+    close_price DECIMAL(15, 6) NOT NULL,
+    volume DECIMAL(20, 6) DEFAULT 0,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_kline_rollups_series_datetime_id ON kline_rollups(series_key, datetime, id);
+
+-- 启用行级安全策略：与 kline_data 相同，用户只能读取自己数据集的汇总
+ALTER TABLE kline_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view rollups of own datasets" ON kline_rollups
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM datasets
+            WHERE datasets.id = kline_rollups.dataset_id
+            AND datasets.user_id = auth.uid()
+        )
+    );
+
+-- 汇总只由后端以 service_role 重建，不对 anon/authenticated 开放写入
+REVOKE ALL ON kline_rollups FROM anon;
+GRANT SELECT ON kline_rollups TO authenticated;
+GRANT ALL PRIVILEGES ON kline_rollups TO service_role;
@@ -0,0 +1,17 @@
+-- 每个序列每个时间点唯一：批量写入按该唯一键 upsert，重试已提交的批次不会产生重复K线
+-- 先清理已有的重复行，保留最后写入的一行
+DELETE FROM kline_data a USING kline_data b
+WHERE a.timeframe = b.timeframe AND a.datetime = b.datetime
+  AND (a.created_at, a.id) < (b.created_at, b.id);
+
+DELETE FROM kline_data a USING kline_data b
+WHERE a.dataset_id = b.dataset_id AND a."timestamp" = b."timestamp"
+  AND (a.created_at, a.id) < (b.created_at, b.id);
+
+DELETE FROM kline_rollups a USING kline_rollups b
+WHERE a.series_key = b.series_key AND a.datetime = b.datetime
+  AND (a.created_at, a.id) < (b.created_at, b.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_kline_data_timeframe_datetime ON kline_data(timeframe, datetime);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_kline_data_dataset_timestamp ON kline_data(dataset_id, "timestamp");
+CREATE UNIQUE INDEX IF NOT EXISTS uq_kline_rollups_series_datetime ON kline_rollups(series_key, datetime);